@@ -3,7 +3,7 @@
 from django.contrib import admin
 from workshop_app.models import (
     MaterialCategory, MaterialType, Material,
-    MachineType, Machine, JobStatus, Job,
+    MachineType, Machine, MachineReservation, MachineUtilization, JobStatus, Job,
     Client, ContactPerson, Operator, StaffSettings,
     AttachmentType, MaterialAttachment, MaterialTransaction
 )
@@ -27,6 +27,8 @@ admin.site.register(MaterialTransaction, MaterialTransactionAdmin)
 # Machine admin
 admin.site.register(MachineType)
 admin.site.register(Machine)
+admin.site.register(MachineReservation)
+admin.site.register(MachineUtilization)
 
 # Job admin
 admin.site.register(JobStatus)
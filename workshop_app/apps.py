@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WorkshopAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workshop_app'
+
+    def ready(self):
+        # Register signal handlers
+        from workshop_app import signals  # noqa: F401
+
+        # Load the scan code index before the first scan instead of during it
+        if getattr(settings, 'SCAN_RESOLVER_WARM_ON_START', False):
+            from workshop_app.utils.scan_resolver import start_warm_up
+            start_warm_up()
+
+        # Optional in-process stale session sweeper
+        interval = getattr(settings, 'MACHINE_SESSION_SWEEP_INTERVAL', None)
+        if interval:
+            from workshop_app.utils.machine_sessions import start_session_sweeper
+            start_session_sweeper(interval)
@@ -0,0 +1,19 @@
+"""
+Link old material transactions and machine usages to their jobs and operators
+"""
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.job_references import DEFAULT_BATCH_SIZE, backfill_job_references
+
+
+class Command(BaseCommand):
+    help = 'Fill the job and operator_user foreign keys from the job_reference and operator_name strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        results = backfill_job_references(batch_size=options['batch_size'])
+        for model_name, (linked_jobs, linked_operators) in results.items():
+            self.stdout.write(f'{model_name}: {linked_jobs} linked to jobs, {linked_operators} linked to operators')
+        self.stdout.write(self.style.SUCCESS('Backfill complete'))
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark for the scanned code grammar in barcode_utils
+"""
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.barcode_utils import classify_code
+
+# Label formats seen on the shop floor, grouped by kind
+LABEL_CORPUS = {
+    'job': [
+        'J-JOB-000125',
+        'J-GEN-001226',
+        'J-12345',
+        'PER-ALICE',
+    ],
+    'material': [
+        'FLMRL-PLA-00001',
+        'FLMRL-PETG-00042',
+        'SHEET-ACR3-00007',
+    ],
+    'machine': [
+        'MC-3DP-00001',
+        'MC-LAS-00012',
+        'MACH-204',
+    ],
+    'url': [
+        'https://workshop.ngrok-free.app/scan/material/FLMRL-PLA-00001/',
+        'https://workshop.ngrok-free.app/machines/MC-3DP-00001/',
+        'https://workshop.ngrok-free.app/jobs/J-JOB-000125/?ref=label',
+    ],
+    'gs1': [
+        '(01)09506000134352(17)261231(10)LOT4711(21)SN000981',
+        ']C10109506000134352\x1d10BATCH1\x1d21SN998',
+        ']d20109506000134352172612311021A7',
+    ],
+    'vendor': [
+        '4006381333931',
+        '036000291452',
+        'B07PGL2ZSL',
+        'SN-8842-XK',
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure the cost of classifying scanned codes for common label formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000,
+                            help='Number of parses per code (default: 20000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timing runs per code; the fastest is reported (default: 5)')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        repeat = options['repeat']
+
+        self.stdout.write(f"{'format':<10} {'type':<9} {'ns/code':>9}  code")
+        all_timings = []
+        for label_format, codes in LABEL_CORPUS.items():
+            for code in codes:
+                timer = timeit.Timer(lambda: classify_code(code))
+                best = min(timer.repeat(repeat=repeat, number=number)) / number
+                all_timings.append(best)
+                code_type = classify_code(code).code_type
+                self.stdout.write(f"{label_format:<10} {code_type:<9} {best * 1e9:>9.0f}  {code!r}")
+
+        mean = sum(all_timings) / len(all_timings)
+        self.stdout.write(self.style.SUCCESS(
+            f"Mean parse cost: {mean * 1e9:.0f} ns/code over {len(all_timings)} label formats"
+        ))
@@ -0,0 +1,24 @@
+"""
+Close machine sessions left open past their reservation
+"""
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.machine_sessions import sweep_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Close machine usage sessions still open after their reservation ran out (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=None,
+            help='Minutes past the reservation before a session is closed (default: MACHINE_SESSION_GRACE_MINUTES)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the stale sessions without closing them')
+
+    def handle(self, *args, **options):
+        usages = sweep_stale_sessions(grace_minutes=options['grace'], dry_run=options['dry_run'])
+        for usage in usages:
+            self.stdout.write(f'{usage.machine_id}: {usage.job_reference} by {usage.operator_name}, started {usage.start_time:%Y-%m-%d %H:%M}')
+        verb = 'Would close' if options['dry_run'] else 'Closed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(usages)} stale machine sessions'))
@@ -0,0 +1,50 @@
+"""
+Generate a printable QR label sheet for materials, machines or jobs
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workshop_app.utils.label_utils import LABEL_SHEET_FORMATS, LABEL_SOURCES, get_labels, iter_label_sheet
+
+
+class Command(BaseCommand):
+    help = 'Render QR labels for all matching materials, machines or jobs into a PDF or SVG sheet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(LABEL_SOURCES), help='What to print labels for')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--format', dest='sheet_format', choices=sorted(LABEL_SHEET_FORMATS), default='pdf')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes used to render QR codes (default: one per CPU)')
+        parser.add_argument('--category', help='Material category ID or code')
+        parser.add_argument('--type', dest='material_type', help='Material type ID or code')
+        parser.add_argument('--machine-type', help='Machine type ID or code')
+        parser.add_argument('--location', help='Part of the location in the workshop')
+        parser.add_argument('--status', help='Job status ID or name')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        filter_options = {
+            'material': ('category', 'material_type', 'location'),
+            'machine': ('machine_type', 'location'),
+            'job': ('status',),
+        }[kind]
+
+        for name in ('category', 'material_type', 'machine_type', 'location', 'status'):
+            if options[name] and name not in filter_options:
+                raise CommandError(f"--{name.replace('_', '-')} does not apply to {kind} labels")
+
+        filters = {name: options[name] for name in filter_options if options[name]}
+        label_count, labels = get_labels(kind, **filters)
+
+        chunks = iter_label_sheet(labels, label_count, options['sheet_format'], options['workers'])
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {label_count} labels to {options['output']}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,14 @@
+"""
+Create staff settings and personal jobs for users who do not have them
+"""
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.personal_jobs import provision_missing
+
+
+class Command(BaseCommand):
+    help = 'Give every existing user staff settings and a personal job (safe to run repeatedly)'
+
+    def handle(self, *args, **options):
+        count = provision_missing()
+        self.stdout.write(self.style.SUCCESS(f'Provisioned personal jobs for {count} users'))
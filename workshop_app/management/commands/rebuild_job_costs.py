@@ -0,0 +1,14 @@
+"""
+Rebuild the job cost rollups
+"""
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.job_costs import rebuild_job_costs
+
+
+class Command(BaseCommand):
+    help = 'Recompute material, labor and machine cost of every job (run backfill_job_references first on old data)'
+
+    def handle(self, *args, **options):
+        count = rebuild_job_costs()
+        self.stdout.write(self.style.SUCCESS(f'Updated costs of {count} jobs'))
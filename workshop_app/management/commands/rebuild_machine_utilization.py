@@ -0,0 +1,14 @@
+"""
+Rebuild the machine utilization rollups
+"""
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.machine_utilization import rebuild_utilization
+
+
+class Command(BaseCommand):
+    help = 'Recompute hourly and daily machine utilization from the usage records'
+
+    def handle(self, *args, **options):
+        count = rebuild_utilization()
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {count} machine usages'))
@@ -0,0 +1,18 @@
+"""
+Rebuild the material full-text search index
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from workshop_app.utils.material_search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the material search index (after bulk imports or direct SQL edits)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_index()
+        if count is None:
+            raise CommandError('No material search index on this database; run migrate first')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} materials'))
@@ -0,0 +1,14 @@
+"""
+Rebuild the timesheet rollups
+"""
+from django.core.management.base import BaseCommand
+
+from workshop_app.utils.timesheets import rebuild_timesheets
+
+
+class Command(BaseCommand):
+    help = 'Recompute hours per user, job and day from the closed time entries'
+
+    def handle(self, *args, **options):
+        count = rebuild_timesheets()
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {count} time entries'))
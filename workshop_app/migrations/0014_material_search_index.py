@@ -0,0 +1,68 @@
+import logging
+
+from django.db import migrations, transaction
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+INDEXED_FIELDS = 'material_id, name, supplier_name, brand_name, location_in_workshop'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute(
+                        "CREATE VIRTUAL TABLE workshop_app_material_fts USING fts5("
+                        f"{INDEXED_FIELDS}, tokenize = 'unicode61', prefix = '2 3')"
+                    )
+            except OperationalError as e:
+                # SQLite built without FTS5: material search keeps using LIKE
+                logger.warning(f"Material search index not created: {e}")
+                return
+            cursor.execute(
+                f"INSERT INTO workshop_app_material_fts (rowid, {INDEXED_FIELDS}) "
+                f"SELECT id, {INDEXED_FIELDS} FROM workshop_app_material"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("""
+                CREATE TABLE workshop_app_material_search (
+                    material_id integer PRIMARY KEY
+                        REFERENCES workshop_app_material (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+                    document tsvector NOT NULL
+                )
+            """)
+            cursor.execute(
+                "CREATE INDEX workshop_app_material_search_gin "
+                "ON workshop_app_material_search USING gin (document)"
+            )
+            cursor.execute("""
+                INSERT INTO workshop_app_material_search (material_id, document)
+                SELECT id,
+                       setweight(to_tsvector('simple', coalesce(material_id, '')), 'A') ||
+                       setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+                       setweight(to_tsvector('simple', concat_ws(' ', supplier_name, brand_name, location_in_workshop)), 'C')
+                FROM workshop_app_material
+            """)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("DROP TABLE IF EXISTS workshop_app_material_fts")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP TABLE IF EXISTS workshop_app_material_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0013_material_list_seek_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
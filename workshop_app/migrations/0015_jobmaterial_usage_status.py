@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+USAGE_STATUS_CHOICES = [
+    ('active', 'Active'),
+    ('completed', 'Completed'),
+    ('returned', 'Returned'),
+    ('scrapped', 'Scrapped'),
+]
+
+
+def add_usage_status_column(apps, schema_editor):
+    """Add the column unless the database already has it from a manual change"""
+    JobMaterial = apps.get_model('workshop_app', 'JobMaterial')
+    table = JobMaterial._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+    if 'usage_status' in columns:
+        return
+
+    field = models.CharField(max_length=20, choices=USAGE_STATUS_CHOICES, default='active')
+    field.set_attributes_from_name('usage_status')
+    schema_editor.add_field(JobMaterial, field)
+    schema_editor.execute(f"UPDATE {schema_editor.quote_name(table)} SET usage_status = result")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0014_material_search_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_usage_status_column, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='jobmaterial',
+                    name='usage_status',
+                    field=models.CharField(choices=USAGE_STATUS_CHOICES, default='active', max_length=20),
+                ),
+            ],
+        ),
+    ]
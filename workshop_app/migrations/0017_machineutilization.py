@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0016_machinereservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('run_minutes', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('setup_minutes', models.IntegerField(default=0)),
+                ('cleanup_minutes', models.IntegerField(default=0)),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('usage_count', models.IntegerField(default=0)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilization', to='workshop_app.machine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket_start'], name='utilization_period_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('machine', 'period', 'bucket_start'), name='utilization_bucket_unique')],
+            },
+        ),
+    ]
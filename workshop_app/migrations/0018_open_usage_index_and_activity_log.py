@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0017_machineutilization'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobActivityLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('status_update', 'Status Update'), ('comment', 'Comment'), ('material_usage', 'Material Usage'), ('machine_usage', 'Machine Usage'), ('labor_tracking', 'Labor Tracking'), ('financial_update', 'Financial Update'), ('client_communication', 'Client Communication'), ('file_upload', 'File Upload'), ('milestone', 'Milestone'), ('system', 'System Event')], max_length=50)),
+                ('activity_date', models.DateTimeField(auto_now_add=True)),
+                ('description', models.TextField()),
+                ('performed_by_name', models.CharField(blank=True, max_length=100)),
+                ('metadata', models.JSONField(blank=True, null=True)),
+                ('related_object_type', models.CharField(blank=True, max_length=50)),
+                ('related_object_id', models.IntegerField(blank=True, null=True)),
+                ('is_internal', models.BooleanField(default=False)),
+                ('is_system_generated', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-activity_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='machineusage',
+            index=models.Index(condition=models.Q(('end_time__isnull', True)), fields=['machine'], name='machineusage_open_idx'),
+        ),
+        migrations.AddField(
+            model_name='jobactivitylog',
+            name='job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_logs', to='workshop_app.job'),
+        ),
+        migrations.AddField(
+            model_name='jobactivitylog',
+            name='performed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='jobactivitylog',
+            index=models.Index(fields=['job', 'activity_date'], name='workshop_ap_job_id_38ca8e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobactivitylog',
+            index=models.Index(fields=['activity_type'], name='workshop_ap_activit_ae3c23_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0019_idsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobFinancial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estimated_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('quoted_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('final_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('partial', 'Partially Paid'), ('paid', 'Paid in Full'), ('overdue', 'Overdue'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('deposit_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('deposit_date', models.DateField(blank=True, null=True)),
+                ('payment_due_date', models.DateField(blank=True, null=True)),
+                ('payment_method', models.CharField(blank=True, max_length=50, null=True)),
+                ('invoice_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('invoice_date', models.DateField(blank=True, null=True)),
+                ('material_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('labor_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('machine_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('overhead_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('shipping_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('tax_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('discount_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('financial_notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='financials', to='workshop_app.job')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job',), name='job_financial_job_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0020_jobfinancial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machineusage',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='machine_usages', to='workshop_app.job'),
+        ),
+        migrations.AddField(
+            model_name='machineusage',
+            name='operator_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='machine_usages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='materialtransaction',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='material_transactions', to='workshop_app.job'),
+        ),
+        migrations.AddField(
+            model_name='materialtransaction',
+            name='operator_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='material_transactions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
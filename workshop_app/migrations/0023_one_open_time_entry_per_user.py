@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def add_to_rollups(apps, entries):
+    """
+    Add entries closed here to the timesheet and labor cost rollups
+
+    Same arithmetic as workshop_app.utils.timesheets and job_costs, kept
+    inline so this migration does not depend on code that may change.
+    """
+    TimesheetDay = apps.get_model('workshop_app', 'TimesheetDay')
+    JobFinancial = apps.get_model('workshop_app', 'JobFinancial')
+    Operator = apps.get_model('workshop_app', 'Operator')
+    hourly_rates = dict(Operator.objects.values_list('user_id', 'hourly_rate'))
+
+    for entry in entries:
+        if entry.end_time <= entry.start_time:
+            continue
+
+        # Timesheet: one row per local day the entry overlaps
+        start = entry.start_time
+        first_day = True
+        while start < entry.end_time:
+            day = timezone.localdate(start)
+            day_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+            seconds = round((min(entry.end_time, day_end) - start).total_seconds())
+            TimesheetDay.objects.get_or_create(user_id=entry.user_id, job_id=entry.job_id, day=day)
+            TimesheetDay.objects.filter(user_id=entry.user_id, job_id=entry.job_id, day=day).update(
+                seconds=F('seconds') + seconds,
+                entry_count=F('entry_count') + (1 if first_day else 0),
+            )
+            first_day = False
+            start = day_end
+
+        # Labor cost at the user's operator rate
+        hourly_rate = hourly_rates.get(entry.user_id)
+        if hourly_rate:
+            # Whole cents, rounded half away from zero
+            numerator = (entry.end_time - entry.start_time) // timedelta(microseconds=1) * int(hourly_rate * 100)
+            denominator = 3600 * 10 ** 6
+            cents = (abs(numerator) * 2 + denominator) // (2 * denominator)
+            cost = Decimal(cents if numerator >= 0 else -cents) / 100
+            JobFinancial.objects.get_or_create(job_id=entry.job_id)
+            JobFinancial.objects.filter(job_id=entry.job_id).update(
+                labor_cost=Coalesce(F('labor_cost'), Value(Decimal('0'))) + cost
+            )
+
+
+def close_duplicate_open_entries(apps, schema_editor):
+    """Close all but the newest open entry of each user, where the next one started"""
+    JobTimeTracking = apps.get_model('workshop_app', 'JobTimeTracking')
+    newer_start = {}
+    closed = []
+    for entry in JobTimeTracking.objects.filter(end_time__isnull=True).order_by('user_id', '-start_time', '-pk'):
+        if entry.user_id in newer_start:
+            entry.end_time = max(newer_start[entry.user_id], entry.start_time)
+            entry.notes += "\nClosed automatically: another entry was started while this one was open."
+            closed.append(entry)
+        newer_start[entry.user_id] = entry.start_time
+    JobTimeTracking.objects.bulk_update(closed, ['end_time', 'notes'])
+    add_to_rollups(apps, closed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop_app', '0022_timesheet_day'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='jobtimetracking',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_time__isnull', True)), fields=('user',), name='one_open_time_entry_per_user'),
+        ),
+    ]
@@ -4,11 +4,13 @@ from workshop_app.models.material_models import (
     AttachmentType, MaterialAttachment
 )
 from workshop_app.models.machine_models import (
-    MachineType, Machine, MachineUsage
+    MachineType, Machine, MachineUsage, MachineReservation, MachineUtilization
 )
 from workshop_app.models.job_models import (
     JobStatus, Job, JobMaterial
 )
+from workshop_app.models.job_activity_models import JobActivityLog
+from workshop_app.models.job_financial_models import JobFinancial
 from workshop_app.models.client_models import (
     Client, ContactPerson
 )
@@ -18,14 +20,16 @@ from workshop_app.models.user_models import (
 from workshop_app.models.transaction_models import (
     MaterialTransaction, ScanHistory
 )
+from workshop_app.models.sequence_models import IdSequence
 
 # Define what's exported when using `from workshop_app.models import *`
 __all__ = [
     'MaterialCategory', 'MaterialType', 'Material', 
     'AttachmentType', 'MaterialAttachment',
-    'MachineType', 'Machine', 'MachineUsage',
-    'JobStatus', 'Job', 'JobMaterial',
+    'MachineType', 'Machine', 'MachineUsage', 'MachineReservation', 'MachineUtilization',
+    'JobStatus', 'Job', 'JobMaterial', 'JobActivityLog', 'JobFinancial',
     'Client', 'ContactPerson',
     'Operator', 'StaffSettings',
-    'MaterialTransaction', 'ScanHistory'
+    'MaterialTransaction', 'ScanHistory',
+    'IdSequence'
 ]
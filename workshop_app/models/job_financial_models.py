@@ -49,6 +49,12 @@ class JobFinancial(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        constraints = [
+            # One row per job; the cost rollups add to it in place
+            models.UniqueConstraint(fields=['job'], name='job_financial_job_unique'),
+        ]
+    
     def __str__(self):
         return f"Financial for {self.job.project_name} ({self.job.job_id})"
     
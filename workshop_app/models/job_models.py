@@ -90,6 +90,8 @@ class JobMaterial(models.Model):
     added_by = models.CharField(max_length=100)
     result = models.CharField(max_length=20, choices=RESULT_CHOICES)
     notes = models.TextField(blank=True)
+    # Mirrors result; the column predates the model field on older installs
+    usage_status = models.CharField(max_length=20, choices=RESULT_CHOICES, default='active')
     
     def __str__(self):
         return f"{self.quantity} of {self.material.name} for {self.job.project_name}"
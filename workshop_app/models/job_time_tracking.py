@@ -1,12 +1,24 @@
 """
 Models for job time tracking
 """
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from django.utils.functional import cached_property
 
+# Times start_tracking retries when another request opens an entry concurrently
+START_TRACKING_ATTEMPTS = 3
+
+
+def entry_closed(time_entry):
+    """Update the rollups fed by a closed entry (imported late: they import this module)"""
+    from workshop_app.utils.job_costs import add_labor_cost
+    from workshop_app.utils.timesheets import record_time_entry
+    add_labor_cost(time_entry)
+    record_time_entry(time_entry)
+
+
 class JobTimeTracking(models.Model):
     """Track time spent by users working on jobs"""
     job = models.ForeignKey('workshop_app.Job', on_delete=models.CASCADE, related_name='time_logs')
@@ -54,6 +66,14 @@ class JobTimeTracking(models.Model):
             models.Index(fields=['job', 'user', 'start_time']),
             models.Index(fields=['user', 'start_time']),
         ]
+        constraints = [
+            # At most one running entry per user; also the index behind get_active_entry
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(end_time__isnull=True),
+                name='one_open_time_entry_per_user',
+            ),
+        ]
 
     @classmethod
     def get_active_entry(cls, user):
@@ -61,36 +81,90 @@ class JobTimeTracking(models.Model):
         return cls.objects.filter(user=user, end_time__isnull=True).first()
     
     @classmethod
-    def start_tracking(cls, job, user, notes=""):
-        """Start time tracking for a job"""
-        # Check if user already has an active tracking
-        active_tracking = cls.get_active_entry(user)
-        if active_tracking:
-            # If active tracking is for a different job, stop it first
-            if active_tracking.job != job:
-                active_tracking.end_time = timezone.now()
-                active_tracking.save()
-            else:
-                # Already tracking this job
-                return active_tracking
+    def close_entry(cls, entry, end_time=None, notes=None):
+        """
+        Close an open entry and add it to the job cost and timesheet rollups
+        
+        The entry is only closed if it is still open, so two requests
+        stopping the same entry cannot both count it.
         
-        # Create a new time entry
-        return cls.objects.create(
-            job=job,
-            user=user,
-            start_time=timezone.now(),
-            notes=notes
-        )
+        Returns:
+            bool: True if this call closed the entry
+        """
+        fields = {'end_time': end_time or timezone.now()}
+        if notes is not None:
+            fields['notes'] = notes
+        if not cls.objects.filter(pk=entry.pk, end_time__isnull=True).update(**fields):
+            return False
+        for field, value in fields.items():
+            setattr(entry, field, value)
+        entry_closed(entry)
+        return True
+    
+    @classmethod
+    def start_tracking(cls, job, user, notes=""):
+        """
+        Start time tracking for a job
+
+        Closing the previous entry and opening the new one happen in one
+        transaction, so a failed insert also undoes the close (and its
+        rollup updates) instead of leaving the user with no open entry.
+        """
+        for attempt in range(START_TRACKING_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    # Check if user already has an active tracking
+                    active_tracking = cls.get_active_entry(user)
+                    if active_tracking:
+                        if active_tracking.job_id == job.pk:
+                            # Already tracking this job
+                            return active_tracking
+                        # If active tracking is for a different job, stop it first
+                        cls.close_entry(active_tracking)
+                    
+                    # Create a new time entry; the unique constraint rejects it if
+                    # another request opened one since the check above
+                    return cls.objects.create(
+                        job=job,
+                        user=user,
+                        start_time=timezone.now(),
+                        notes=notes
+                    )
+            except IntegrityError:
+                if attempt == START_TRACKING_ATTEMPTS - 1:
+                    raise
     
     @classmethod
     def stop_tracking(cls, user, notes=None):
         """Stop any active time tracking for a user"""
         active_tracking = cls.get_active_entry(user)
-        if active_tracking:
-            active_tracking.end_time = timezone.now()
-            if notes:
-                # Set the notes directly instead of appending to previous notes
-                active_tracking.notes = notes
-            active_tracking.save()
+        # Set the notes directly instead of appending to previous notes
+        if active_tracking and cls.close_entry(active_tracking, notes=notes or None):
             return active_tracking
         return None
+
+
+class TimesheetDay(models.Model):
+    """Closed time entries rolled up per user, job and local day"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timesheet_days')
+    job = models.ForeignKey('workshop_app.Job', on_delete=models.CASCADE, related_name='timesheet_days')
+    day = models.DateField()
+    seconds = models.IntegerField(default=0)
+    # Entries are counted on the day they started
+    entry_count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'job', 'day'], name='timesheet_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'user'], name='timesheet_day_user_idx'),
+        ]
+    
+    @property
+    def hours(self):
+        return round(self.seconds / 3600, 2)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.job.job_id} - {self.day}"
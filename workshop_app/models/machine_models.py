@@ -61,11 +61,73 @@ class MachineUsage(models.Model):
     operator_name = models.CharField(max_length=100)
     notes = models.TextField(blank=True)
     
+    # Indexed links behind job_reference / operator_name
+    job = models.ForeignKey('workshop_app.Job', on_delete=models.SET_NULL, null=True, blank=True, related_name='machine_usages')
+    operator_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='machine_usages')
+    
     # Cost fields
     setup_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     operation_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     cleanup_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Open sessions only; stays small however long the history gets
+            models.Index(fields=['machine'], condition=models.Q(end_time__isnull=True), name='machineusage_open_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.machine.name} - {self.start_time}"
+
+class MachineUtilization(models.Model):
+    """Machine usage rolled up into hourly or daily buckets"""
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='utilization')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    run_minutes = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Setup, cleanup, cost and usage count are booked to the bucket the usage started in
+    setup_minutes = models.IntegerField(default=0)
+    cleanup_minutes = models.IntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    usage_count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'period', 'bucket_start'], name='utilization_bucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket_start'], name='utilization_period_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.machine.name} - {self.period} {self.bucket_start}"
+
+class MachineReservation(models.Model):
+    """Future booking of a machine for a time slot"""
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='reservations')
+    job = models.ForeignKey('workshop_app.Job', on_delete=models.SET_NULL, null=True, blank=True, related_name='machine_reservations')
+    reserved_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='machine_reservations')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['start_time']
+        indexes = [
+            # Interval index: reservations of one machine never overlap, so
+            # ordering by start also orders them by end
+            models.Index(fields=['machine', 'start_time'], name='reservation_machine_start_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='reservation_ends_after_start'),
+        ]
+    
+    def __str__(self):
+        return f"{self.machine.name} - {self.start_time} to {self.end_time}"
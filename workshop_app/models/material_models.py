@@ -55,6 +55,15 @@ class Material(models.Model):
     supplier_sku = models.CharField(max_length=50)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Composite indexes for the keyset-paginated material list
+        indexes = [
+            models.Index(fields=['name', 'id'], name='material_name_seek_idx'),
+            models.Index(fields=['current_stock', 'id'], name='material_stock_seek_idx'),
+            models.Index(fields=['location_in_workshop', 'id'], name='material_location_seek_idx'),
+            models.Index(fields=['color', 'id'], name='material_color_seek_idx'),
+        ]
+
     def __str__(self):
         return f"{self.material_id} - {self.name}"
 
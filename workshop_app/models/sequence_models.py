@@ -0,0 +1,20 @@
+# workshop_app/models/sequence_models.py
+
+from django.db import models
+
+class IdSequence(models.Model):
+    """Last number handed out for a human-readable ID prefix"""
+    prefix = models.CharField(max_length=20)
+    # Calendar year for sequences that restart every year, 0 otherwise
+    year = models.IntegerField(default=0)
+    last_value = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'year'], name='id_sequence_prefix_year_unique'),
+        ]
+    
+    def __str__(self):
+        if self.year:
+            return f"{self.prefix} ({self.year}): {self.last_value}"
+        return f"{self.prefix}: {self.last_value}"
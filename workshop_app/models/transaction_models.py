@@ -21,6 +21,11 @@ class MaterialTransaction(models.Model):
     operator_name = models.CharField(max_length=100)
     notes = models.TextField(blank=True)
     
+    # Indexed links behind job_reference / operator_name (null for
+    # non-job entries such as restocks, and for rows not yet backfilled)
+    job = models.ForeignKey('workshop_app.Job', on_delete=models.SET_NULL, null=True, blank=True, related_name='material_transactions')
+    operator_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='material_transactions')
+    
     # New fields for restock
     invoice = models.FileField(upload_to='invoices/', blank=True, null=True)
     purchase_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
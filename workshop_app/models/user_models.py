@@ -46,12 +46,15 @@ class StaffSettings(models.Model):
     def __str__(self):
         return f"Settings for {self.user.username}"
     
+    # Fields written when the active job changes; a full save could write back stale preferences
+    ACTIVE_JOB_FIELDS = ['active_job', 'active_since', 'last_activity']
+
     def set_active_job(self, job):
         self.active_job = job
         self.active_since = timezone.now()
-        self.save()
+        self.save(update_fields=self.ACTIVE_JOB_FIELDS)
     
     def clear_active_job(self):
         self.active_job = None
         self.active_since = None
-        self.save()
+        self.save(update_fields=self.ACTIVE_JOB_FIELDS)
@@ -0,0 +1,89 @@
+"""
+Signal handlers for keeping derived data in sync with the models
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_migrate, post_save, post_delete
+from django.dispatch import receiver
+
+from workshop_app.models import Job, Material, Machine, Operator
+from workshop_app.utils.dashboard_cache import invalidate_low_stock, invalidate_machines, invalidate_recent_jobs
+from workshop_app.utils.material_search import index_material, reset_search_backend, unindex_material
+from workshop_app.utils.personal_jobs import provision_staff
+from workshop_app.utils.scan_resolver import scan_index
+
+
+# Scan code index (updated after commit, so a rolled back save leaves no trace)
+
+@receiver(post_save, sender=Job)
+def index_job_codes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: scan_index.add_job(instance))
+
+@receiver(post_save, sender=Material)
+def index_material_codes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: scan_index.add_material(instance))
+
+@receiver(post_save, sender=Machine)
+def index_machine_codes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: scan_index.add_machine(instance))
+
+# The pk is read now: deleting the object clears it on the instance
+
+@receiver(post_delete, sender=Job)
+def unindex_job_codes(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: scan_index.remove('job', pk))
+
+@receiver(post_delete, sender=Material)
+def unindex_material_codes(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: scan_index.remove('material', pk))
+
+@receiver(post_delete, sender=Machine)
+def unindex_machine_codes(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: scan_index.remove('machine', pk))
+
+
+# Material full-text search index
+
+@receiver(post_save, sender=Material)
+def index_material_search(sender, instance, **kwargs):
+    index_material(instance.pk)
+
+@receiver(post_delete, sender=Material)
+def unindex_material_search(sender, instance, **kwargs):
+    unindex_material(instance.pk)
+
+@receiver(post_migrate)
+def reset_material_search_backend(sender, **kwargs):
+    reset_search_backend()
+
+
+# Cached dashboard panels
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_dashboard_recent_jobs(sender, instance, **kwargs):
+    invalidate_recent_jobs(instance.created_by_id, instance.owner_id)
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def invalidate_dashboard_low_stock(sender, instance, **kwargs):
+    invalidate_low_stock()
+
+@receiver(post_save, sender=Machine)
+@receiver(post_delete, sender=Machine)
+@receiver(post_save, sender=Operator)
+@receiver(post_delete, sender=Operator)
+@receiver(m2m_changed, sender=Operator.certified_machines.through)
+def invalidate_dashboard_machines(sender, **kwargs):
+    invalidate_machines()
+
+
+# Staff settings and personal job of new users
+
+@receiver(post_save, sender=User)
+def provision_new_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        provision_staff(instance)
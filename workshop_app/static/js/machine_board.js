@@ -0,0 +1,86 @@
+/**
+ * Machine Status Board JavaScript
+ *
+ * Keeps the board current from the server's Server-Sent Events stream
+ * instead of reloading the page. When the server cannot stream it answers
+ * with a snapshot and an 'end' event, and EventSource polls again.
+ */
+
+// Badge classes per machine status (same colours as the machine list)
+const STATUS_BADGES = {
+    'available': 'bg-success',
+    'in_use': 'bg-warning text-dark',
+    'maintenance': 'bg-info text-white',
+    'out_of_order': 'bg-danger'
+};
+
+document.addEventListener('DOMContentLoaded', function() {
+    const board = document.getElementById('machineBoard');
+    if (!board) return;
+
+    // Colour the server-rendered badges
+    board.querySelectorAll('.machine-board-card').forEach(card => {
+        const badge = card.querySelector('.machine-status');
+        const status = Array.from(badge.classList).find(cls => cls.startsWith('status-'));
+        if (status) setStatusBadge(badge, status.substring('status-'.length), badge.textContent);
+    });
+
+    connectBoard(board.dataset.eventsUrl);
+});
+
+// Open the event stream; EventSource reconnects by itself after errors
+function connectBoard(url) {
+    const indicator = document.getElementById('boardConnection');
+    const source = new EventSource(url);
+    let polling = false;
+
+    source.addEventListener('open', function() {
+        indicator.className = 'badge bg-success';
+        indicator.textContent = polling ? 'Polling' : 'Live';
+    });
+
+    source.addEventListener('error', function() {
+        // The end of a polled snapshot also shows up as an error
+        if (polling && source.readyState === EventSource.CONNECTING) return;
+        indicator.className = 'badge bg-danger';
+        indicator.textContent = 'Reconnecting...';
+    });
+
+    // The server closes the response and EventSource polls again
+    source.addEventListener('end', function() {
+        polling = true;
+        indicator.className = 'badge bg-success';
+        indicator.textContent = 'Polling';
+    });
+
+    // Full state, sent on every (re)connect
+    source.addEventListener('snapshot', function(e) {
+        JSON.parse(e.data).forEach(updateMachine);
+    });
+
+    // One machine changed state
+    source.addEventListener('status', function(e) {
+        updateMachine(JSON.parse(e.data));
+    });
+}
+
+// Apply one machine's state to its card
+function updateMachine(state) {
+    const card = document.querySelector(`.machine-board-card[data-machine-id="${CSS.escape(state.machine_id)}"]`);
+    if (!card) return;
+
+    setStatusBadge(card.querySelector('.machine-status'), state.status, state.status_display);
+
+    card.querySelector('.machine-job').textContent = state.current_job
+        ? `${state.current_job} - ${state.current_job_name}`
+        : '-';
+
+    card.querySelector('.machine-reserved').textContent = state.reserved_until
+        ? new Date(state.reserved_until).toLocaleTimeString([], {hour: '2-digit', minute: '2-digit'})
+        : '-';
+}
+
+function setStatusBadge(badge, status, label) {
+    badge.className = `badge machine-status status-${status} ${STATUS_BADGES[status] || 'bg-secondary'}`;
+    badge.textContent = label;
+}
@@ -20,6 +20,22 @@ async function processScannedCode(code) {
     }
 }
 
+/**
+ * Process a list of scanned codes in a single request (e.g. a stock take)
+ * @param {string[]} codes - The scanned codes
+ * @returns {Promise<Object>} - Server response with one result per code
+ */
+async function processScannedCodes(codes) {
+    try {
+        const body = new URLSearchParams();
+        codes.forEach(code => body.append('codes', code));
+        return await WMSAPI.apiRequest('/scan/process-batch/', 'POST', body.toString());
+    } catch (error) {
+        console.error('Error processing batch scan:', error);
+        throw new Error('An error occurred while processing the scanned codes.');
+    }
+}
+
 /**
  * Handle a withdrawal request
  * @param {string} materialId - Material ID
@@ -61,6 +77,7 @@ async function returnMaterial(materialId, quantity, notes) {
 // Export scanner API functions
 window.ScannerAPI = {
     processScannedCode,
+    processScannedCodes,
     withdrawMaterial,
     returnMaterial
 };
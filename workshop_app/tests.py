@@ -1,3 +1,1333 @@
-from django.test import TestCase
+import base64
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from workshop_app.models import (
+    AttachmentType, Job, JobFinancial, JobStatus, Machine, MachineType, MachineUsage, MachineUtilization,
+    JobMaterial, Material, MaterialAttachment, MaterialCategory, MaterialTransaction, MaterialType, Operator,
+    ScanHistory, StaffSettings,
+)
+from workshop_app.models.job_time_tracking import JobTimeTracking, TimesheetDay
+from workshop_app.utils.keyset_pagination import decode_cursor, encode_cursor, paginate_keyset
+from workshop_app.utils.barcode_utils import qr_cache_key, render_qr_code, validate_job_id
+from workshop_app.utils.operator_context import get_operator_context
+from workshop_app.utils.scan_resolver import scan_index
+from workshop_app.utils.staff_context import get_staff_context
+from workshop_app.utils.id_allocator import next_machine_id, next_material_id, reserve_job_ids, reserve_material_ids
+from workshop_app.utils.job_references import backfill_job_references
+from workshop_app.utils.job_costs import COST_FIELDS, add_machine_costs, rebuild_job_costs
+from workshop_app.utils import dashboard_cache
+from workshop_app.utils.material_search import SEARCH_CANDIDATE_LIMIT, filter_materials, rebuild_index, search_backend, search_materials
+from workshop_app.utils.machine_scheduler import ReservationConflict, book_reservation, find_conflict, next_free_slot
+from workshop_app.utils.machine_utilization import rebuild_utilization, record_usages, usage_buckets, utilization_report
+from workshop_app.utils.machine_sessions import close_usage, save_closed_usage, sweep_stale_sessions
+from workshop_app.utils.timesheets import rebuild_timesheets, timesheet
+from workshop_app.utils import stock_ledger
+from workshop_app.views import scanning_views
+from workshop_app.views.material_views import list_views
+from workshop_app.views.material_views.list_views import MATERIAL_SORT_FIELDS
+from workshop_app.utils.stock_ledger import (
+    InsufficientStock, JobMaterialLine, StockContention, record_job_materials, restock, withdraw_many, withdraw_stock,
+)
+
+
+def create_job(job_id='J-JOB-000125', **fields):
+    status, _ = JobStatus.objects.get_or_create(
+        name='Active', defaults={'description': '', 'color_code': '#4CAF50', 'order': 1}
+    )
+    defaults = {'project_name': job_id, 'description': '', 'priority': 'low', 'qr_code': '', 'status': status}
+    defaults.update(fields)
+    return Job.objects.create(job_id=job_id, **defaults)
+
+
+def create_machine(machine_id='MC-3DP-00001', **fields):
+    machine_type, _ = MachineType.objects.get_or_create(code='3DP', defaults={'name': 'Printer', 'description': ''})
+    defaults = {
+        'machine_type': machine_type, 'name': machine_id, 'manufacturer': '', 'model_number': '',
+        'serial_number': '', 'location_in_workshop': '', 'supplier': '', 'working_area': '',
+        'power_requirements': '', 'maximum_work_speed': '', 'precision': '', 'status': 'available',
+        'qr_code': '', 'notes': '',
+    }
+    defaults.update(fields)
+    return Machine.objects.create(machine_id=machine_id, **defaults)
+
+
+def create_material_fields(material_id='FLMRL-PLA-00001', **fields):
+    category, _ = MaterialCategory.objects.get_or_create(code='FLMRL', defaults={'name': 'Filament', 'description': ''})
+    material_type, _ = MaterialType.objects.get_or_create(
+        code='PLA', category=category, defaults={'name': 'PLA', 'description': ''}
+    )
+    defaults = {
+        'material_id': material_id, 'name': material_id, 'material_type': material_type, 'color': '',
+        'dimensions': '', 'unit_of_measurement': 'kg', 'supplier_name': '', 'brand_name': '',
+        'current_stock': Decimal('10.00'), 'location_in_workshop': '', 'project_association': '', 'notes': '',
+        'qr_code': '', 'serial_number': '', 'supplier_sku': '',
+    }
+    defaults.update(fields)
+    return defaults
+
+
+def create_material(material_id='FLMRL-PLA-00001', **fields):
+    return Material.objects.create(**create_material_fields(material_id, **fields))
+
+
+def create_operator(user, hourly_rate, operator_id='OP-00001'):
+    return Operator.objects.create(
+        user=user, operator_id=operator_id, specialization='', skill_level='expert',
+        hourly_rate=hourly_rate, special_skills='', productivity_factor=Decimal('1.00'),
+    )
+
+
+class MaterialListQueryCountTests(TestCase):
+    """The material list must not issue per-row queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('stores', password='password')
+        category = MaterialCategory.objects.create(code='FLMRL', name='Filament', description='')
+        cls.material_types = [
+            MaterialType.objects.create(code=code, name=code, description='', category=category)
+            for code in ('PLA', 'ABS', 'PETG')
+        ]
+        cls.product_type, _ = AttachmentType.objects.get_or_create(id=3, defaults={'name': 'Product'})
+
+    def create_materials(self, count):
+        start = Material.objects.count()
+        for number in range(start, start + count):
+            material = Material.objects.create(
+                material_id=f'FLMRL-PLA-{number:05d}',
+                name=f'Spool {number}',
+                material_type=self.material_types[number % len(self.material_types)],
+                color='black',
+                dimensions='1.75 mm',
+                unit_of_measurement='kg',
+                supplier_name='',
+                brand_name='',
+                current_stock=Decimal('1.00'),
+                location_in_workshop='Shelf A',
+                project_association='',
+                notes='',
+                qr_code='',
+                serial_number='',
+                supplier_sku='',
+            )
+            MaterialAttachment.objects.create(
+                material=material,
+                attachment_type=self.product_type,
+                custom_type='',
+                description='',
+                file=f'material_attachments/spool-{number}.jpg',
+            )
+
+    def count_list_queries(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('material_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_materials(2)
+        baseline, response = self.count_list_queries()
+        self.assertEqual(len(response.context['materials']), 2)
+
+        self.create_materials(20)
+        queries, response = self.count_list_queries()
+        self.assertEqual(len(response.context['materials']), 22)
+        self.assertEqual(queries, baseline)
+
+    def test_latest_product_image_is_shown(self):
+        self.create_materials(1)
+        material = Material.objects.get()
+        MaterialAttachment.objects.create(
+            material=material,
+            attachment_type=self.product_type,
+            custom_type='',
+            description='',
+            file='material_attachments/newer.jpg',
+        )
+        _, response = self.count_list_queries()
+        self.assertContains(response, '/media/material_attachments/newer.jpg')
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages must cover every row once, in order, in both directions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='stores')
+        categories = [
+            MaterialCategory.objects.create(code=code, name=name, description='')
+            for code, name in (('FLMRL', 'Filament'), ('HWARE', 'Hardware'))
+        ]
+        material_types = [
+            MaterialType.objects.create(code=code, name=code, description='', category=category)
+            for code, category in (('PLA', categories[0]), ('ABS', categories[0]), ('BOLT', categories[1]))
+        ]
+        # Few distinct values per sort key so ties have to be broken by pk
+        for number in range(7):
+            create_material(
+                f'HW-GEN-{6 - number:05d}',
+                name=f'Spool {number % 3}',
+                material_type=material_types[number % 3],
+                color=('black', 'white')[number % 2],
+                current_stock=Decimal(number % 3),
+                location_in_workshop=f'Shelf {"AB"[number % 2]}',
+            )
+
+    def walk_forward(self, key, fields, page_size=2):
+        pages, cursor = [], None
+        while True:
+            page = paginate_keyset(Material.objects.all(), key, fields, page_size, after=cursor)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def walk_backward(self, key, fields, cursor, page_size=2):
+        pages = []
+        while cursor:
+            page = paginate_keyset(Material.objects.all(), key, fields, page_size, before=cursor)
+            pages.insert(0, page)
+            cursor = page.previous_cursor
+        return pages
+
+    def assert_pages_cover(self, pages, fields):
+        expected = list(Material.objects.order_by(*fields).values_list('pk', flat=True))
+        self.assertEqual([material.pk for page in pages for material in page], expected)
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor('stock', [Decimal('2.50'), 17])
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor, 'stock', 2), ['2.50', '17'])
+
+    def test_invalid_cursors_are_ignored(self):
+        cursor = encode_cursor('stock', [Decimal('2.50'), 17])
+        self.assertIsNone(decode_cursor(cursor, 'name', 2))
+        self.assertIsNone(decode_cursor(cursor, 'stock', 3))
+        self.assertIsNone(decode_cursor('', 'stock', 2))
+        self.assertIsNone(decode_cursor('not a cursor!', 'stock', 2))
+        self.assertIsNone(decode_cursor(cursor[:-3], 'stock', 2))
+        not_a_list = base64.urlsafe_b64encode(b'{"stock": 1}').decode()
+        self.assertIsNone(decode_cursor(not_a_list, 'stock', 2))
+
+    def test_every_sort_pages_forward_and_back(self):
+        for key, fields in MATERIAL_SORT_FIELDS.items():
+            with self.subTest(sort=key):
+                pages = self.walk_forward(key, fields)
+                self.assertEqual(len(pages), 4)
+                self.assert_pages_cover(pages, fields)
+                self.assertFalse(pages[0].has_previous)
+                self.assertTrue(all(page.has_previous for page in pages[1:]))
+
+                # Paging back from the last page returns the same pages
+                backward = self.walk_backward(key, fields, pages[-1].previous_cursor)
+                self.assertEqual(
+                    [[material.pk for material in page] for page in backward],
+                    [[material.pk for material in page] for page in pages[:-1]],
+                )
+                self.assertTrue(all(page.has_next for page in backward))
+
+    def test_descending_fields_seek_the_other_way(self):
+        for fields in (('-current_stock', 'pk'), ('-current_stock', '-pk'), ('current_stock', '-pk')):
+            with self.subTest(fields=fields):
+                pages = self.walk_forward('stock', fields, page_size=3)
+                self.assert_pages_cover(pages, fields)
+                backward = self.walk_backward('stock', fields, pages[-1].previous_cursor, page_size=3)
+                self.assert_pages_cover(backward + pages[-1:], fields)
+
+    def test_cursor_from_another_sort_starts_over(self):
+        cursor = self.walk_forward('name', MATERIAL_SORT_FIELDS['name'])[0].next_cursor
+        page = paginate_keyset(Material.objects.all(), 'stock', MATERIAL_SORT_FIELDS['stock'], 2, after=cursor)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(
+            [material.pk for material in page],
+            list(Material.objects.order_by('current_stock', 'pk').values_list('pk', flat=True)[:2]),
+        )
+
+    def test_list_view_follows_cursors(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(list_views, 'MATERIAL_LIST_PAGE_SIZE', 4):
+            first = self.client.get(reverse('material_list'), {'sort': 'stock'})
+            page_obj = first.context['page_obj']
+            self.assertTrue(page_obj.has_next)
+            self.assertContains(first, f'after={page_obj.next_cursor}')
+
+            second = self.client.get(reverse('material_list'), {'sort': 'stock', 'after': page_obj.next_cursor})
+            self.assertEqual(len(second.context['materials']), 3)
+            self.assertContains(second, f'before={second.context["page_obj"].previous_cursor}')
+
+            tampered = self.client.get(reverse('material_list'), {'sort': 'stock', 'after': 'x' + page_obj.next_cursor})
+        self.assertEqual(tampered.status_code, 200)
+        self.assertEqual(
+            [material.pk for material in tampered.context['materials']],
+            [material.pk for material in page_obj.object_list],
+        )
+
+
+class StockLedgerConcurrencyTests(TransactionTestCase):
+    """Parallel withdrawals must neither lose updates nor oversell stock"""
+
+    workers = 8
+    withdrawals_per_worker = 10
+
+    def setUp(self):
+        category = MaterialCategory.objects.create(code='SHEET', name='Sheet', description='')
+        material_type = MaterialType.objects.create(code='ACR3', name='Acrylic 3mm', description='', category=category)
+        self.material = Material.objects.create(
+            material_id='SHEET-ACR3-00001',
+            name='Clear acrylic',
+            material_type=material_type,
+            color='clear',
+            dimensions='600x400',
+            unit_of_measurement='sheet',
+            supplier_name='',
+            brand_name='',
+            current_stock=Decimal('100.00'),
+            minimum_stock_level=Decimal('5.00'),
+            location_in_workshop='Rack B',
+            project_association='',
+            notes='',
+            qr_code='',
+            serial_number='',
+            supplier_sku='',
+        )
+
+    def run_withdrawers(self, quantity):
+        """Withdraw `quantity` from every worker at once; return (successes, shortages)"""
+        barrier = threading.Barrier(self.workers)
+        results = []
+        lock = threading.Lock()
+
+        def withdraw():
+            material = Material.objects.get(pk=self.material.pk)
+            barrier.wait()
+            for _ in range(self.withdrawals_per_worker):
+                while True:
+                    try:
+                        withdraw_stock(material, quantity)
+                        outcome = 'ok'
+                    except InsufficientStock:
+                        outcome = 'short'
+                    except OperationalError:
+                        # SQLite's shared-cache test database reports lock
+                        # contention instead of waiting; try again
+                        time.sleep(0.001)
+                        continue
+                    break
+                with lock:
+                    results.append(outcome)
+            connection.close()
+
+        threads = [threading.Thread(target=withdraw) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results.count('ok'), results.count('short')
+
+    def test_no_lost_updates(self):
+        successes, shortages = self.run_withdrawers(Decimal('1.00'))
+
+        self.material.refresh_from_db()
+        self.assertEqual(successes, self.workers * self.withdrawals_per_worker)
+        self.assertEqual(shortages, 0)
+        self.assertEqual(self.material.current_stock, Decimal('20.00'))
+
+    def test_stock_never_goes_negative(self):
+        successes, shortages = self.run_withdrawers(Decimal('3.00'))
+
+        self.material.refresh_from_db()
+        self.assertEqual(successes, 33)
+        self.assertEqual(shortages, self.workers * self.withdrawals_per_worker - 33)
+        self.assertEqual(self.material.current_stock, Decimal('1.00'))
+        self.assertTrue(self.material.minimum_stock_alert)
+
+
+class StaleSessionSweepTests(TestCase):
+    """A session closed by the sweeper must not be closed and counted again"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', password='password')
+        self.job = create_job()
+        now = timezone.now()
+        self.machine = create_machine(
+            status='in_use', current_job=self.job, reserved_until=now - timedelta(hours=2),
+            hourly_rate=Decimal('60.00'),
+        )
+        self.usage = MachineUsage.objects.create(
+            machine=self.machine, job=self.job, operator_user=self.user, job_reference=self.job.job_id,
+            operator_name='operator', start_time=now - timedelta(hours=3), setup_time=0, notes='',
+        )
+
+    def assertCountedOnce(self):
+        usage = MachineUsage.objects.get(pk=self.usage.pk)
+        self.assertEqual(
+            MachineUtilization.objects.filter(period='day').values_list('usage_count', flat=True).get(), 1
+        )
+        self.assertEqual(JobFinancial.objects.get(job=self.job).machine_cost, usage.total_cost)
+
+    def test_stop_after_sweep_is_rejected(self):
+        self.assertEqual(len(sweep_stale_sessions()), 1)
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('stop_machine_usage', args=[self.machine.machine_id]),
+            {'cleanup_time': 5},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertFalse(response.json()['success'])
+        self.assertCountedOnce()
+
+    def test_usage_read_before_sweep_is_not_closed_twice(self):
+        usage = MachineUsage.objects.get(pk=self.usage.pk)
+        sweep_stale_sessions()
+
+        close_usage(usage, self.machine, timezone.now(), 5)
+        self.assertFalse(save_closed_usage(usage))
+        self.assertCountedOnce()
+
+
+class MachineUtilizationTests(TestCase):
+    """Usages are split into hour and day buckets that the report adds back up"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='planner')
+        cls.machine = create_machine()
+        # 22:30 to 01:15 UTC the next day: four hour buckets, two day buckets
+        cls.usage = cls.create_usage(datetime(2026, 3, 1, 22, 30), datetime(2026, 3, 2, 1, 15))
+        cls.create_usage(datetime(2026, 3, 2, 9, 0), datetime(2026, 3, 2, 9, 45))
+
+    @classmethod
+    def create_usage(cls, start, end):
+        return MachineUsage.objects.create(
+            machine=cls.machine, job_reference='', operator_name='planner', notes='',
+            start_time=timezone.make_aware(start), end_time=timezone.make_aware(end),
+            setup_time=10, cleanup_time=5, total_cost=Decimal('12.50'),
+        )
+
+    def bucket_rows(self):
+        return set(MachineUtilization.objects.values_list(
+            'period', 'bucket_start', 'run_minutes', 'setup_minutes', 'cleanup_minutes', 'total_cost', 'usage_count',
+        ))
+
+    def test_usage_is_split_across_hours_and_days(self):
+        buckets = [
+            (period, bucket_start.strftime('%d %H:%M'), increments)
+            for period, bucket_start, increments in usage_buckets(self.usage)
+        ]
+        started = {'setup_minutes': 10, 'cleanup_minutes': 5, 'total_cost': Decimal('12.50'), 'usage_count': 1}
+        self.assertEqual(buckets, [
+            ('hour', '01 22:00', {'run_minutes': Decimal('30.00'), **started}),
+            ('hour', '01 23:00', {'run_minutes': Decimal('60.00')}),
+            ('hour', '02 00:00', {'run_minutes': Decimal('60.00')}),
+            ('hour', '02 01:00', {'run_minutes': Decimal('15.00')}),
+            ('day', '01 00:00', {'run_minutes': Decimal('90.00'), **started}),
+            ('day', '02 00:00', {'run_minutes': Decimal('75.00')}),
+        ])
+
+    def test_rebuild_matches_recording_each_usage(self):
+        record_usages(list(MachineUsage.objects.all()))
+        recorded = self.bucket_rows()
+        self.assertEqual(len(recorded), 7)
+
+        self.assertEqual(rebuild_utilization(), 2)
+        self.assertEqual(self.bucket_rows(), recorded)
+        # Rebuilding replaces the buckets instead of adding to them
+        rebuild_utilization()
+        self.assertEqual(self.bucket_rows(), recorded)
+
+    def test_report_reads_days_and_partial_hours(self):
+        rebuild_utilization()
+        report = utilization_report(
+            timezone.make_aware(datetime(2026, 3, 1, 23, 0)), timezone.make_aware(datetime(2026, 3, 3, 0, 0))
+        )
+        row = report['machines'][0]
+        # 60 minutes from the 23:00 bucket plus the whole of the 2nd
+        self.assertEqual(row['run_minutes'], Decimal('180.00'))
+        self.assertEqual(row['usage_count'], 1)
+        self.assertEqual(row['utilization'], Decimal('180.00') / (25 * 60) * 100)
+
+    def test_report_view(self):
+        rebuild_utilization()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('machine_utilization'), {'start': '2026-03-01', 'end': '2026-03-02'})
+
+        self.assertEqual(response.status_code, 200)
+        row = response.context['report']['machines'][0]
+        self.assertEqual((row['run_minutes'], row['usage_count']), (Decimal('210.00'), 2))
+
+    def test_impossible_dates_are_rejected(self):
+        self.client.force_login(self.user)
+        for params in ({'start': '2026-02-30'}, {'end': '2026-13-01'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('machine_utilization'), params)
+                self.assertEqual(response.status_code, 400)
+
+
+class JobReferenceBackfillTests(TestCase):
+    """Legacy job_reference / operator_name strings become foreign keys"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.job = create_job()
+        cls.machine = create_machine(hourly_rate=Decimal('60.00'))
+        cls.alex = User.objects.create(username='alex', first_name='Alex', last_name='Smith')
+        cls.sam = User.objects.create(username='sam', first_name='Sam', last_name='Jones')
+        # Two users share a full name, so that name maps to neither
+        cls.chris = User.objects.create(username='chris', first_name='Chris', last_name='Lee')
+        User.objects.create(username='clee', first_name='Chris', last_name='Lee')
+        material = create_material()
+
+        def transaction_row(job_reference, operator_name):
+            return MaterialTransaction.objects.create(
+                material=material, quantity=Decimal('1.00'), transaction_type='withdrawal',
+                job_reference=job_reference, operator_name=operator_name, notes='',
+            )
+
+        cls.by_full_name = transaction_row('J-JOB-000125', 'Alex Smith')
+        cls.no_job = transaction_row('RESTOCK', 'sam')
+        cls.ambiguous = transaction_row('J-JOB-999999', 'Chris Lee')
+        cls.usage = cls.legacy_usage(operator_name='chris', end_time=timezone.now())
+
+    @classmethod
+    def legacy_usage(cls, **fields):
+        return MachineUsage.objects.create(
+            machine=cls.machine, job_reference='J-JOB-000125', start_time=timezone.now() - timedelta(hours=1),
+            notes='', **{'operator_name': 'alex', **fields},
+        )
+
+    def links(self):
+        return {
+            row: model.objects.values_list('job_id', 'operator_user_id').get(pk=row.pk)
+            for model, rows in ((MaterialTransaction, (self.by_full_name, self.no_job, self.ambiguous)),
+                                (MachineUsage, (self.usage,)))
+            for row in rows
+        }
+
+    def test_backfill_links_jobs_and_operators(self):
+        results = backfill_job_references(batch_size=2)
+
+        self.assertEqual(results, {'MaterialTransaction': (1, 2), 'MachineUsage': (1, 1)})
+        self.assertEqual(self.links(), {
+            self.by_full_name: (self.job.pk, self.alex.pk),
+            self.no_job: (None, self.sam.pk),
+            self.ambiguous: (None, None),
+            self.usage: (self.job.pk, self.chris.pk),
+        })
+
+    def test_rerun_changes_nothing(self):
+        backfill_job_references(batch_size=2)
+        links = self.links()
+
+        self.assertEqual(backfill_job_references(batch_size=2), {'MaterialTransaction': (0, 0), 'MachineUsage': (0, 0)})
+        self.assertEqual(self.links(), links)
+
+    def test_legacy_session_gets_its_job_when_closed(self):
+        usage = self.legacy_usage()
+        self.assertIsNone(usage.job_id)
+
+        close_usage(usage, self.machine, usage.start_time + timedelta(minutes=30), 0)
+        self.assertTrue(save_closed_usage(usage))
+        add_machine_costs([usage])
+
+        self.assertEqual(MachineUsage.objects.get(pk=usage.pk).job_id, self.job.pk)
+        self.assertEqual(JobFinancial.objects.get(job=self.job).machine_cost, Decimal('30.00'))
+
+
+class MachineBoardEventsTests(TestCase):
+    """Without a streaming server the board gets a finite snapshot to poll"""
+
+    def test_wsgi_request_gets_snapshot_and_retry(self):
+        create_machine()
+        self.client.force_login(User.objects.create_user('viewer', password='password'))
+
+        response = self.client.get(reverse('machine_board_events'))
+
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('event: snapshot', body)
+        self.assertIn('MC-3DP-00001', body)
+        self.assertIn('event: end', body)
+
+
+class LabelSheetTests(TestCase):
+    """Label sheets rendered by the web server are capped by MAX_LABELS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='stores')
+        for number in range(1, 4):
+            create_machine(f'MC-3DP-{number:05d}')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @override_settings(MAX_LABELS=3)
+    def test_sheet_within_the_cap_is_rendered(self):
+        response = self.client.get(reverse('label_sheet', args=['machine']), {'format': 'svg'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Label-Count'], '3')
+        self.assertIn(b'MC-3DP-00003', b''.join(response.streaming_content))
+
+    @override_settings(MAX_LABELS=2)
+    def test_sheet_over_the_cap_is_rejected(self):
+        response = self.client.get(reverse('label_sheet', args=['machine']), {'format': 'svg'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'at most 2', response.content)
+
+
+class QRDiskCacheTests(TestCase):
+    """Arbitrary codes must not grow the QR disk cache without bound"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        render_qr_code.cache_clear()
+        self.addCleanup(render_qr_code.cache_clear)
+
+    def test_least_recently_used_images_are_pruned(self):
+        with override_settings(QR_CACHE_DIR=self.cache_dir.name, QR_CACHE_MAX_FILES=10):
+            for number in range(25):
+                render_qr_code(f'CODE-{number}')
+                # Distinct ages, whatever the file system's timestamp resolution
+                path = os.path.join(self.cache_dir.name, f"{qr_cache_key(f'CODE-{number}')}.png")
+                if os.path.exists(path):
+                    os.utime(path, (number, number))
+            files = os.listdir(self.cache_dir.name)
+
+        self.assertLessEqual(len(files), 10)
+        self.assertIn(f"{qr_cache_key('CODE-24')}.png", files)
+        self.assertNotIn(f"{qr_cache_key('CODE-0')}.png", files)
+
+
+class ScanIndexTests(TestCase):
+    """Index hits are checked against the database"""
+
+    def setUp(self):
+        scan_index.clear()
+        self.addCleanup(scan_index.clear)
+        self.job = create_job()
+
+    def test_rename_elsewhere_is_not_a_stale_hit(self):
+        self.assertEqual(scan_index.resolve('J-JOB-000125', 'job').pk, self.job.pk)
+
+        # A queryset update sends no signal, like a save in another process
+        Job.objects.filter(pk=self.job.pk).update(job_id='J-JOB-000126')
+
+        self.assertIsNone(scan_index.resolve('J-JOB-000125', 'job'))
+        self.assertEqual(scan_index.resolve_many([('J-JOB-000125', 'job')]), {'J-JOB-000125': None})
+        self.assertEqual(scan_index.resolve('J-JOB-000126', 'job').pk, self.job.pk)
+
+    def test_delete_elsewhere_is_not_a_stale_hit(self):
+        scan_index.resolve('J-JOB-000125', 'job')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM workshop_app_job WHERE id = %s', [self.job.pk])
+
+        self.assertIsNone(scan_index.resolve('J-JOB-000125', 'job'))
+
+    def test_index_is_updated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.job_id = 'J-JOB-000127'
+            self.job.save()
+            self.assertIsNone(scan_index._lookup('J-JOB-000127', ('job_id',)))
+        self.assertEqual(scan_index._lookup('J-JOB-000127', ('job_id',))[1].pk, self.job.pk)
+
+    def test_warm_index_hit_costs_one_query(self):
+        scan_index.warm_up()
+        self.assertIsNotNone(scan_index._lookup('J-JOB-000125', ('job_id',)))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(scan_index.resolve('J-JOB-000125', 'job').pk, self.job.pk)
+
+    @override_settings(SCAN_RESOLVER_WARM_ON_START=True)
+    def test_index_warms_when_the_app_starts(self):
+        with mock.patch.object(scan_index, 'warm_up') as warm_up:
+            apps.get_app_config('workshop_app').ready()
+            for thread in threading.enumerate():
+                if thread.name == 'scan-index-warm-up':
+                    thread.join()
+        warm_up.assert_called_once_with()
+
+
+class BatchScanTests(TestCase):
+    """A batch of codes is resolved together and recorded in one insert"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='stocktake')
+        cls.job = create_job()
+        cls.material = create_material()
+        cls.machine = create_machine()
+
+    def setUp(self):
+        scan_index.clear()
+        self.addCleanup(scan_index.clear)
+        self.client.force_login(self.user)
+
+    def post_codes(self, codes):
+        return self.client.post(
+            reverse('process_batch_scan'), data=json.dumps({'codes': codes}), content_type='application/json'
+        )
+
+    def test_batch_records_history_in_one_insert(self):
+        codes = ['J-JOB-000125', 'FLMRL-PLA-00001', 'MC-3DP-00001', 'NOPE']
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_codes(codes)
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual((payload['resolved'], payload['unresolved']), (3, 1))
+        self.assertEqual(
+            [result.get('type') for result in payload['results']], ['job', 'material', 'machine', None]
+        )
+        inserts = [query for query in context.captured_queries
+                   if query['sql'].startswith('INSERT INTO "workshop_app_scanhistory"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(ScanHistory.objects.filter(user=self.user).values_list('item_id', flat=True)),
+            ['FLMRL-PLA-00001', 'J-JOB-000125', 'MC-3DP-00001'],
+        )
+
+    def test_form_fields_are_accepted(self):
+        response = self.client.post(reverse('process_batch_scan'), {'codes': ['J-JOB-000125', 'MC-3DP-00001']})
+        self.assertEqual(response.json()['resolved'], 2)
+
+    def test_codes_must_be_a_list(self):
+        for codes in ('J-JOB-000125', {'code': 'J-JOB-000125'}, 125):
+            with self.subTest(codes=codes):
+                response = self.post_codes(codes)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        self.assertFalse(ScanHistory.objects.exists())
+
+    def test_invalid_json_is_rejected(self):
+        response = self.client.post(reverse('process_batch_scan'), data='{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_size_is_capped(self):
+        with mock.patch.object(scanning_views, 'MAX_BATCH_SCAN_CODES', 3):
+            self.assertEqual(self.post_codes(['J-JOB-000125'] * 3).status_code, 200)
+            response = self.post_codes(['J-JOB-000125'] * 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('maximum 3', response.json()['error'])
+        self.assertEqual(ScanHistory.objects.count(), 3)
+
+
+class JobCostRollupTests(TestCase):
+    """Costs added by the write paths match a rebuild from the raw tables"""
+
+    def test_deltas_match_rebuild(self):
+        user = User.objects.create_user('machinist', password='password')
+        create_operator(user, Decimal('42.50'))
+        jobs = [create_job('J-JOB-000125'), create_job('J-JOB-000126')]
+        material = create_material(price_per_unit=Decimal('3.33'))
+        machine = create_machine(hourly_rate=Decimal('17.00'))
+        now = timezone.now()
+
+        # Materials, including a return
+        record_job_materials([
+            JobMaterialLine(jobs[0], material, Decimal('2.50')),
+            JobMaterialLine(jobs[1], material, Decimal('1.25')),
+        ], added_by='machinist')
+        record_job_materials([JobMaterialLine(jobs[0], material, Decimal('-0.75'))], added_by='machinist', result='returned')
+
+        # Labor: odd durations so rounding would show
+        for job, minutes in ((jobs[0], 37), (jobs[1], 101), (jobs[0], 13)):
+            entry = JobTimeTracking.objects.create(
+                user=user, job=job, start_time=now - timedelta(minutes=minutes, seconds=7, microseconds=123457), notes='',
+            )
+            JobTimeTracking.close_entry(entry, end_time=now)
+
+        # Machine time
+        for job, minutes in ((jobs[0], 53), (jobs[1], 7)):
+            usage = MachineUsage.objects.create(
+                machine=machine, job=job, operator_user=user, job_reference=job.job_id, operator_name='machinist',
+                start_time=now - timedelta(minutes=minutes), setup_time=0, notes='',
+            )
+            close_usage(usage, machine, now, 4)
+            self.assertTrue(save_closed_usage(usage))
+            add_machine_costs([usage])
+
+        incremental = {
+            financial.job_id: [getattr(financial, field) for field in COST_FIELDS]
+            for financial in JobFinancial.objects.all()
+        }
+        self.assertEqual(len(incremental), 2)
+
+        with CaptureQueriesContext(connection) as context:
+            rebuild_job_costs()
+        # Grouped per job: one query per cost, however many rows
+        self.assertLessEqual(len(context.captured_queries), 10)
+        rebuilt = {
+            financial.job_id: [getattr(financial, field) for field in COST_FIELDS]
+            for financial in JobFinancial.objects.all()
+        }
+        self.assertEqual(incremental, rebuilt)
+
+
+class JobMaterialRecordingTests(TestCase):
+    """Material usage is written with one INSERT however many lines there are"""
+
+    def test_lines_are_inserted_together(self):
+        jobs = [create_job('J-JOB-000125'), create_job('J-JOB-000126')]
+        materials = [
+            create_material(f'HW-GEN-{number:05d}', price_per_unit=Decimal('1.10')) for number in range(1, 6)
+        ]
+        lines = [JobMaterialLine(job, material, Decimal('2.00')) for job in jobs for material in materials]
+
+        with CaptureQueriesContext(connection) as context:
+            job_materials = record_job_materials(lines, added_by='stores')
+
+        inserts = [query for query in context.captured_queries
+                   if query['sql'].startswith('INSERT INTO "workshop_app_jobmaterial"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertTrue(all(job_material.pk for job_material in job_materials))
+        self.assertEqual(JobMaterial.objects.count(), 10)
+        self.assertEqual(
+            sorted(JobFinancial.objects.values_list('material_cost', flat=True)), [Decimal('11.00')] * 2
+        )
+
+
+class TimesheetTests(TestCase):
+    """Timesheet rollups, access checks and CSV export"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('fitter', password='password', first_name='=HYPERLINK("x")')
+        self.job = create_job(project_name='@SUM(A1:A9)')
+
+    def track(self, start, end, job=None):
+        entry = JobTimeTracking.objects.create(user=self.user, job=job or self.job, start_time=start, notes='')
+        JobTimeTracking.close_entry(entry, end_time=end)
+        return entry
+
+    def rollup(self):
+        return sorted(TimesheetDay.objects.values_list('user_id', 'job_id', 'day', 'seconds', 'entry_count'))
+
+    def test_entry_across_midnight_is_split(self):
+        start = timezone.make_aware(datetime(2026, 3, 9, 22, 30))
+        self.track(start, start + timedelta(hours=3))
+
+        rows = timesheet(start.date(), start.date() + timedelta(days=1), user=self.user)
+        self.assertEqual(
+            [(row['day'], row['seconds'], row['entry_count']) for row in rows],
+            [(start.date(), 5400, 1), (start.date() + timedelta(days=1), 5400, 0)],
+        )
+
+    def test_rollups_match_rebuild(self):
+        other_job = create_job('J-JOB-000126')
+        start = timezone.make_aware(datetime(2026, 3, 9, 8, 0))
+        for offset_hours, minutes, job in ((0, 95, self.job), (3, 41, other_job), (15, 600, self.job), (40, 17, self.job)):
+            # Fractional seconds, so rounding would show
+            entry_start = start + timedelta(hours=offset_hours, microseconds=600000)
+            self.track(entry_start, entry_start + timedelta(minutes=minutes, microseconds=300000), job)
+
+        incremental = self.rollup()
+        rebuild_timesheets()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_non_staff_cannot_probe_other_users(self):
+        User.objects.create_user('someone', password='password')
+        self.client.force_login(self.user)
+
+        errors = []
+        for user_param in ('someone', 'nobody', 'all'):
+            response = self.client.get(reverse('api_timesheets'), {'user': user_param})
+            self.assertEqual(response.status_code, 400)
+            errors.append(response.json()['error'])
+        self.assertEqual(len(set(errors)), 1)
+
+        response = self.client.get(reverse('api_timesheets'), {'user': 'fitter'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_csv_cells_are_not_formulas(self):
+        start = timezone.now() - timedelta(hours=1)
+        self.track(start, start + timedelta(minutes=30))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('api_timesheets_csv'), {
+            'from': timezone.localdate(start).isoformat(), 'to': timezone.localdate().isoformat(),
+        })
+        body = response.content.decode()
+        self.assertIn("'@SUM(A1:A9)", body)
+        self.assertIn("'=HYPERLINK", body)
+
+
+class OpenTimeEntryTests(TestCase):
+    """One open time entry per user, counted once when it closes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('welder', password='password')
+        create_operator(self.user, Decimal('30.00'))
+        self.job = create_job()
+
+    def test_second_open_entry_is_rejected(self):
+        JobTimeTracking.objects.create(user=self.user, job=self.job, start_time=timezone.now(), notes='')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            JobTimeTracking.objects.create(user=self.user, job=self.job, start_time=timezone.now(), notes='')
+
+    def test_double_close_counts_once(self):
+        now = timezone.now()
+        entry = JobTimeTracking.objects.create(user=self.user, job=self.job, start_time=now - timedelta(hours=2), notes='')
+        stale_copy = JobTimeTracking.objects.get(pk=entry.pk)
+
+        self.assertTrue(JobTimeTracking.close_entry(entry, end_time=now))
+        self.assertFalse(JobTimeTracking.close_entry(stale_copy, end_time=now + timedelta(minutes=5)))
+
+        self.assertEqual(JobFinancial.objects.get(job=self.job).labor_cost, Decimal('60.00'))
+        self.assertEqual(sum(TimesheetDay.objects.values_list('entry_count', flat=True)), 1)
+        self.assertEqual(sum(TimesheetDay.objects.values_list('seconds', flat=True)), 7200)
+
+    def test_switching_jobs_closes_the_previous_entry(self):
+        other_job = create_job('J-JOB-000126')
+        first = JobTimeTracking.start_tracking(self.job, self.user)
+        self.assertEqual(JobTimeTracking.start_tracking(self.job, self.user), first)
+
+        second = JobTimeTracking.start_tracking(other_job, self.user)
+        self.assertEqual(JobTimeTracking.get_active_entry(self.user), second)
+        self.assertIsNotNone(JobTimeTracking.objects.get(pk=first.pk).end_time)
+
+    def test_failed_switch_keeps_the_previous_entry_open(self):
+        first = JobTimeTracking.objects.create(
+            user=self.user, job=self.job, start_time=timezone.now() - timedelta(hours=1), notes='',
+        )
+        with mock.patch.object(JobTimeTracking.objects, 'create', side_effect=IntegrityError) as create:
+            with self.assertRaises(IntegrityError):
+                JobTimeTracking.start_tracking(create_job('J-JOB-000126'), self.user)
+        self.assertEqual(create.call_count, 3)
+
+        self.assertEqual(JobTimeTracking.get_active_entry(self.user), first)
+        self.assertFalse(JobFinancial.objects.filter(job=self.job).exists())
+        self.assertFalse(TimesheetDay.objects.exists())
+
+    def test_entries_closed_by_migration_feed_rollups(self):
+        migration = importlib.import_module('workshop_app.migrations.0023_one_open_time_entry_per_user')
+        start = timezone.make_aware(datetime(2026, 3, 9, 21, 15))
+        # Created closed, as close_duplicate_open_entries leaves them
+        entries = [
+            JobTimeTracking.objects.create(
+                user=self.user, job=self.job, start_time=start + timedelta(hours=hours),
+                end_time=start + timedelta(hours=hours, minutes=minutes), notes='',
+            )
+            for hours, minutes in ((0, 200), (5, 47))
+        ]
+
+        migration.add_to_rollups(apps, entries)
+        fed = (
+            sorted(TimesheetDay.objects.values_list('day', 'seconds', 'entry_count')),
+            JobFinancial.objects.get(job=self.job).labor_cost,
+        )
+        rebuild_timesheets()
+        rebuild_job_costs()
+        self.assertEqual(fed, (
+            sorted(TimesheetDay.objects.values_list('day', 'seconds', 'entry_count')),
+            JobFinancial.objects.get(job=self.job).labor_cost,
+        ))
+
+
+class MachineReservationTests(TestCase):
+    """Reservations are half-open intervals: touching slots do not conflict"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('planner', password='password')
+        self.machine = create_machine()
+        self.base = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        self.booked = book_reservation(self.machine, self.user, self.at(10), self.at(12))
+
+    def at(self, hour):
+        return self.base + timedelta(hours=hour)
+
+    def test_overlapping_slots_conflict(self):
+        book_reservation(self.machine, self.user, self.at(14), self.at(15))
+        for start, end in ((11, 13), (9, 11), (10, 12), (9, 13), (10.5, 11.5), (11.5, 14.5)):
+            with self.subTest(start=start, end=end):
+                with self.assertRaises(ReservationConflict):
+                    book_reservation(self.machine, self.user, self.at(start), self.at(end))
+
+    def test_touching_slots_do_not_conflict(self):
+        book_reservation(self.machine, self.user, self.at(12), self.at(13))
+        book_reservation(self.machine, self.user, self.at(8), self.at(10))
+        self.assertIsNone(find_conflict(self.machine, self.at(13), self.at(14)))
+
+    def test_moving_a_reservation_ignores_itself(self):
+        self.assertIsNone(find_conflict(self.machine, self.at(11), self.at(13), exclude_pk=self.booked.pk))
+
+    def test_next_free_slot_fits_between_reservations(self):
+        book_reservation(self.machine, self.user, self.at(13), self.at(15))
+        machine, start = next_free_slot(self.machine.machine_type, timedelta(hours=1), after=self.at(10))
+        self.assertEqual((machine, start), (self.machine, self.at(12)))
+
+
+class OperatorContextTests(TestCase):
+    """Certification checks cost one query per request, not one per machine"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='machinist')
+        cls.operator = create_operator(cls.user, Decimal('40.00'))
+        cls.machines = [create_machine(f'MC-3DP-{number:05d}') for number in range(1, 7)]
+        cls.operator.certified_machines.set(cls.machines[:2])
+
+    def test_one_query_for_every_machine(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        with self.assertNumQueries(1):
+            certified = [get_operator_context(request).is_certified_for(machine) for machine in self.machines]
+            # Primary keys work too, and later callers share the loaded set
+            self.assertTrue(get_operator_context(request).is_certified_for(self.machines[1].pk))
+        self.assertEqual(certified, [True, True, False, False, False, False])
+
+    def test_machine_list_query_count_does_not_grow(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('machine_list'))
+        self.assertEqual(len(response.context['certification_status']), 6)
+
+        for number in range(7, 13):
+            create_machine(f'MC-3DP-{number:05d}')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(reverse('machine_list'))
+        self.assertEqual(len(response.context['certification_status']), 12)
+
+
+class StaffContextTests(TestCase):
+    """Settings, both jobs and the open time entry come from one query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='machinist')
+        cls.job = create_job()
+        StaffSettings.objects.get(user=cls.user).set_active_job(cls.job)
+        cls.entry = JobTimeTracking.start_tracking(cls.job, cls.user, notes='milling')
+
+    def test_one_query_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        with self.assertNumQueries(1):
+            context = get_staff_context(request)
+            self.assertEqual(context.active_job, self.job)
+            self.assertEqual(context.active_job.status.name, 'Active')
+            self.assertEqual(context.personal_job.job_id, 'PER-MACHINIST')
+            entry = context.active_time_entry
+            self.assertEqual((entry.pk, entry.notes), (self.entry.pk, 'milling'))
+            self.assertIs(entry.job, context.active_job)
+            self.assertTrue(context.is_tracking_active_job)
+            # Later callers in the same request reuse the loaded context
+            self.assertIs(get_staff_context(request), context)
+
+    def test_without_open_entry(self):
+        JobTimeTracking.stop_tracking(self.user)
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        with self.assertNumQueries(1):
+            context = get_staff_context(request)
+            self.assertIsNone(context.active_time_entry)
+            self.assertFalse(context.is_tracking_active_job)
+            self.assertEqual(context.active_job, self.job)
+
+
+class IdAllocationTests(TestCase):
+    """The first allocation continues after the IDs already in use"""
+
+    def test_job_ids_continue_per_year(self):
+        for job_id in ('J-JOB-012526', 'J-JOB-000726', 'J-JOB-099925', 'J-JOB-12X26'):
+            create_job(job_id)
+
+        self.assertEqual(reserve_job_ids('JOB', year=2026), ['J-JOB-012626'])
+        self.assertEqual(reserve_job_ids('JOB', count=2, year=2026), ['J-JOB-012726', 'J-JOB-012826'])
+        self.assertEqual(reserve_job_ids('JOB', year=2027), ['J-JOB-000127'])
+
+    def test_material_and_machine_ids_continue(self):
+        create_material('FLMRL-PLA-00007')
+        create_material('FLMRL-PLA-00003')
+        material_type = Material.objects.get(material_id='FLMRL-PLA-00007').material_type
+        create_machine('MC-3DP-00004')
+
+        self.assertEqual(next_material_id(material_type), 'FLMRL-PLA-00008')
+        self.assertEqual(reserve_material_ids(material_type, count=2), ['FLMRL-PLA-00009', 'FLMRL-PLA-00010'])
+        self.assertEqual(next_machine_id(MachineType.objects.get(code='3DP')), 'MC-3DP-00005')
+
+
+class JobDetailQueryCountTests(TestCase):
+    """The job detail page costs the same number of queries however long the job ran"""
+
+    def setUp(self):
+        self.viewer = User.objects.create_user('manager', password='password')
+        self.job = create_job(created_by=self.viewer, owner=self.viewer)
+        self.material = create_material(price_per_unit=Decimal('2.00'))
+
+    def add_history(self, count):
+        start = User.objects.count()
+        now = timezone.now()
+        for number in range(start, start + count):
+            user = User.objects.create(username=f'worker{number}')
+            JobTimeTracking.objects.create(
+                user=user, job=self.job, start_time=now - timedelta(hours=number + 1),
+                end_time=now - timedelta(hours=number), notes='',
+            )
+            record_job_materials([JobMaterialLine(self.job, self.material, Decimal('1.00'))], added_by=user.username)
+
+    def count_detail_queries(self):
+        self.client.force_login(self.viewer)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('job_detail', args=[self.job.job_id]))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.add_history(2)
+        baseline = self.count_detail_queries()
+
+        # More rows than fit on one page of either table
+        self.add_history(40)
+        self.assertEqual(self.count_detail_queries(), baseline)
+
+
+class PersonalJobProvisioningTests(TestCase):
+    """New users get staff settings and a personal job"""
+
+    def test_user_created_without_job_statuses_is_provisioned(self):
+        JobStatus.objects.all().delete()
+        user = User.objects.create(username='newcomer')
+
+        settings = StaffSettings.objects.get(user=user)
+        self.assertEqual(settings.personal_job.job_id, 'PER-NEWCOMER')
+        self.assertEqual(settings.personal_job.status.name, 'Personal')
+
+    def test_long_username_gets_a_valid_personal_job_id(self):
+        user = User.objects.create(username='a.very-long_user.name+workshop@example.org')
+        other = User.objects.create(username='a.very-long_user.name+stores@example.org')
+
+        job_ids = [StaffSettings.objects.get(user=u).personal_job.job_id for u in (user, other)]
+        self.assertNotEqual(job_ids[0], job_ids[1])
+        for job_id in job_ids:
+            self.assertTrue(job_id.startswith('PER-A.VER-'))
+            self.assertLessEqual(len(job_id), Job._meta.get_field('job_id').max_length)
+            self.assertTrue(validate_job_id(job_id))
+        self.assertFalse(validate_job_id('PER-' + 'X' * 12))
+
+
+class RestockTests(TestCase):
+    """Restocking can set the minimum stock level to zero"""
+
+    def test_minimum_stock_level_can_be_cleared(self):
+        material = create_material(
+            current_stock=Decimal('1.00'), minimum_stock_level=Decimal('5.00'), minimum_stock_alert=True,
+            price_per_unit=Decimal('2.00'),
+        )
+
+        restock(material, Decimal('1.00'), Decimal('2.00'), minimum_stock_level=Decimal('0'))
+
+        material.refresh_from_db()
+        self.assertEqual(material.minimum_stock_level, Decimal('0'))
+        self.assertFalse(material.minimum_stock_alert)
+
+
+class MaterialSearchTests(TestCase):
+    """Typeahead ranking, prefix matching and list filtering"""
+
+    def setUp(self):
+        self.assertEqual(search_backend(), 'fts5')
+        create_material('HW-GEN-00001', name='PLA Silk Gold', supplier_name='Polymaker')
+        create_material('HW-GEN-00002', name='Copper wire', supplier_name='Plastic Co', brand_name='Generic')
+        create_material('HW-GEN-00003', name='Steel rod', location_in_workshop='Shelf B')
+
+    def test_prefix_matches_while_typing(self):
+        for query in ('p', 'pl', 'pla silk', 'SILK G'):
+            with self.subTest(query=query):
+                names = [result['name'] for result in search_materials(query)]
+                self.assertIn('PLA Silk Gold', names)
+        self.assertEqual(search_materials('xyz'), [])
+
+    def test_name_ranks_above_supplier(self):
+        names = [result['name'] for result in search_materials('pla')]
+        self.assertEqual(names, ['PLA Silk Gold', 'Copper wire'])
+
+    def test_best_match_survives_broad_prefix(self):
+        # Weak matches (supplier only) inserted first, the strong match last
+        Material.objects.bulk_create([
+            Material(**{**create_material_fields(f'HW-GEN-{number:05d}'), 'name': f'Bolt {number}',
+                        'supplier_name': 'Plastics Ltd'})
+            for number in range(100, 100 + SEARCH_CANDIDATE_LIMIT + 50)
+        ])
+        create_material('HW-GEN-09999', name='PLA Basic Black')
+        rebuild_index()
+
+        self.assertEqual(search_materials('pla', limit=2)[0]['name'], 'PLA Basic Black')
+
+    def test_filter_materials(self):
+        queryset = Material.objects.order_by('material_id')
+        self.assertEqual(
+            list(filter_materials(queryset, 'shelf').values_list('name', flat=True)), ['Steel rod']
+        )
+        self.assertEqual(
+            list(filter_materials(queryset, 'plas gen').values_list('name', flat=True)), ['Copper wire']
+        )
+        self.assertEqual(filter_materials(queryset, '').count(), 3)
+
+
+class PickListWithdrawalTests(TestCase):
+    """Multi-line withdrawals for the active job are all or nothing"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('picker', password='password')
+        self.job = create_job()
+        StaffSettings.objects.get(user=self.user).set_active_job(self.job)
+        self.spool = create_material('FLMRL-PLA-00001', current_stock=Decimal('5.00'), price_per_unit=Decimal('20.00'))
+        self.rod = create_material('FLMRL-PLA-00002', current_stock=Decimal('1.00'), price_per_unit=Decimal('3.00'))
+        self.client.force_login(self.user)
+
+    def withdraw(self, *lines):
+        return self.client.post(
+            reverse('api_pick_list_withdraw'),
+            {'lines': [{'material_id': material_id, 'quantity': quantity} for material_id, quantity in lines],
+             'notes': 'bench 2'},
+            content_type='application/json',
+        ).json()
+
+    def stock(self, material):
+        material.refresh_from_db()
+        return material.current_stock
+
+    def test_shortfall_rolls_back_every_line(self):
+        result = self.withdraw(('FLMRL-PLA-00001', '2'), ('FLMRL-PLA-00002', '1.5'))
+
+        self.assertFalse(result['success'])
+        self.assertEqual([line['material_id'] for line in result['shortfalls']], ['FLMRL-PLA-00002'])
+        self.assertEqual((self.stock(self.spool), self.stock(self.rod)), (Decimal('5.00'), Decimal('1.00')))
+        self.assertFalse(JobMaterial.objects.exists())
+        self.assertFalse(MaterialTransaction.objects.exists())
+
+    def test_duplicate_lines_are_merged(self):
+        result = self.withdraw(('FLMRL-PLA-00001', '1.5'), ('FLMRL-PLA-00001', '2'))
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['lines'], [{'material_id': 'FLMRL-PLA-00001', 'quantity': '3.5', 'new_stock': '1.50'}])
+        self.assertEqual(self.stock(self.spool), Decimal('1.50'))
+        self.assertEqual(list(JobMaterial.objects.values_list('quantity', flat=True)), [Decimal('3.50')])
+        self.assertEqual(list(MaterialTransaction.objects.values_list('quantity', flat=True)), [Decimal('3.50')])
+
+    def test_rows_written_per_line(self):
+        self.assertTrue(self.withdraw(('FLMRL-PLA-00001', '2'), ('FLMRL-PLA-00002', '1'))['success'])
+
+        self.assertEqual(
+            sorted(JobMaterial.objects.values_list('job_id', 'material__material_id', 'quantity', 'unit_price', 'notes')),
+            [
+                (self.job.pk, 'FLMRL-PLA-00001', Decimal('2.00'), Decimal('20.00'), 'bench 2'),
+                (self.job.pk, 'FLMRL-PLA-00002', Decimal('1.00'), Decimal('3.00'), 'bench 2'),
+            ],
+        )
+        self.assertEqual(
+            sorted(MaterialTransaction.objects.values_list(
+                'material__material_id', 'quantity', 'transaction_type', 'job_id', 'job_reference', 'operator_user_id',
+            )),
+            [
+                ('FLMRL-PLA-00001', Decimal('2.00'), 'withdrawal', self.job.pk, self.job.job_id, self.user.pk),
+                ('FLMRL-PLA-00002', Decimal('1.00'), 'withdrawal', self.job.pk, self.job.job_id, self.user.pk),
+            ],
+        )
+        self.assertEqual((self.stock(self.spool), self.stock(self.rod)), (Decimal('3.00'), Decimal('0.00')))
+        self.assertEqual(JobFinancial.objects.get(job=self.job).material_cost, Decimal('43.00'))
+
+    def test_retries_are_bounded(self):
+        with mock.patch.object(stock_ledger, '_withdraw_many_once', side_effect=stock_ledger._StockChanged) as attempt:
+            with self.assertRaises(StockContention):
+                withdraw_many({'FLMRL-PLA-00001': Decimal('1')})
+        self.assertEqual(attempt.call_count, stock_ledger.WITHDRAW_MANY_ATTEMPTS)
+
+
+class DashboardCacheTests(TestCase):
+    """Dashboard panels are cached and dropped after the data behind them commits"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('lead', password='password')
+        self.job = create_job(created_by=self.user, owner=self.user)
+        self.material = create_material(minimum_stock_alert=True)
+        self.machine = create_machine()
+        self.client.force_login(self.user)
+
+    def render(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def panel_queries(self, queries):
+        tables = ('"workshop_app_material"', '"workshop_app_machine"', '"workshop_app_job"')
+        return [sql for sql in queries if any(f'FROM {table}' in sql for table in tables)]
+
+    def fragment(self, name, *vary_on):
+        return cache.get(make_template_fragment_key(name, vary_on))
+
+    def test_warm_dashboard_skips_panel_queries(self):
+        cold, cold_queries = self.render()
+        self.assertContains(cold, self.job.job_id)
+        self.assertContains(cold, self.material.name)
+        self.assertContains(cold, self.machine.name)
+
+        warm, warm_queries = self.render()
+        self.assertEqual(self.panel_queries(warm_queries), [])
+        self.assertLess(len(warm_queries), len(cold_queries))
+        self.assertContains(warm, self.machine.name)
+
+    def test_changes_drop_fragments_on_commit(self):
+        self.render()
+        self.assertIsNotNone(self.fragment(dashboard_cache.LOW_STOCK_FRAGMENT))
+        self.assertIsNotNone(self.fragment(dashboard_cache.RECENT_JOBS_FRAGMENT, self.user.pk))
+        version = dashboard_cache.machines_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.material.name = 'Renamed spool'
+            self.material.save()
+            # Still cached until the transaction commits
+            self.assertIsNotNone(self.fragment(dashboard_cache.LOW_STOCK_FRAGMENT))
+        self.assertIsNone(self.fragment(dashboard_cache.LOW_STOCK_FRAGMENT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.project_name = 'Renamed job'
+            self.job.save()
+        self.assertIsNone(self.fragment(dashboard_cache.RECENT_JOBS_FRAGMENT, self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.machine.status = 'maintenance'
+            self.machine.save()
+        self.assertNotEqual(dashboard_cache.machines_version(), version)
+
+        version = dashboard_cache.machines_version()
+        operator = create_operator(User.objects.create(username='tech'), Decimal('10.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            operator.certified_machines.add(self.machine)
+        self.assertNotEqual(dashboard_cache.machines_version(), version)
+
+        response, _ = self.render()
+        self.assertContains(response, 'Renamed spool')
+        self.assertContains(response, 'Renamed job')
+        self.assertNotContains(response, self.machine.name)
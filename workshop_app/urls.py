@@ -1,7 +1,7 @@
 # workshop_app/urls.py
 
-from django.urls import path
-from workshop_app.views import auth_views, dashboard_views, scanning_views, material_views
+from django.urls import path, re_path
+from workshop_app.views import auth_views, dashboard_views, scanning_views, material_views, qr_views, label_views, timesheet_views
 from workshop_app.views.machine_views import (
     machine_list,
     machine_detail,
@@ -10,7 +10,13 @@ from workshop_app.views.machine_views import (
     add_machine,
     edit_machine,
     start_machine_usage,
-    stop_machine_usage
+    stop_machine_usage,
+    machine_board,
+    machine_board_events,
+    machine_reservations,
+    cancel_reservation,
+    machine_type_next_free_slot,
+    machine_utilization
 )
 from workshop_app.views.job_views import (
     job_list,
@@ -38,6 +44,7 @@ urlpatterns = [
     # Scanning URLs
     path('scan/', scanning_views.scan_view, name='scan'),
     path('scan/process/', scanning_views.process_scan, name='process_scan'),
+    path('scan/process-batch/', scanning_views.process_batch_scan, name='process_batch_scan'),
     path('scan/history/', scanning_views.scan_history, name='scan_history'),
     path('scan/manual/', scanning_views.manual_entry, name='manual_entry'),
     path('scan/job/<str:job_id>/', scanning_views.scanned_job, name='scanned_job'),
@@ -45,6 +52,10 @@ urlpatterns = [
     path('scan/machine/<str:machine_id>/', scanning_views.scanned_machine, name='scanned_machine'),
     path('scan/not-found/', scanning_views.not_found_view, name='scan_not_found'),
     
+    # QR code images and label sheets
+    re_path(r'^qr/(?P<code>[^/]+)\.(?P<image_format>png|svg)$', qr_views.qr_code_image, name='qr_code_image'),
+    path('labels/<str:kind>/', label_views.label_sheet, name='label_sheet'),
+    
     # Material URLs
     path('materials/', material_views.material_list, name='material_list'),
     path('materials/add/', material_views.add_material, name='add_material'),
@@ -63,6 +74,9 @@ urlpatterns = [
     # Machine URLs
     path('machines/', machine_list, name='machine_list'),
     path('machines/add/', add_machine, name='add_machine'),
+    path('machines/board/', machine_board, name='machine_board'),
+    path('machines/board/events/', machine_board_events, name='machine_board_events'),
+    path('machines/utilization/', machine_utilization, name='machine_utilization'),
     path('machines/<str:machine_id>/', machine_detail, name='machine_detail'),
     path('machines/<str:machine_id>/edit/', edit_machine, name='edit_machine'),
     path('machines/<str:machine_id>/usage-history/', machine_usage_history, name='machine_usage_history'),
@@ -86,5 +100,12 @@ urlpatterns = [
     path('api/start-timer/', material_views.start_timer, name='start_timer'),
     path('api/stop-timer/', material_views.stop_timer, name='stop_timer'),
     path('api/time-tracking/<int:tracking_id>/edit-notes/', edit_time_tracking_notes, name='edit_time_tracking_notes'),
+    path('api/timesheets/', timesheet_views.timesheets_api, name='api_timesheets'),
+    path('api/timesheets/export/', timesheet_views.timesheets_csv, name='api_timesheets_csv'),
     path('api/clients/<int:client_id>/contacts/', get_client_contacts, name='client_contacts'),
+    path('api/machines/<str:machine_id>/reservations/', machine_reservations, name='api_machine_reservations'),
+    path('api/reservations/<int:reservation_id>/cancel/', cancel_reservation, name='api_cancel_reservation'),
+    path('api/machine-types/<int:type_id>/next-free-slot/', machine_type_next_free_slot, name='api_next_free_slot'),
+    path('api/pick-list/withdraw/', material_views.withdraw_pick_list, name='api_pick_list_withdraw'),
+    re_path(r'^api/materials/search/?$', material_views.material_search, name='api_material_search'),
 ]
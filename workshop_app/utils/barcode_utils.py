@@ -2,13 +2,162 @@
 Utility functions for barcode and QR code handling
 """
 import qrcode
+from qrcode.image.svg import SvgPathImage
 from io import BytesIO
 import base64
+import hashlib
+import os
 import re
 import logging
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Number of rendered QR images kept in memory
+QR_MEMORY_CACHE_SIZE = 512
+
+# Number of rendered QR images kept on disk (QR_CACHE_MAX_FILES setting).
+# Any logged-in user can request any code, so the directory is bounded.
+DEFAULT_QR_CACHE_MAX_FILES = 5000
+
+# Share of QR_CACHE_MAX_FILES left after pruning, so pruning is not needed
+# again on the very next write
+QR_CACHE_PRUNE_TO = 0.9
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def qr_cache_key(data, size=10, image_format='png'):
+    """
+    Content address of a rendered QR image
+    
+    Rendering is deterministic, so the key identifies the image bytes and
+    doubles as its ETag.
+    """
+    return hashlib.sha256(f"{image_format}:{size}:{data}".encode()).hexdigest()
+
+
+def get_qr_cache_dir():
+    """Directory holding rendered QR images (QR_CACHE_DIR setting)"""
+    return getattr(settings, 'QR_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'qr_cache'))
+
+
+def prune_qr_cache(directory=None, max_files=None):
+    """
+    Delete the least recently used images once the disk cache is full
+
+    Args:
+        directory (str): Cache directory (default: QR_CACHE_DIR)
+        max_files (int): Images allowed (default: QR_CACHE_MAX_FILES)
+
+    Returns:
+        int: Number of images deleted
+    """
+    directory = directory or get_qr_cache_dir()
+    if max_files is None:
+        max_files = getattr(settings, 'QR_CACHE_MAX_FILES', DEFAULT_QR_CACHE_MAX_FILES)
+
+    try:
+        with os.scandir(directory) as entries:
+            images = [entry for entry in entries if entry.is_file() and entry.name.endswith(('.png', '.svg'))]
+    except OSError:
+        return 0
+    if len(images) <= max_files:
+        return 0
+
+    def last_used(entry):
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return 0
+
+    images.sort(key=last_used)
+    deleted = 0
+    for entry in images[:len(images) - int(max_files * QR_CACHE_PRUNE_TO)]:
+        try:
+            os.remove(entry.path)
+            deleted += 1
+        except OSError:
+            # Already deleted by another process
+            pass
+    return deleted
+
+
+def _render_qr_image(data, size, image_format):
+    """Render a QR code to PNG or SVG bytes"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=size,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    if image_format == 'svg':
+        img = qr.make_image(image_factory=SvgPathImage)
+        buffer = BytesIO()
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=QR_MEMORY_CACHE_SIZE)
+def render_qr_code(data, size=10, image_format='png'):
+    """
+    Return the rendered QR image for the given data
+    
+    Images are cached in memory (LRU keyed by data, size and format) and
+    on disk under QR_CACHE_DIR, so each code is rendered only once. The
+    disk cache keeps at most QR_CACHE_MAX_FILES images; a disk hit marks
+    the image as recently used.
+    
+    Args:
+        data (str): Data to encode in the QR code
+        size (int): Box size of the QR code (default: 10)
+        image_format (str): 'png' or 'svg'
+        
+    Returns:
+        bytes: Image data
+    """
+    if image_format not in QR_CONTENT_TYPES:
+        raise ValueError(f"Unsupported QR image format: {image_format}")
+    
+    path = os.path.join(get_qr_cache_dir(), f"{qr_cache_key(data, size, image_format)}.{image_format}")
+    try:
+        with open(path, 'rb') as f:
+            image = f.read()
+        os.utime(path)
+        return image
+    except OSError:
+        pass
+    
+    image = _render_qr_image(data, size, image_format)
+    
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial image
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write QR code to disk cache: {e}")
+    else:
+        prune_qr_cache(os.path.dirname(path))
+    
+    return image
+
+
 def generate_qr_code(data, size=10):
     """
     Generate a QR code image for the given data
@@ -21,25 +170,152 @@ def generate_qr_code(data, size=10):
         str: Base64 encoded image data for the QR code
     """
     try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=size,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        
+        img_str = base64.b64encode(render_qr_code(data, size)).decode()
         return f"data:image/png;base64,{img_str}"
     except Exception as e:
         logger.error(f"Error generating QR code: {e}")
         return None
 
+# Internal ID formats. Alternatives are tried in this order at each position,
+# so machine IDs (MC-3DP-00001) win over the more general material format.
+JOB_ID_PATTERN = r'J-[A-Z]{3}-\d{4,8}|(?:J|JOB)-\d{1,6}'
+MACHINE_ID_PATTERN = r'(?:MC|MACH)-(?:[A-Z0-9]{1,10}-)?\d{1,6}'
+MATERIAL_ID_PATTERN = r'[A-Z]{2,5}-[A-Z0-9]{1,10}-\d{1,6}'
+# PER- and up to 11 characters, the width of Job.job_id (see personal_jobs.personal_job_id)
+PERSONAL_JOB_ID_PATTERN = r'PER-[A-Z0-9_.@+-]{1,11}'
+
+JOB_ID_RE = re.compile(rf'(?:{JOB_ID_PATTERN}|{PERSONAL_JOB_ID_PATTERN})', re.IGNORECASE)
+MACHINE_ID_RE = re.compile(MACHINE_ID_PATTERN, re.IGNORECASE)
+MATERIAL_ID_RE = re.compile(MATERIAL_ID_PATTERN, re.IGNORECASE)
+
+# Finds an internal ID on its own or as a segment of a URL/label text.
+# The look-arounds stop IDs from being cut out of longer tokens.
+INTERNAL_ID_RE = re.compile(
+    r'(?<![A-Z0-9_-])(?:'
+    rf'(?P<job>{JOB_ID_PATTERN})'
+    rf'|(?P<machine>{MACHINE_ID_PATTERN})'
+    rf'|(?P<material>{MATERIAL_ID_PATTERN})'
+    rf'|(?P<personal>{PERSONAL_JOB_ID_PATTERN})'
+    r')(?![A-Z0-9_-])',
+    re.IGNORECASE
+)
+
+# GS1 element strings: optional symbology identifier (]C1, ]d2, ]Q3, ]e0)
+# followed by "(AI)value" pairs or raw AIs separated by the GS character.
+GS1_SYMBOLOGY_RE = re.compile(r'^\][CdQe][0-9]')
+GS1_START_RE = re.compile(r'^(?:\(\d{2,4}\)|01\d{14}|00\d{18})')
+GS1_BRACKETED_RE = re.compile(r'\((\d{2,4})\)([^(]*)')
+GS1_SEPARATOR = '\x1d'
+
+# Fixed-length GS1 application identifiers (AI -> value length)
+GS1_FIXED_LENGTH = {
+    '00': 18, '01': 14, '02': 14, '11': 6, '12': 6, '13': 6,
+    '15': 6, '16': 6, '17': 6, '20': 2,
+}
+# Variable-length GS1 application identifiers we understand
+GS1_VARIABLE_LENGTH = ('240', '241', '250', '10', '21', '22', '30', '37', '90')
+
+# GS1 fields tried, in order, as the code to look up (serial, vendor part, GTIN, SSCC)
+GS1_LOOKUP_FIELDS = ('21', '240', '01', '00')
+
+# Plain EAN-8, UPC-A, EAN-13 and GTIN-14 barcodes
+RETAIL_BARCODE_RE = re.compile(r'^(?:\d{8}|\d{12,14})$')
+
+ScannedCode = namedtuple('ScannedCode', ['code_type', 'code', 'raw', 'is_url', 'gs1'])
+ScannedCode.__doc__ = """
+Result of classifying a scanned code
+
+    code_type: 'job', 'material', 'machine', 'vendor' or 'unknown'
+    code: ID extracted from the scan, used for the database lookup
+    raw: The scanned string with surrounding whitespace removed
+    is_url: True if the ID was extracted from a URL
+    gs1: {AI: value} for GS1 element strings, otherwise None
+"""
+
+
+def parse_gs1(data):
+    """
+    Split a GS1 element string into its application identifiers
+    
+    Args:
+        data (str): Element string without symbology identifier
+        
+    Returns:
+        dict: {AI: value}
+    """
+    if data.startswith('('):
+        return {ai: value.rstrip(GS1_SEPARATOR) for ai, value in GS1_BRACKETED_RE.findall(data)}
+    
+    fields = {}
+    pos = 0
+    length = len(data)
+    while pos < length:
+        if data[pos] == GS1_SEPARATOR:
+            pos += 1
+            continue
+        
+        ai = data[pos:pos + 2]
+        if ai in GS1_FIXED_LENGTH:
+            end = pos + 2 + GS1_FIXED_LENGTH[ai]
+            fields[ai] = data[pos + 2:end]
+            pos = end
+            continue
+        
+        ai = next((candidate for candidate in GS1_VARIABLE_LENGTH if data.startswith(candidate, pos)), None)
+        if ai is None:
+            # Unknown AI - we can't tell where it ends, so stop here
+            break
+        
+        end = data.find(GS1_SEPARATOR, pos)
+        if end == -1:
+            end = length
+        fields[ai] = data[pos + len(ai):end]
+        pos = end
+    return fields
+
+
+def classify_code(code):
+    """
+    Classify a scanned code and extract its ID in a single pass
+    
+    Understands internal job, material and machine IDs (bare, inside a URL
+    or inside label text), GS1 element strings and plain retail barcodes.
+    
+    Args:
+        code (str): Scanned code
+        
+    Returns:
+        ScannedCode: Typed classification result
+    """
+    raw = code.strip() if code else ''
+    if not raw:
+        return ScannedCode('unknown', None, raw, False, None)
+    
+    # GS1 element strings (vendor labels)
+    if raw[0] == ']' or raw[0] == '(' or raw[0] == '0' or GS1_SEPARATOR in raw:
+        data = raw[3:] if GS1_SYMBOLOGY_RE.match(raw) else raw
+        if GS1_START_RE.match(data) or (data is not raw and data[:2].isdigit()):
+            fields = parse_gs1(data)
+            lookup = next((fields[ai] for ai in GS1_LOOKUP_FIELDS if fields.get(ai)), None)
+            if lookup:
+                return ScannedCode('vendor', lookup, raw, False, fields)
+    
+    # Internal IDs, on their own or wrapped in a URL
+    match = INTERNAL_ID_RE.search(raw)
+    if match:
+        code_type = match.lastgroup
+        if code_type == 'personal':
+            code_type = 'job'
+        return ScannedCode(code_type, match.group(), raw, '/' in raw, None)
+    
+    if RETAIL_BARCODE_RE.match(raw):
+        return ScannedCode('vendor', raw, raw, False, None)
+    
+    # Anything else could still be a manufacturer's serial number or
+    # supplier SKU; the lookup decides
+    return ScannedCode('unknown', raw, raw, False, None)
+
+
 def validate_job_id(job_id):
     """
     Validate that the string is a valid job ID format
@@ -50,9 +326,8 @@ def validate_job_id(job_id):
     Returns:
         bool: True if valid, False otherwise
     """
-    # Example pattern: J-12345 or JOB-12345
-    pattern = r'^(J|JOB)-\d{1,6}$'
-    return bool(re.match(pattern, job_id, re.IGNORECASE))
+    # Example patterns: J-JOB-000125, J-12345, JOB-12345 or PER-USERNAME
+    return bool(JOB_ID_RE.fullmatch(job_id))
 
 def validate_material_id(material_id):
     """
@@ -64,10 +339,8 @@ def validate_material_id(material_id):
     Returns:
         bool: True if valid, False otherwise
     """
-    # Updated pattern: Match various material ID formats
-    # Includes format like FLMRL-PLA-7963
-    pattern = r'^[A-Z]{2,5}-[A-Z]{2,5}-\d{1,5}$'
-    return bool(re.match(pattern, material_id, re.IGNORECASE))
+    # Example patterns: FLMRL-PLA-7963 or FLMRL-PLA-00001
+    return bool(MATERIAL_ID_RE.fullmatch(material_id)) and not MACHINE_ID_RE.fullmatch(material_id)
 
 def validate_machine_id(machine_id):
     """
@@ -79,9 +352,8 @@ def validate_machine_id(machine_id):
     Returns:
         bool: True if valid, False otherwise
     """
-    # Example pattern: MC-12345 or MACH-12345
-    pattern = r'^(MC|MACH)-\d{1,6}$'
-    return bool(re.match(pattern, machine_id, re.IGNORECASE))
+    # Example patterns: MC-12345, MACH-12345 or MC-3DP-00001
+    return bool(MACHINE_ID_RE.fullmatch(machine_id))
 
 def determine_code_type(code):
     """
@@ -93,35 +365,9 @@ def determine_code_type(code):
     Returns:
         str: 'job', 'material', 'machine', or 'unknown'
     """
-    if not code:
-        return 'unknown'
-        
-    # Clean the code (remove spaces, ensure uppercase for pattern matching)
-    code = code.strip().upper()
-    
-    # Try to match our internal code format first
-    if validate_job_id(code):
-        return 'job'
-    elif validate_material_id(code):
-        return 'material'
-    elif validate_machine_id(code):
-        return 'machine'
-    
-    # Check if it contains any identifiable prefixes
-    if code.startswith('J-') or code.startswith('JOB-'):
-        return 'job'
-    # Check for typical material ID formats with 2 or more parts separated by hyphens
-    elif re.match(r'^[A-Z]+-[A-Z]+-\d+$', code, re.IGNORECASE):
-        return 'material'
-    elif code.startswith('MC-') or code.startswith('MACH-'):
-        return 'machine'
-    
-    # If we can't determine the type based on our internal format,
-    # we'll assume it's either a material or machine serial number/barcode
-    # The actual lookup will happen in the view
-    
-    # For now, we'll return 'unknown' and the view will attempt to find it in the database
-    return 'unknown'
+    code_type = classify_code(code).code_type
+    # Vendor codes are looked up as serial numbers/SKUs like any unknown code
+    return 'unknown' if code_type == 'vendor' else code_type
 
 def parse_code(code):
     """
@@ -135,31 +381,4 @@ def parse_code(code):
     """
     if not code:
         return None
-    
-    # Clean the code
-    code = code.strip()
-    
-    # Pattern for common material ID format like FLMRL-PLA-7963
-    material_pattern = r'(?:.*/)?((?:[A-Z]+-[A-Z]+-\d+))(?:/.*)?$'
-    material_match = re.search(material_pattern, code, re.IGNORECASE)
-    
-    if material_match:
-        return material_match.group(1)
-    
-    # URL pattern for job and machine IDs
-    url_pattern = r'(?:.*/)?((?:J|JOB|MC|MACH)-\d{1,6})(?:/.*)?$'
-    url_match = re.search(url_pattern, code, re.IGNORECASE)
-    
-    if url_match:
-        return url_match.group(1)
-    
-    # Direct ID pattern for job and machine IDs
-    id_pattern = r'((?:J|JOB|MC|MACH)-\d{1,6})'
-    id_match = re.search(id_pattern, code, re.IGNORECASE)
-    
-    if id_match:
-        return id_match.group(1)
-    
-    # If it doesn't match our internal format, return the whole code
-    # as it could be a manufacturer's serial number or barcode
-    return code
+    return classify_code(code).code
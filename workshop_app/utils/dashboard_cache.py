@@ -0,0 +1,109 @@
+# workshop_app/utils/dashboard_cache.py
+
+"""
+Cached panels of the dashboard.
+
+The recent jobs, available machines and low stock panels are rendered in
+{% cache %} fragments. The view only passes lazy querysets, so a warm
+fragment costs no queries at all. Fragments are dropped by signals as the
+data behind them changes:
+
+- recent jobs: one fragment per user, dropped when a job the user created
+  or owns is saved or deleted,
+- low stock: one fragment for everyone, dropped when a material is saved
+  or its stock changes through the stock ledger,
+- available machines: one fragment per user (the list depends on their
+  certifications), all dropped at once by bumping a version number when
+  a machine, operator or certification changes.
+
+Fragments are dropped once the transaction that changed the data commits
+(immediately outside a transaction); dropping them earlier would let a
+dashboard rendered before the commit cache the old rows again. Fragments
+also expire after DASHBOARD_CACHE_TIMEOUT seconds, which bounds anything
+not covered by a signal (e.g. a renamed job status).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from workshop_app.models import Job, Machine, Material, Operator
+
+# Seconds a dashboard panel stays cached
+DEFAULT_CACHE_TIMEOUT = 60
+
+# Rows shown per panel
+PANEL_SIZE = 5
+
+RECENT_JOBS_FRAGMENT = 'dashboard_recent_jobs'
+MACHINES_FRAGMENT = 'dashboard_machines'
+LOW_STOCK_FRAGMENT = 'dashboard_low_stock'
+
+MACHINES_VERSION_KEY = 'dashboard:machines_version'
+
+
+def cache_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+
+
+def machines_version():
+    """Current version of the available machines fragments"""
+    version = cache.get(MACHINES_VERSION_KEY)
+    if version is None:
+        # Start from a new value so fragments cached under an evicted version are not reused
+        cache.add(MACHINES_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(MACHINES_VERSION_KEY)
+    return version
+
+
+def invalidate_recent_jobs(*user_pks):
+    """Drop the recent jobs panel of the given users after commit"""
+    keys = [
+        make_template_fragment_key(RECENT_JOBS_FRAGMENT, [user_pk])
+        for user_pk in set(user_pks) if user_pk is not None
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_low_stock():
+    """Drop the low stock panel after commit"""
+    transaction.on_commit(lambda: cache.delete(make_template_fragment_key(LOW_STOCK_FRAGMENT)))
+
+
+def invalidate_machines():
+    """Drop the available machines panel of every user after commit"""
+    transaction.on_commit(lambda: cache.set(MACHINES_VERSION_KEY, time.time_ns(), None))
+
+
+def dashboard_panels(user):
+    """
+    Lazy querysets behind the cached dashboard panels
+
+    Nothing is queried unless a panel's fragment has to be rendered.
+
+    Args:
+        user (User): Logged-in user
+
+    Returns:
+        dict: Template context for the panels
+    """
+    # Operators see the machines they are certified for, everyone else every available machine
+    certified = Operator.certified_machines.through.objects.filter(machine=OuterRef('pk'), operator__user=user)
+    available_machines = Machine.objects.filter(status='available').annotate(
+        is_certified=Exists(certified)
+    ).filter(
+        Q(is_certified=True) | ~Exists(Operator.objects.filter(user=user))
+    )
+
+    return {
+        'dashboard_cache_timeout': cache_timeout(),
+        'machines_version': machines_version(),
+        'recent_jobs': Job.objects.filter(
+            Q(created_by=user) | Q(owner=user)
+        ).exclude(job_id='').select_related('status').order_by('-created_date')[:PANEL_SIZE],
+        'available_machines': available_machines[:PANEL_SIZE],
+        'low_stock_materials': Material.objects.filter(minimum_stock_alert=True)[:PANEL_SIZE],
+    }
@@ -0,0 +1,129 @@
+# workshop_app/utils/id_allocator.py
+
+"""
+Allocation of human-readable IDs (J-JOB-000126, FLMRL-PLA-00012, ...).
+
+Each prefix (and year, for job numbers) has a row in the IdSequence table.
+Numbers are taken with a single UPDATE ... SET last_value = last_value + n,
+which locks the row until the transaction ends, so concurrent creates get
+different numbers without scanning the table they are numbering. Blocks
+of numbers can be reserved for imports.
+
+The first allocation for a prefix seeds its counter from the highest
+number already in use, so existing data keeps its numbering. Numbers
+taken by a create that later fails are not reused.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from workshop_app.models import IdSequence, Job, Machine, Material
+
+
+def allocate(prefix, year=0, count=1, seed=None):
+    """
+    Reserve a block of consecutive numbers for a prefix
+
+    Args:
+        prefix (str): Sequence prefix, e.g. 'J-JOB-'
+        year (int): Year for sequences that restart every year, 0 otherwise
+        count (int): How many numbers to reserve
+        seed (callable): Returns the highest number already in use; called
+            once, when the sequence is first used
+
+    Returns:
+        range: The reserved numbers
+    """
+    if count < 1:
+        raise ValueError('count must be at least 1')
+
+    with transaction.atomic():
+        sequence = IdSequence.objects.filter(prefix=prefix, year=year)
+        if not sequence.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    IdSequence.objects.create(prefix=prefix, year=year, last_value=(seed() if seed else 0) + count)
+            except IntegrityError:
+                # Another request created the sequence first
+                sequence.update(last_value=F('last_value') + count)
+        last_value = sequence.values_list('last_value', flat=True).get()
+    return range(last_value - count + 1, last_value + 1)
+
+
+def _highest_number(ids, prefix, suffix=''):
+    """Highest number among ids shaped prefix + digits + suffix"""
+    pattern = re.compile(rf'^{re.escape(prefix)}(\d+){re.escape(suffix)}$')
+    numbers = [int(match.group(1)) for match in map(pattern.match, ids) if match]
+    return max(numbers, default=0)
+
+
+def reserve_job_ids(project_type, count=1, year=None):
+    """
+    Reserve job IDs of the form J-<TYPE>-<NNNN><YY>
+
+    Args:
+        project_type (str): Project type code, e.g. 'JOB'
+        count (int): How many IDs to reserve
+        year (int): Calendar year (default: the current year)
+
+    Returns:
+        list: The reserved job IDs in order
+    """
+    year = year or timezone.localdate().year
+    prefix = f"J-{project_type}-"
+    suffix = f"{year % 100:02d}"
+
+    def seed():
+        return _highest_number(
+            Job.objects.filter(job_id__startswith=prefix, job_id__endswith=suffix).values_list('job_id', flat=True),
+            prefix, suffix
+        )
+
+    return [f"{prefix}{number:04d}{suffix}" for number in allocate(prefix, year, count, seed)]
+
+
+def next_job_id(project_type):
+    """Allocate the next job ID for a project type"""
+    return reserve_job_ids(project_type)[0]
+
+
+def reserve_material_ids(material_type, count=1):
+    """
+    Reserve material IDs of the form <CATEG>-<TYPE>-<NNNNN>
+
+    Args:
+        material_type (MaterialType): Type of the new materials
+        count (int): How many IDs to reserve
+
+    Returns:
+        list: The reserved material IDs in order
+    """
+    prefix = f"{material_type.category.code}-{material_type.code}-"
+
+    def seed():
+        return _highest_number(
+            Material.objects.filter(material_id__startswith=prefix).values_list('material_id', flat=True),
+            prefix
+        )
+
+    return [f"{prefix}{number:05d}" for number in allocate(prefix, count=count, seed=seed)]
+
+
+def next_material_id(material_type):
+    """Allocate the next material ID for a material type"""
+    return reserve_material_ids(material_type)[0]
+
+
+def next_machine_id(machine_type):
+    """Allocate the next machine ID (MC-<TYPE>-<NNNNN>) for a machine type"""
+    prefix = f"MC-{machine_type.code}-"
+
+    def seed():
+        return _highest_number(
+            Machine.objects.filter(machine_id__startswith=prefix).values_list('machine_id', flat=True),
+            prefix
+        )
+
+    return f"{prefix}{allocate(prefix, seed=seed)[0]:05d}"
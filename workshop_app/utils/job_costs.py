@@ -0,0 +1,231 @@
+# workshop_app/utils/job_costs.py
+
+"""
+Job cost rollups into JobFinancial.
+
+material_cost, labor_cost and machine_cost are kept current by the write
+paths instead of being computed on read:
+
+- record_job_materials adds quantity x unit_price of every line
+  (returns have negative quantities and reduce the cost),
+- closing a time entry adds its hours x the operator's hourly rate,
+- closing a machine usage adds its total_cost to its job.
+
+Each change is one UPDATE ... SET cost = COALESCE(cost, 0) + delta on the
+job's JobFinancial row, so concurrent writers cannot lose each other's
+amounts. Deltas are only ever added: editing or deleting a material line,
+time entry or machine usage (e.g. in the admin) does not take its amount
+back out. `manage.py rebuild_job_costs` recomputes every job from the raw
+tables with one grouped query per cost after such edits or imports.
+
+Every material line and time entry is rounded to the cent (half away from
+zero) before it is added up, by the deltas in Python and by the rebuild in
+SQL on whole cents and microseconds, so a rebuild gives exactly the totals
+the deltas built.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField, Case, DurationField, ExpressionWrapper, F, Func, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThanOrEqual
+
+from workshop_app.models import JobFinancial, JobMaterial, MachineUsage, Operator
+from workshop_app.models.job_time_tracking import JobTimeTracking
+
+COST_FIELDS = ('material_cost', 'labor_cost', 'machine_cost')
+
+CENT = Decimal('0.01')
+
+MICROSECONDS_PER_HOUR = 3600 * 10 ** 6
+
+# Rows per statement when rebuilding
+REBUILD_BATCH_SIZE = 500
+
+
+def _divide_rounded(numerator, denominator):
+    """Integer division rounded half away from zero"""
+    quotient = (abs(numerator) * 2 + denominator) // (2 * denominator)
+    return quotient if numerator >= 0 else -quotient
+
+
+def _cents(amount):
+    """A two-decimal amount as a whole number of cents"""
+    return int((amount * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def material_line_cost(quantity, unit_price):
+    """Cost of one JobMaterial line, rounded to the cent"""
+    return Decimal(_divide_rounded(_cents(quantity) * _cents(unit_price), 100)) / 100
+
+
+def labor_entry_cost(start_time, end_time, hourly_rate):
+    """Cost of one closed time entry, rounded to the cent"""
+    microseconds = (end_time - start_time) // timedelta(microseconds=1)
+    return Decimal(_divide_rounded(microseconds * _cents(hourly_rate), MICROSECONDS_PER_HOUR)) / 100
+
+
+# The same arithmetic as SQL expressions, for rebuild_job_costs
+
+class Microseconds(Func):
+    """Whole microseconds between two datetime columns"""
+    output_field = BigIntegerField()
+    template = 'CAST(%(expressions)s AS bigint)'
+
+    def __init__(self, start, end):
+        super().__init__(ExpressionWrapper(F(end) - F(start), output_field=DurationField()))
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        # The difference is an interval there, not a number of microseconds
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(ROUND(EXTRACT(EPOCH FROM %(expressions)s) * 1000000) AS bigint)',
+            **extra_context,
+        )
+
+
+def _sql_cents(field):
+    return Cast(Round(F(field) * 100), BigIntegerField())
+
+
+def _sql_divide_rounded(numerator, denominator):
+    half = denominator // 2
+    return Case(
+        When(GreaterThanOrEqual(numerator, 0), then=(numerator + Value(half)) / Value(denominator)),
+        default=(numerator - Value(half)) / Value(denominator),
+        output_field=BigIntegerField(),
+    )
+
+
+def _sum_cents_by_job(queryset, cents):
+    """{job pk: Decimal} of a per-row cents expression summed per job"""
+    rows = queryset.values('job_id').annotate(cents=Sum(cents)).values_list('job_id', 'cents').order_by()
+    return {job_pk: Decimal(total or 0) / 100 for job_pk, total in rows}
+
+
+def add_job_costs(deltas):
+    """
+    Add cost deltas to jobs' JobFinancial rows, creating missing rows
+
+    Args:
+        deltas (dict): {job pk: {cost field: Decimal delta}}
+    """
+    deltas = {
+        job_pk: {field: value.quantize(CENT) for field, value in fields.items() if value}
+        for job_pk, fields in deltas.items()
+    }
+    deltas = {job_pk: fields for job_pk, fields in deltas.items() if fields}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        JobFinancial.objects.bulk_create(
+            [JobFinancial(job_id=job_pk) for job_pk in deltas],
+            ignore_conflicts=True,
+        )
+        for job_pk, fields in deltas.items():
+            JobFinancial.objects.filter(job_id=job_pk).update(**{
+                field: Coalesce(F(field), Value(Decimal('0'))) + value
+                for field, value in fields.items()
+            })
+
+
+def add_material_costs(job_materials):
+    """
+    Add the cost of JobMaterial rows to their jobs
+
+    Args:
+        job_materials (list): JobMaterial objects (unit_price may be None)
+    """
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for job_material in job_materials:
+        if job_material.unit_price:
+            deltas[job_material.job_id]['material_cost'] += material_line_cost(
+                job_material.quantity, job_material.unit_price
+            )
+    add_job_costs(deltas)
+
+
+def add_labor_cost(time_entry):
+    """
+    Add the cost of a closed time entry to its job
+
+    Users without an operator profile have no hourly rate and add nothing.
+
+    Args:
+        time_entry (JobTimeTracking): Entry with end_time set
+    """
+    if time_entry.end_time is None:
+        return
+    hourly_rate = Operator.objects.filter(user_id=time_entry.user_id).values_list('hourly_rate', flat=True).first()
+    if not hourly_rate:
+        return
+    add_job_costs({time_entry.job_id: {
+        'labor_cost': labor_entry_cost(time_entry.start_time, time_entry.end_time, hourly_rate)
+    }})
+
+
+def add_machine_costs(usages):
+    """
+    Add the total_cost of closed machine usages to their jobs
+
+    Args:
+        usages (list): MachineUsage objects with total_cost set
+    """
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for usage in usages:
+        if usage.total_cost and usage.job_id:
+            deltas[usage.job_id]['machine_cost'] += usage.total_cost
+    add_job_costs(deltas)
+
+
+def rebuild_job_costs():
+    """
+    Recompute material, labor and machine cost of every job
+
+    Returns:
+        int: Number of jobs updated
+    """
+    costs = defaultdict(lambda: {field: Decimal('0') for field in COST_FIELDS})
+
+    # Material: quantity x unit_price per line, rounded like add_material_costs
+    material_costs = _sum_cents_by_job(
+        JobMaterial.objects.filter(unit_price__isnull=False),
+        _sql_divide_rounded(_sql_cents('quantity') * _sql_cents('unit_price'), 100),
+    )
+    for job_pk, cost in material_costs.items():
+        costs[job_pk]['material_cost'] = cost
+
+    # Labor: each closed entry priced with its user's rate, rounded like add_labor_cost
+    labor_costs = _sum_cents_by_job(
+        JobTimeTracking.objects.filter(end_time__isnull=False, user__operator__hourly_rate__gt=0),
+        _sql_divide_rounded(
+            Microseconds('start_time', 'end_time') * _sql_cents('user__operator__hourly_rate'),
+            MICROSECONDS_PER_HOUR,
+        ),
+    )
+    for job_pk, cost in labor_costs.items():
+        costs[job_pk]['labor_cost'] = cost
+
+    # Machine: closed usage costs per job
+    machine_costs = MachineUsage.objects.filter(
+        end_time__isnull=False, total_cost__isnull=False, job__isnull=False
+    ).values('job_id').annotate(cost=Sum('total_cost')).values_list('job_id', 'cost')
+    for job_pk, cost in machine_costs:
+        costs[job_pk]['machine_cost'] = cost
+
+    with transaction.atomic():
+        financials = {financial.job_id: financial for financial in JobFinancial.objects.select_for_update()}
+        missing = [JobFinancial(job_id=job_pk) for job_pk in costs if job_pk not in financials]
+        for financial in JobFinancial.objects.bulk_create(missing, batch_size=REBUILD_BATCH_SIZE):
+            financials[financial.job_id] = financial
+
+        for job_pk, financial in financials.items():
+            for field, value in costs.get(job_pk, {field: Decimal('0') for field in COST_FIELDS}).items():
+                setattr(financial, field, value.quantize(CENT))
+        JobFinancial.objects.bulk_update(financials.values(), COST_FIELDS, batch_size=REBUILD_BATCH_SIZE)
+    return len(financials)
@@ -0,0 +1,117 @@
+# workshop_app/utils/job_detail.py
+
+"""
+Data for the job detail page.
+
+Time totals are summed by the database (end_time - start_time, with open
+entries counted up to now) instead of loading every time entry, and the
+time log and material tables are keyset-paginated, so the page issues
+the same handful of queries however long the job has been running.
+"""
+from datetime import timedelta
+
+from django.db.models import DurationField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from workshop_app.models import JobMaterial, Machine
+from workshop_app.models.job_time_tracking import JobTimeTracking
+from workshop_app.utils.keyset_pagination import paginate_keyset
+from workshop_app.utils.staff_context import get_staff_context
+
+# Rows per page of the time log and material tables
+JOB_DETAIL_PAGE_SIZE = 25
+
+# Query parameters holding the page cursors of each table
+TIME_LOG_CURSORS = ('time_after', 'time_before')
+MATERIAL_CURSORS = ('materials_after', 'materials_before')
+
+
+def time_totals(job, now=None):
+    """
+    Total time logged on a job, overall and per user
+
+    Args:
+        job (Job): Job to total
+        now (datetime): End time used for entries still running
+
+    Returns:
+        tuple: (total timedelta, list of dicts with user_id, username,
+        first_name, last_name and total, longest total first)
+    """
+    now = now or timezone.now()
+    duration = ExpressionWrapper(
+        Coalesce(F('end_time'), Value(now)) - F('start_time'),
+        output_field=DurationField(),
+    )
+    per_user = list(
+        JobTimeTracking.objects.filter(job=job)
+        .values('user_id', 'user__username', 'user__first_name', 'user__last_name')
+        .annotate(total=Sum(duration))
+        .order_by('-total')
+    )
+    users = [
+        {
+            'user_id': row['user_id'],
+            'username': row['user__username'],
+            'full_name': f"{row['user__first_name']} {row['user__last_name']}".strip() or row['user__username'],
+            'total': row['total'] or timedelta(0),
+            'hours': round((row['total'] or timedelta(0)).total_seconds() / 3600, 2),
+        }
+        for row in per_user
+    ]
+    total = sum((user['total'] for user in users), timedelta(0))
+    return total, users
+
+
+def _page_query(request, cursors):
+    """Query string for one table's page links, keeping the other table's position"""
+    query = request.GET.copy()
+    for param in cursors:
+        query.pop(param, None)
+    return query.urlencode()
+
+
+def load_job_detail(request, job):
+    """
+    Build the job detail template context
+
+    Args:
+        request (HttpRequest): Current request (user and page cursors)
+        job (Job): Job being displayed
+
+    Returns:
+        dict: Template context
+    """
+    time_logs = paginate_keyset(
+        JobTimeTracking.objects.filter(job=job).select_related('user'),
+        'time',
+        ('-start_time', '-pk'),
+        JOB_DETAIL_PAGE_SIZE,
+        after=request.GET.get('time_after'),
+        before=request.GET.get('time_before'),
+    )
+    materials = paginate_keyset(
+        JobMaterial.objects.filter(job=job).select_related('material'),
+        'materials',
+        ('-date_used', '-pk'),
+        JOB_DETAIL_PAGE_SIZE,
+        after=request.GET.get('materials_after'),
+        before=request.GET.get('materials_before'),
+    )
+    total, user_totals = time_totals(job)
+    active_job = get_staff_context(request).active_job
+
+    return {
+        'job': job,
+        'materials': materials.object_list,
+        'materials_page': materials,
+        'materials_page_query': _page_query(request, MATERIAL_CURSORS),
+        'current_machines': Machine.objects.filter(current_job=job).select_related('machine_type'),
+        'is_active_job': active_job is not None and active_job.pk == job.pk,
+        'time_logs': time_logs.object_list,
+        'time_logs_page': time_logs,
+        'time_logs_page_query': _page_query(request, TIME_LOG_CURSORS),
+        'total_hours': round(total.total_seconds() / 3600, 2),
+        'user_totals': user_totals,
+    }
@@ -0,0 +1,108 @@
+# workshop_app/utils/job_references.py
+
+"""
+Backfill of the job / operator_user foreign keys of MaterialTransaction
+and MachineUsage from their legacy job_reference / operator_name strings.
+
+New rows get the foreign keys when they are written; this only fills in
+rows created before migration 0021. Rows are processed in primary key
+batches, each in its own transaction, so a large history is backfilled
+without holding long locks and the command can be interrupted and rerun.
+Machine sessions that close before the backfill has run get their job
+link from close_usage instead, so their cost still reaches the job.
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from workshop_app.models import Job, MachineUsage, MaterialTransaction
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def operator_names():
+    """
+    Map the names stored in operator_name to user ids
+
+    operator_name holds get_full_name() or the username. Full names shared
+    by several users are ambiguous and left unmapped.
+
+    Returns:
+        dict: {name: user id}
+    """
+    users = list(User.objects.values_list('pk', 'username', 'first_name', 'last_name'))
+    full_names = {pk: f"{first_name} {last_name}".strip() for pk, username, first_name, last_name in users}
+    name_counts = Counter(name for name in full_names.values() if name)
+
+    names = {username: pk for pk, username, first_name, last_name in users}
+    for pk, name in full_names.items():
+        if name and name_counts[name] == 1:
+            names.setdefault(name, pk)
+    return names
+
+
+def backfill_model(model, batch_size=DEFAULT_BATCH_SIZE, users=None):
+    """
+    Fill job and operator_user of one model's rows where they are missing
+
+    Rows whose reference matches no job (restocks, adjustments, deleted
+    jobs) or whose name matches no single user keep a null link.
+
+    Args:
+        model (Model): MaterialTransaction or MachineUsage
+        batch_size (int): Rows per batch
+        users (dict): Output of operator_names(), loaded if not given
+
+    Returns:
+        tuple: (rows linked to a job, rows linked to an operator)
+    """
+    users = operator_names() if users is None else users
+    linked_jobs = linked_operators = 0
+    last_pk = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                model.objects.filter(
+                    Q(job__isnull=True) | Q(operator_user__isnull=True), pk__gt=last_pk
+                ).only('pk', 'job_reference', 'operator_name', 'job', 'operator_user').order_by('pk')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+
+            jobs = dict(
+                Job.objects.filter(job_id__in={row.job_reference for row in rows}).values_list('job_id', 'pk')
+            )
+            changed = []
+            for row in rows:
+                updated = False
+                if row.job_id is None and row.job_reference in jobs:
+                    row.job_id = jobs[row.job_reference]
+                    linked_jobs += 1
+                    updated = True
+                if row.operator_user_id is None and row.operator_name in users:
+                    row.operator_user_id = users[row.operator_name]
+                    linked_operators += 1
+                    updated = True
+                if updated:
+                    changed.append(row)
+            model.objects.bulk_update(changed, ['job', 'operator_user'])
+
+    return linked_jobs, linked_operators
+
+
+def backfill_job_references(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Backfill the foreign keys of material transactions and machine usages
+
+    Returns:
+        dict: {model name: (rows linked to a job, rows linked to an operator)}
+    """
+    users = operator_names()
+    return {
+        model.__name__: backfill_model(model, batch_size, users)
+        for model in (MaterialTransaction, MachineUsage)
+    }
@@ -0,0 +1,159 @@
+# workshop_app/utils/keyset_pagination.py
+
+import base64
+import binascii
+import json
+
+from django.db.models import F, Q
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset.
+
+    Exposes the attributes the list templates use (object_list, has_next,
+    has_previous) plus opaque cursors for the neighbouring pages.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(key, values):
+    """
+    Encode the sort values of a row into an opaque, URL-safe cursor.
+
+    Args:
+        key (str): Name of the sort the cursor belongs to
+        values (list): Values of the ordering fields for the row
+
+    Returns:
+        str: Cursor string
+    """
+    payload = json.dumps([key] + [str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, key, field_count):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): Cursor string from the request
+        key (str): Name of the sort currently in use
+        field_count (int): Number of ordering fields expected
+
+    Returns:
+        list or None: The sort values, or None if the cursor is missing,
+        malformed or belongs to a different sort
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(payload, list) or len(payload) != field_count + 1 or payload[0] != key:
+        return None
+    return payload[1:]
+
+
+def _field_name(field):
+    """Field name without the '-' descending marker"""
+    return field.lstrip('-')
+
+
+def _seek_filter(fields, values, forward):
+    """
+    Build the row-value comparison (f1, f2, ...) > (v1, v2, ...) as a Q object.
+
+    Expanded to (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... so it works on
+    every database backend and can use a composite index on the fields.
+    Descending fields ('-name') compare the other way.
+    """
+    condition = Q()
+    for position, field in enumerate(fields):
+        lookup = 'gt' if forward != field.startswith('-') else 'lt'
+        term = Q(**{f'{_field_name(field)}__{lookup}': values[position]})
+        for previous_field, previous_value in zip(fields[:position], values[:position]):
+            term &= Q(**{_field_name(previous_field): previous_value})
+        condition |= term
+    return condition
+
+
+def paginate_keyset(queryset, key, fields, page_size, after=None, before=None):
+    """
+    Return one page of a queryset using keyset (seek) pagination.
+
+    Instead of OFFSET the page is selected with a WHERE clause on the
+    ordering fields of the last row seen, so every page costs the same as
+    the first one.
+
+    Args:
+        queryset (QuerySet): Filtered, unordered queryset
+        key (str): Name of the sort, stored in the cursors
+        fields (tuple): Ordering fields, '-' prefixed for descending; the
+            last one must be unique (e.g. 'pk')
+        page_size (int): Number of rows per page
+        after (str): Cursor of the last row of the previous page
+        before (str): Cursor of the first row of the next page
+
+    Returns:
+        KeysetPage: The requested page
+    """
+    after_values = decode_cursor(after, key, len(fields))
+    before_values = decode_cursor(before, key, len(fields)) if after_values is None else None
+    backwards = before_values is not None
+
+    if backwards:
+        queryset = queryset.filter(_seek_filter(fields, before_values, forward=False))
+        queryset = queryset.order_by(*[
+            F(_field_name(field)).asc() if field.startswith('-') else F(field).desc()
+            for field in fields
+        ])
+    else:
+        if after_values is not None:
+            queryset = queryset.filter(_seek_filter(fields, after_values, forward=True))
+        queryset = queryset.order_by(*fields)
+
+    # Fetch one extra row to find out whether there is another page
+    rows = list(queryset.annotate(**{
+        f'_keyset_{position}': F(_field_name(field)) for position, field in enumerate(fields)
+    })[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor(key, [getattr(row, f'_keyset_{position}') for position in range(len(fields))])
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = cursor_for(rows[-1])
+        if (has_more and backwards) or after_values is not None:
+            previous_cursor = cursor_for(rows[0])
+
+    return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,377 @@
+"""
+Utility functions for generating printable QR label sheets
+"""
+import os
+import textwrap
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+import qrcode
+from django.db.models import Q
+
+Label = namedtuple('Label', ['code', 'title', 'subtitle'])
+
+# A4 page in PDF points, with a 3 x 8 label grid
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_MARGIN = 24
+LABEL_COLUMNS = 3
+LABEL_ROWS = 8
+LABEL_PADDING = 6
+LABELS_PER_PAGE = LABEL_COLUMNS * LABEL_ROWS
+
+LABEL_WIDTH = (PAGE_WIDTH - 2 * PAGE_MARGIN) / LABEL_COLUMNS
+LABEL_HEIGHT = (PAGE_HEIGHT - 2 * PAGE_MARGIN) / LABEL_ROWS
+QR_SIZE = LABEL_HEIGHT - 2 * LABEL_PADDING
+TEXT_WRAP_WIDTH = 16
+
+# Pages waiting in the process pool at any time, per worker. Keeps memory
+# flat no matter how many labels are requested.
+PAGES_IN_FLIGHT_PER_WORKER = 2
+
+LABEL_SHEET_FORMATS = {
+    'pdf': 'application/pdf',
+    'svg': 'image/svg+xml',
+}
+
+
+# Label sources
+
+def _filter_by_id_or_code(queryset, value, id_field, code_field):
+    """Filter on a related object given either its database ID or its code"""
+    if str(value).isdigit():
+        return queryset.filter(**{id_field: value})
+    return queryset.filter(**{code_field: value})
+
+
+def material_labels(category=None, material_type=None, location=None):
+    """Material queryset and label fields, optionally filtered by category, type and location"""
+    from workshop_app.models import Material
+
+    materials = Material.objects.all()
+    if category:
+        materials = _filter_by_id_or_code(
+            materials, category, 'material_type__category_id', 'material_type__category__code__iexact'
+        )
+    if material_type:
+        materials = _filter_by_id_or_code(materials, material_type, 'material_type_id', 'material_type__code__iexact')
+    if location:
+        materials = materials.filter(location_in_workshop__icontains=location)
+
+    return materials.order_by('location_in_workshop', 'material_id'), ('material_id', 'name', 'location_in_workshop')
+
+
+def machine_labels(machine_type=None, location=None):
+    """Machine queryset and label fields, optionally filtered by machine type and location"""
+    from workshop_app.models import Machine
+
+    machines = Machine.objects.all()
+    if machine_type:
+        machines = _filter_by_id_or_code(machines, machine_type, 'machine_type_id', 'machine_type__code__iexact')
+    if location:
+        machines = machines.filter(location_in_workshop__icontains=location)
+
+    return machines.order_by('location_in_workshop', 'machine_id'), ('machine_id', 'name', 'location_in_workshop')
+
+
+def job_labels(status=None):
+    """Job queryset and label fields, optionally filtered by status"""
+    from workshop_app.models import Job
+
+    jobs = Job.objects.exclude(job_id='')
+    if status:
+        if str(status).isdigit():
+            jobs = jobs.filter(status_id=status)
+        else:
+            jobs = jobs.filter(Q(status__name__iexact=status) | Q(status_text__iexact=status))
+
+    return jobs.order_by('job_id'), ('job_id', 'project_name', 'status_text')
+
+
+LABEL_SOURCES = {
+    'material': material_labels,
+    'machine': machine_labels,
+    'job': job_labels,
+}
+
+
+def get_labels(kind, **filters):
+    """
+    Look up the labels to print
+
+    Args:
+        kind (str): 'material', 'machine' or 'job'
+        **filters: Filters accepted by the matching *_labels function
+
+    Returns:
+        tuple: (label count, iterator of Label)
+    """
+    if kind not in LABEL_SOURCES:
+        raise ValueError(f"Unknown label kind: {kind}")
+
+    queryset, fields = LABEL_SOURCES[kind](**filters)
+    rows = queryset.values_list(*fields)
+    count = rows.count()
+    return count, (Label(*row) for row in rows.iterator(chunk_size=LABELS_PER_PAGE * 10))
+
+
+# QR rendering (runs in worker processes)
+
+def qr_matrix(data):
+    """
+    Return the module matrix of a QR code as rows of dark-module runs
+
+    Each row is a list of (start, length) runs, which is all the sheet
+    writers need to draw the code.
+    """
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        border=0,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    rows = []
+    for row in qr.get_matrix():
+        runs = []
+        start = None
+        for x, dark in enumerate(row):
+            if dark and start is None:
+                start = x
+            elif not dark and start is not None:
+                runs.append((start, x - start))
+                start = None
+        if start is not None:
+            runs.append((start, len(row) - start))
+        rows.append(runs)
+    return rows
+
+
+def render_page_matrices(labels):
+    """Compute the QR matrices for one page of labels"""
+    return labels, [qr_matrix(label.code) for label in labels]
+
+
+def _pages(labels):
+    page = []
+    for label in labels:
+        page.append(label)
+        if len(page) == LABELS_PER_PAGE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def iter_rendered_pages(labels, workers=1):
+    """
+    Yield (labels, matrices) per page, optionally computing QR codes in a process pool
+
+    The pool is meant for the print_labels command; web requests render in
+    their own process rather than forking workers per request. At most
+    PAGES_IN_FLIGHT_PER_WORKER pages per worker are queued, so memory stays
+    flat for any number of labels.
+
+    Args:
+        labels: Iterable of Label
+        workers (int): Worker processes; 0 or 1 renders in this process,
+            None uses one per CPU
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for page in _pages(labels):
+            yield render_page_matrices(page)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for page in _pages(labels):
+            in_flight.append(executor.submit(render_page_matrices, page))
+            if len(in_flight) >= workers * PAGES_IN_FLIGHT_PER_WORKER:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+# Sheet layout
+
+def _label_origin(index):
+    """Top-left corner of a label slot, in top-down page coordinates"""
+    column = index % LABEL_COLUMNS
+    row = index // LABEL_COLUMNS
+    return PAGE_MARGIN + column * LABEL_WIDTH, PAGE_MARGIN + row * LABEL_HEIGHT
+
+
+def _label_text_lines(label):
+    """(font size, bold, text) lines printed next to the QR code"""
+    lines = [(8, True, label.code)]
+    for line in textwrap.wrap(label.title or '', TEXT_WRAP_WIDTH)[:3]:
+        lines.append((7, False, line))
+    if label.subtitle:
+        lines.append((6, False, textwrap.shorten(label.subtitle, TEXT_WRAP_WIDTH, placeholder='...')))
+    return lines
+
+
+# PDF output
+
+def _pdf_string(text):
+    """Encode text as a PDF literal string using the standard font encoding"""
+    data = text.encode('latin-1', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _pdf_page_content(labels, matrices):
+    commands = []
+    for index, (label, matrix) in enumerate(zip(labels, matrices)):
+        left, top = _label_origin(index)
+        qr_left = left + LABEL_PADDING
+        qr_top = top + LABEL_PADDING
+        module = QR_SIZE / len(matrix)
+
+        # QR code: one rectangle per run of dark modules, filled at once
+        for y, runs in enumerate(matrix):
+            pdf_y = PAGE_HEIGHT - (qr_top + (y + 1) * module)
+            for start, length in runs:
+                commands.append(
+                    f"{qr_left + start * module:.2f} {pdf_y:.2f} {length * module:.2f} {module:.2f} re".encode()
+                )
+        commands.append(b'f')
+
+        # Text next to the QR code
+        text_left = qr_left + QR_SIZE + LABEL_PADDING
+        baseline = top + LABEL_PADDING
+        for size, bold, text in _label_text_lines(label):
+            baseline += size + 2
+            font = b'/F2' if bold else b'/F1'
+            commands.append(
+                b'BT ' + font + f" {size} Tf {text_left:.2f} {PAGE_HEIGHT - baseline:.2f} Td ".encode()
+                + _pdf_string(text) + b' Tj ET'
+            )
+    return zlib.compress(b'\n'.join(commands))
+
+
+def iter_pdf_sheet(pages):
+    """
+    Write a multi-page PDF label sheet, yielding it chunk by chunk
+
+    Args:
+        pages: Iterable of (labels, matrices) as produced by iter_rendered_pages
+    """
+    offsets = {}
+    position = 0
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        data = f"{number} 0 obj\n".encode() + body + b'\nendobj\n'
+        position += len(data)
+        return data
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield write_object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    yield write_object(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+
+    page_numbers = []
+    next_number = 5
+    for labels, matrices in pages:
+        content = _pdf_page_content(labels, matrices)
+        content_number, page_number = next_number, next_number + 1
+        next_number += 2
+        yield write_object(
+            content_number,
+            f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b'\nendstream'
+        )
+        yield write_object(page_number, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_number} 0 R >>"
+        ).encode())
+        page_numbers.append(page_number)
+
+    kids = ' '.join(f"{number} 0 R" for number in page_numbers)
+    yield write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>".encode())
+
+    xref_position = position
+    xref = [f"xref\n0 {next_number}\n".encode(), b'0000000000 65535 f \n']
+    for number in range(1, next_number):
+        xref.append(f"{offsets[number]:010d} 00000 n \n".encode())
+    xref.append(f"trailer\n<< /Size {next_number} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n".encode())
+    yield b''.join(xref)
+
+
+# SVG output
+
+def _svg_page(labels, matrices, offset):
+    parts = [f'<g transform="translate(0 {offset})">',
+             f'<rect width="{PAGE_WIDTH}" height="{PAGE_HEIGHT}" fill="white"/>']
+    for index, (label, matrix) in enumerate(zip(labels, matrices)):
+        left, top = _label_origin(index)
+        qr_left = left + LABEL_PADDING
+        qr_top = top + LABEL_PADDING
+        module = QR_SIZE / len(matrix)
+
+        path = []
+        for y, runs in enumerate(matrix):
+            for start, length in runs:
+                path.append(
+                    f"M{qr_left + start * module:.2f} {qr_top + y * module:.2f}"
+                    f"h{length * module:.2f}v{module:.2f}h{-length * module:.2f}z"
+                )
+        parts.append(f'<path d="{"".join(path)}" fill="black"/>')
+
+        text_left = qr_left + QR_SIZE + LABEL_PADDING
+        baseline = top + LABEL_PADDING
+        for size, bold, text in _label_text_lines(label):
+            baseline += size + 2
+            weight = ' font-weight="bold"' if bold else ''
+            parts.append(
+                f'<text x="{text_left:.2f}" y="{baseline:.2f}" font-size="{size}"{weight}>{escape(text)}</text>'
+            )
+    parts.append('</g>')
+    return '\n'.join(parts)
+
+
+def iter_svg_sheet(pages, page_count):
+    """
+    Write an SVG label sheet with the pages stacked vertically, chunk by chunk
+
+    Args:
+        pages: Iterable of (labels, matrices) as produced by iter_rendered_pages
+        page_count (int): Number of pages, needed up front for the document size
+    """
+    page_count = max(page_count, 1)
+    total_height = PAGE_HEIGHT * page_count
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{PAGE_WIDTH}pt" height="{total_height}pt" '
+        f'viewBox="0 0 {PAGE_WIDTH} {total_height}" font-family="Helvetica, Arial, sans-serif">\n'
+    ).encode()
+    for page_index, (labels, matrices) in enumerate(pages):
+        yield _svg_page(labels, matrices, page_index * PAGE_HEIGHT).encode() + b'\n'
+    yield b'</svg>\n'
+
+
+def iter_label_sheet(labels, label_count, sheet_format='pdf', workers=1):
+    """
+    Render labels into a PDF or SVG sheet, yielding the output page by page
+
+    Args:
+        labels: Iterable of Label
+        label_count (int): Number of labels (used for the SVG page count)
+        sheet_format (str): 'pdf' or 'svg'
+        workers (int): Worker processes for QR rendering (see iter_rendered_pages)
+    """
+    pages = iter_rendered_pages(labels, workers)
+    if sheet_format == 'svg':
+        page_count = -(-label_count // LABELS_PER_PAGE)
+        return iter_svg_sheet(pages, page_count)
+    if sheet_format == 'pdf':
+        return iter_pdf_sheet(pages)
+    raise ValueError(f"Unsupported label sheet format: {sheet_format}")
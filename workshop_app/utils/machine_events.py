@@ -0,0 +1,110 @@
+# workshop_app/utils/machine_events.py
+
+"""
+In-process publish/subscribe for machine status changes.
+
+The usage views publish a status delta when a machine changes state and
+every open machine board stream receives it. Subscribers are asyncio
+queues owned by the ASGI event loop; publishers may run in any thread
+(sync views run in a worker thread under ASGI), so events are handed to
+the loop with call_soon_threadsafe.
+
+The broker lives in the server process, so all board screens must be
+served by the same ASGI process as the views that change machine state
+(e.g. `uvicorn workshop_management.asgi:application` with one worker).
+That is why streaming is opt-in (MACHINE_BOARD_STREAM); otherwise the
+board polls snapshots and nothing is published to it.
+"""
+import asyncio
+import itertools
+import threading
+
+from django.db import transaction
+
+# Events kept per subscriber before the oldest ones are dropped; a
+# snapshot on reconnect makes up for anything a slow screen missed
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def machine_status_event(machine):
+    """
+    Build the status delta pushed to board screens
+
+    Args:
+        machine (Machine): Machine whose state changed
+
+    Returns:
+        dict: JSON-serialisable machine state
+    """
+    current_job = machine.current_job
+    return {
+        'machine_id': machine.machine_id,
+        'name': machine.name,
+        'status': machine.status,
+        'status_display': machine.get_status_display(),
+        'current_job': current_job.job_id if current_job else None,
+        'current_job_name': current_job.project_name if current_job else None,
+        'reserved_until': machine.reserved_until.isoformat() if machine.reserved_until else None,
+    }
+
+
+class MachineEventBroker:
+    """Fan-out of machine events to every connected board stream"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._event_ids = itertools.count(1)
+
+    def subscribe(self):
+        """
+        Register a subscriber on the running event loop
+
+        Returns:
+            asyncio.Queue: Queue receiving (event_id, event) tuples
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {(loop, q) for loop, q in self._subscribers if q is not queue}
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        """Send an event to every subscriber; safe to call from any thread"""
+        item = (next(self._event_ids), event)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, item)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queue, item):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+
+# Shared instance used by the usage views and the board stream
+machine_events = MachineEventBroker()
+
+
+def publish_machine_status(machine):
+    """
+    Publish a machine's new state once the current transaction commits
+
+    Args:
+        machine (Machine): Machine whose state changed
+    """
+    event = machine_status_event(machine)
+    transaction.on_commit(lambda: machine_events.publish(event))
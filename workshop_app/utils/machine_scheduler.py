@@ -0,0 +1,159 @@
+# workshop_app/utils/machine_scheduler.py
+
+"""
+Machine reservations: booking with conflict detection and free-slot search.
+
+Reservations of one machine never overlap, so sorted by start time they
+are also sorted by end time. The only reservation that can overlap a new
+slot [start, end) is therefore the one with the latest start before
+`end`, which the (machine, start_time) index finds with a single seek.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from workshop_app.models import Machine, MachineReservation
+
+
+class ReservationConflict(Exception):
+    """Raised when a requested slot overlaps an existing reservation"""
+
+    def __init__(self, reservation):
+        self.reservation = reservation
+        super().__init__(
+            f'{reservation.machine.name} is already reserved from '
+            f'{timezone.localtime(reservation.start_time):%Y-%m-%d %H:%M} to '
+            f'{timezone.localtime(reservation.end_time):%Y-%m-%d %H:%M}'
+        )
+
+
+def find_conflict(machine, start, end, exclude_pk=None):
+    """
+    Return the reservation overlapping [start, end) on a machine, if any
+
+    Args:
+        machine (Machine): Machine to check
+        start (datetime): Slot start
+        end (datetime): Slot end
+        exclude_pk (int): Reservation to ignore (when moving an existing one)
+
+    Returns:
+        MachineReservation or None: The overlapping reservation
+    """
+    reservations = MachineReservation.objects.filter(machine=machine, start_time__lt=end)
+    if exclude_pk is not None:
+        reservations = reservations.exclude(pk=exclude_pk)
+    latest = reservations.order_by('-start_time').first()
+    if latest is not None and latest.end_time > start:
+        return latest
+    return None
+
+
+def book_reservation(machine, user, start, end, job=None, notes=''):
+    """
+    Reserve a machine for [start, end)
+
+    The machine row is locked while checking and inserting, so two people
+    booking the same slot at once cannot both succeed.
+
+    Args:
+        machine (Machine): Machine to reserve
+        user (User): Person making the booking
+        start (datetime): Slot start
+        end (datetime): Slot end, after start
+        job (Job): Job the slot is for, optional
+        notes (str): Free text
+
+    Returns:
+        MachineReservation: The new reservation
+
+    Raises:
+        ValueError: If the slot is empty or in the past
+        ReservationConflict: If the slot overlaps an existing reservation
+    """
+    if end <= start:
+        raise ValueError('The reservation must end after it starts')
+    if end <= timezone.now():
+        raise ValueError('The reservation is in the past')
+
+    with transaction.atomic():
+        # Serialise bookings per machine
+        Machine.objects.select_for_update().filter(pk=machine.pk).exists()
+        conflict = find_conflict(machine, start, end)
+        if conflict is not None:
+            raise ReservationConflict(conflict)
+        return MachineReservation.objects.create(
+            machine=machine,
+            reserved_by=user,
+            job=job,
+            start_time=start,
+            end_time=end,
+            notes=notes,
+        )
+
+
+def current_reservation(machine, at=None):
+    """Return the reservation covering a moment (default: now), if any"""
+    at = at or timezone.now()
+    latest = MachineReservation.objects.filter(
+        machine=machine, start_time__lte=at
+    ).order_by('-start_time').first()
+    if latest is not None and latest.end_time > at:
+        return latest
+    return None
+
+
+def next_free_slot(machine_type, duration, after=None):
+    """
+    Find the earliest slot of `duration` on any available machine of a type
+
+    Reads the reservations ending after `after` for all machines of the
+    type in one ordered query and stops at the first gap per machine, so
+    past reservations are never scanned. Machines in maintenance or out
+    of order are skipped; machines in use are free from reserved_until.
+
+    Args:
+        machine_type (MachineType): Type of machine needed
+        duration (timedelta): Length of the slot
+        after (datetime): Earliest acceptable start (default: now)
+
+    Returns:
+        tuple or None: (Machine, start datetime), or None if the type has
+        no usable machines
+    """
+    after = after or timezone.now()
+    machines = {
+        machine.pk: machine
+        for machine in Machine.objects.filter(
+            machine_type=machine_type, status__in=['available', 'in_use']
+        )
+    }
+    if not machines:
+        return None
+
+    # Earliest candidate start per machine, pushed back past each reservation
+    # that would collide with it
+    candidates = {}
+    for pk, machine in machines.items():
+        start = after
+        if machine.status == 'in_use' and machine.reserved_until and machine.reserved_until > start:
+            start = machine.reserved_until
+        candidates[pk] = start
+
+    settled = set()
+    reservations = MachineReservation.objects.filter(
+        machine_id__in=machines, end_time__gt=after
+    ).order_by('machine_id', 'start_time').values_list('machine_id', 'start_time', 'end_time')
+    for machine_pk, start_time, end_time in reservations.iterator():
+        if machine_pk in settled:
+            continue
+        candidate = candidates[machine_pk]
+        if start_time >= candidate + duration:
+            # The gap before this reservation is long enough
+            settled.add(machine_pk)
+            if len(settled) == len(machines):
+                break
+        elif end_time > candidate:
+            candidates[machine_pk] = end_time
+
+    machine_pk, start = min(candidates.items(), key=lambda item: (item[1], machines[item[0]].machine_id))
+    return machines[machine_pk], start
@@ -0,0 +1,226 @@
+# workshop_app/utils/machine_sessions.py
+
+"""
+Closing machine usage sessions.
+
+stop_machine_usage closes the session of the person standing at the
+machine. sweep_stale_sessions closes the sessions of people who walked
+away without pressing stop: every open session on a machine whose
+reserved_until passed more than a grace period ago. Stale sessions are
+closed at reserved_until, so they are charged for the time that was
+booked, not for the time nobody was using the machine.
+
+The sweep runs from `manage.py close_stale_machine_sessions` (cron) or,
+when MACHINE_SESSION_SWEEP_INTERVAL is set, from a background thread
+started with the app.
+"""
+import logging
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from workshop_app.models import Job, JobActivityLog, Machine, MachineUsage
+from workshop_app.utils.dashboard_cache import invalidate_machines
+from workshop_app.utils.job_costs import add_machine_costs
+from workshop_app.utils.machine_events import publish_machine_status
+from workshop_app.utils.machine_utilization import record_usages
+
+logger = logging.getLogger(__name__)
+
+# Minutes past reserved_until before an open session counts as abandoned
+DEFAULT_GRACE_MINUTES = 30
+
+# Fields written when a usage is closed
+CLOSE_FIELDS = ('end_time', 'cleanup_time', 'operation_cost', 'cleanup_cost', 'total_cost', 'notes', 'job_id')
+
+
+def close_usage(usage, machine, end_time, cleanup_time):
+    """
+    Set the end time and costs of a usage (the caller saves it)
+
+    Sessions opened before migration 0021 have no job link yet; it is
+    resolved from job_reference here so their cost reaches the job even
+    if backfill_job_references has not run.
+
+    Args:
+        usage (MachineUsage): Open usage
+        machine (Machine): The usage's machine, for its rates
+        end_time (datetime): When the machine stopped
+        cleanup_time (int): Cleanup minutes
+
+    Returns:
+        float: Operation minutes
+    """
+    usage.end_time = end_time
+    usage.cleanup_time = cleanup_time
+    if usage.job_id is None and usage.job_reference:
+        usage.job_id = Job.objects.filter(job_id=usage.job_reference).values_list('pk', flat=True).first()
+
+    # Calculate operation time in minutes
+    operation_minutes = max((usage.end_time - usage.start_time).total_seconds() / 60, 0)
+
+    # Calculate costs if rates are set
+    if machine.hourly_rate:
+        usage.operation_cost = Decimal(operation_minutes / 60) * machine.hourly_rate
+
+    if machine.cleanup_rate:
+        usage.cleanup_cost = Decimal(cleanup_time / 60) * machine.cleanup_rate
+
+    # Calculate total cost
+    usage.total_cost = (usage.setup_cost or 0) + (usage.operation_cost or 0) + (usage.cleanup_cost or 0)
+    return operation_minutes
+
+
+def save_closed_usage(usage):
+    """
+    Write a usage closed by close_usage, unless it was closed meanwhile
+
+    The UPDATE only matches while the stored usage is still open, so a
+    stop and a sweep closing the same session cannot both count it.
+
+    Args:
+        usage (MachineUsage): Usage after close_usage
+
+    Returns:
+        bool: True if this call closed the usage
+    """
+    return bool(
+        MachineUsage.objects.filter(pk=usage.pk, end_time__isnull=True).update(
+            **{field: getattr(usage, field) for field in CLOSE_FIELDS}
+        )
+    )
+
+
+def sweep_stale_sessions(grace_minutes=None, now=None, dry_run=False):
+    """
+    Close every open session on machines left running past their reservation
+
+    The stale machines are locked, each open session closed with a
+    conditional UPDATE (skipping any stopped meanwhile), the machines
+    freed with one UPDATE, and one system activity
+    entry written per session linked to a job. Each closed session
+    is added to the utilization and job cost rollups and the board is told
+    the machine is free.
+
+    Args:
+        grace_minutes (int): Minutes past reserved_until before a session
+            is closed (default: settings.MACHINE_SESSION_GRACE_MINUTES)
+        now (datetime): Current time (default: timezone.now())
+        dry_run (bool): Only report what would be closed
+
+    Returns:
+        list: The closed (or, for a dry run, stale) MachineUsage objects
+    """
+    if grace_minutes is None:
+        grace_minutes = getattr(settings, 'MACHINE_SESSION_GRACE_MINUTES', DEFAULT_GRACE_MINUTES)
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=grace_minutes)
+
+    with transaction.atomic():
+        machines = {
+            machine.pk: machine
+            for machine in Machine.objects.select_for_update().filter(
+                status='in_use', reserved_until__lt=cutoff
+            )
+        }
+        if not machines:
+            return []
+
+        usages = list(
+            MachineUsage.objects.filter(machine_id__in=machines, end_time__isnull=True).order_by('start_time')
+        )
+        if dry_run:
+            return usages
+
+        closed = []
+        for usage in usages:
+            machine = machines[usage.machine_id]
+            close_usage(usage, machine, max(machine.reserved_until, usage.start_time), machine.cleanup_time or 0)
+            usage.notes += (
+                f"\n\nClosed automatically: still open {grace_minutes} minutes after "
+                f"the reservation ended at {timezone.localtime(machine.reserved_until):%Y-%m-%d %H:%M}"
+            )
+            if save_closed_usage(usage):
+                closed.append(usage)
+        usages = closed
+
+        Machine.objects.filter(pk__in=machines).update(
+            status='available', current_job=None, reserved_until=None
+        )
+        invalidate_machines()
+
+        JobActivityLog.objects.bulk_create([
+            JobActivityLog(
+                job_id=usage.job_id,
+                activity_type='machine_usage',
+                description=(
+                    f'{machines[usage.machine_id].name} session of {usage.operator_name} closed '
+                    f'automatically after its reservation ran out'
+                ),
+                metadata={
+                    'machine_id': machines[usage.machine_id].machine_id,
+                    'start_time': usage.start_time.isoformat(),
+                    'end_time': usage.end_time.isoformat(),
+                    'total_cost': str(usage.total_cost),
+                },
+                related_object_type='machine_usage',
+                related_object_id=usage.pk,
+                is_internal=True,
+                is_system_generated=True,
+            )
+            for usage in usages
+            if usage.job_id is not None
+        ])
+
+        record_usages(usages)
+        add_machine_costs(usages)
+        for machine in machines.values():
+            machine.status = 'available'
+            machine.current_job = None
+            machine.reserved_until = None
+            publish_machine_status(machine)
+
+    return usages
+
+
+def _sweep_forever(interval, stop_event):
+    while not stop_event.wait(interval):
+        close_old_connections()
+        try:
+            closed = sweep_stale_sessions()
+            if closed:
+                logger.info(f"Closed {len(closed)} stale machine sessions")
+        except Exception:
+            logger.exception("Stale machine session sweep failed")
+        finally:
+            close_old_connections()
+
+
+_sweeper = None
+
+
+def start_session_sweeper(interval):
+    """
+    Run sweep_stale_sessions every `interval` seconds in a daemon thread
+
+    Only one sweeper runs per process; later calls return the running one.
+
+    Args:
+        interval (float): Seconds between sweeps
+
+    Returns:
+        threading.Event: Set it to stop the sweeper
+    """
+    global _sweeper
+    if _sweeper is None:
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=_sweep_forever, args=(interval, stop_event), name='machine-session-sweeper', daemon=True
+        )
+        thread.start()
+        _sweeper = stop_event
+    return _sweeper
@@ -0,0 +1,260 @@
+# workshop_app/utils/machine_utilization.py
+
+"""
+Machine utilization rollups.
+
+Every closed MachineUsage is added to MachineUtilization buckets: one per
+hour (UTC hours) and one per day (local midnight to midnight) it overlaps.
+Run minutes are split across the buckets the usage spans; setup and
+cleanup minutes, cost and the usage count go to the bucket the usage
+started in.
+
+Reports over a date range read whole days from the daily buckets and the
+partial days at either end from the hourly ones, so the number of rows
+read depends on the length of the range, never on how many usages it
+contains. Day and hour buckets line up as long as TIME_ZONE is a whole
+number of hours from UTC.
+
+stop_machine_usage calls record_usage as each usage closes;
+`manage.py rebuild_machine_utilization` recomputes everything from the
+usage table (after imports or edits in the admin).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from workshop_app.models import Machine, MachineUsage, MachineUtilization
+
+HOUR = timedelta(hours=1)
+
+# Rows per INSERT when rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+
+def hour_floor(moment):
+    """Start of the UTC hour containing a moment"""
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_floor(moment):
+    """Local midnight at the start of the day containing a moment"""
+    return timezone.make_aware(datetime.combine(timezone.localdate(moment), time.min))
+
+
+def next_day(day_start):
+    """Local midnight at the start of the following day"""
+    return timezone.make_aware(datetime.combine(timezone.localdate(day_start) + timedelta(days=1), time.min))
+
+
+def _minutes(delta):
+    return (Decimal(delta.total_seconds()) / 60).quantize(Decimal('0.01'))
+
+
+def _split(start, end, floor, step):
+    """Yield (bucket_start, run minutes) for each bucket [start, end) overlaps"""
+    bucket = floor(start)
+    while bucket < end:
+        bucket_end = step(bucket)
+        yield bucket, _minutes(min(end, bucket_end) - max(start, bucket))
+        bucket = bucket_end
+
+
+def usage_buckets(usage):
+    """
+    Split one closed usage into utilization bucket increments
+
+    Args:
+        usage (MachineUsage): Usage with start_time and end_time set
+
+    Returns:
+        list: (period, bucket_start, increments dict) tuples
+    """
+    buckets = []
+    for period, floor, step in (('hour', hour_floor, lambda bucket: bucket + HOUR), ('day', day_floor, next_day)):
+        for index, (bucket_start, run_minutes) in enumerate(_split(usage.start_time, usage.end_time, floor, step)):
+            increments = {'run_minutes': run_minutes}
+            if index == 0:
+                increments.update({
+                    'setup_minutes': usage.setup_time or 0,
+                    'cleanup_minutes': usage.cleanup_time or 0,
+                    'total_cost': usage.total_cost or Decimal('0.00'),
+                    'usage_count': 1,
+                })
+            buckets.append((period, bucket_start, increments))
+    return buckets
+
+
+def _bucket_totals(usages):
+    """Sum the bucket increments of closed usages by (machine, period, bucket_start)"""
+    totals = defaultdict(lambda: defaultdict(Decimal))
+    for usage in usages:
+        if usage.end_time is None or usage.end_time <= usage.start_time:
+            continue
+        for period, bucket_start, increments in usage_buckets(usage):
+            bucket = totals[(usage.machine_id, period, bucket_start)]
+            for field, value in increments.items():
+                bucket[field] += value
+    return totals
+
+
+def record_usages(usages):
+    """
+    Add closed usages to their machines' utilization buckets
+
+    Increments are summed per bucket first. Missing buckets are inserted
+    in one statement, then each bucket is incremented with an F() update,
+    so usages closing at the same time on the same machine cannot lose
+    each other's minutes.
+
+    Args:
+        usages (list): MachineUsage objects with start_time and end_time set
+    """
+    totals = _bucket_totals(usages)
+    if not totals:
+        return
+
+    with transaction.atomic():
+        MachineUtilization.objects.bulk_create(
+            [
+                MachineUtilization(machine_id=machine_id, period=period, bucket_start=bucket_start)
+                for machine_id, period, bucket_start in totals
+            ],
+            ignore_conflicts=True,
+        )
+        for (machine_id, period, bucket_start), increments in totals.items():
+            MachineUtilization.objects.filter(
+                machine_id=machine_id, period=period, bucket_start=bucket_start
+            ).update(**{field: F(field) + value for field, value in increments.items()})
+
+
+def record_usage(usage):
+    """Add one closed usage to its machine's utilization buckets"""
+    record_usages([usage])
+
+
+def rebuild_utilization():
+    """
+    Recompute every utilization bucket from the usage table
+
+    Returns:
+        int: Number of usages rolled up
+    """
+    usages = MachineUsage.objects.filter(end_time__gt=F('start_time')).only(
+        'machine_id', 'start_time', 'end_time', 'setup_time', 'cleanup_time', 'total_cost'
+    )
+    count = usages.count()
+    totals = _bucket_totals(usages.iterator())
+
+    with transaction.atomic():
+        MachineUtilization.objects.all().delete()
+        MachineUtilization.objects.bulk_create(
+            [
+                MachineUtilization(
+                    machine_id=machine_id,
+                    period=period,
+                    bucket_start=bucket_start,
+                    run_minutes=values['run_minutes'],
+                    setup_minutes=int(values['setup_minutes']),
+                    cleanup_minutes=int(values['cleanup_minutes']),
+                    total_cost=values['total_cost'],
+                    usage_count=int(values['usage_count']),
+                )
+                for (machine_id, period, bucket_start), values in totals.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return count
+
+
+def _bucket_filter(start, end):
+    """Buckets covering [start, end): daily for whole days, hourly for the ends"""
+    first_day = day_floor(start)
+    if first_day < start:
+        first_day = next_day(first_day)
+    last_day = day_floor(end)
+
+    if first_day >= last_day:
+        return Q(period='hour', bucket_start__gte=start, bucket_start__lt=end)
+    return (
+        Q(period='day', bucket_start__gte=first_day, bucket_start__lt=last_day) |
+        Q(period='hour', bucket_start__gte=start, bucket_start__lt=first_day) |
+        Q(period='hour', bucket_start__gte=last_day, bucket_start__lt=end)
+    )
+
+
+def _rates(row, available_minutes):
+    """Add utilization % and setup share to a row of summed minutes"""
+    busy_minutes = row['run_minutes'] + row['setup_minutes'] + row['cleanup_minutes']
+    row['run_hours'] = row['run_minutes'] / 60
+    row['utilization'] = row['run_minutes'] / available_minutes * 100 if available_minutes else Decimal('0')
+    row['setup_share'] = row['setup_minutes'] / busy_minutes * 100 if busy_minutes else Decimal('0')
+    return row
+
+
+def utilization_report(start, end, machine_type=None):
+    """
+    Utilization per machine and per machine type over [start, end)
+
+    The range is widened to whole UTC hours. Utilization is run time as
+    a share of the calendar time in the range; setup share is setup time
+    as a share of run, setup and cleanup time together.
+
+    Args:
+        start (datetime): Start of the range
+        end (datetime): End of the range
+        machine_type (MachineType): Only report machines of this type
+
+    Returns:
+        dict: 'machines' and 'types' lists of rows with run_hours,
+        utilization, setup_minutes, cleanup_minutes, setup_share,
+        total_cost and usage_count, plus the aligned 'start' and 'end'
+    """
+    start = hour_floor(start)
+    end = hour_floor(end) + (HOUR if end > hour_floor(end) else timedelta(0))
+    available_minutes = _minutes(end - start)
+
+    machines = Machine.objects.select_related('machine_type').order_by('machine_type__name', 'name')
+    buckets = MachineUtilization.objects.filter(_bucket_filter(start, end))
+    if machine_type is not None:
+        machines = machines.filter(machine_type=machine_type)
+        buckets = buckets.filter(machine__machine_type=machine_type)
+
+    sums = {
+        row.pop('machine'): row
+        for row in buckets.values('machine').annotate(
+            run_minutes=Sum('run_minutes'),
+            setup_minutes=Sum('setup_minutes'),
+            cleanup_minutes=Sum('cleanup_minutes'),
+            total_cost=Sum('total_cost'),
+            usage_count=Sum('usage_count'),
+        )
+    }
+
+    empty = {'run_minutes': Decimal('0'), 'setup_minutes': 0, 'cleanup_minutes': 0,
+             'total_cost': Decimal('0'), 'usage_count': 0}
+    machine_rows = []
+    type_rows = {}
+    for machine in machines:
+        totals = sums.get(machine.pk, empty)
+        machine_rows.append(_rates({'machine': machine, **totals}, available_minutes))
+
+        type_row = type_rows.setdefault(machine.machine_type_id, {
+            'machine_type': machine.machine_type, 'machine_count': 0, **empty
+        })
+        type_row['machine_count'] += 1
+        for field, value in totals.items():
+            type_row[field] += value
+
+    return {
+        'start': start,
+        'end': end,
+        'machines': machine_rows,
+        'types': [
+            _rates(row, available_minutes * row['machine_count'])
+            for row in type_rows.values()
+        ],
+    }
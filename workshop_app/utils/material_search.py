@@ -0,0 +1,257 @@
+# workshop_app/utils/material_search.py
+
+"""
+Full-text search index for materials.
+
+On SQLite the index is an FTS5 virtual table keyed by the material's
+rowid; on PostgreSQL it is a side table holding a weighted tsvector with a
+GIN index. Both are created by migration 0014 and kept in sync by the
+Material post_save/post_delete signals. Bulk writes that bypass signals
+(bulk_create, queryset.update) need `manage.py rebuild_material_search`.
+
+When neither index is available the helpers fall back to the original
+icontains search so callers never need to check the backend.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS5_TABLE = 'workshop_app_material_fts'
+TSVECTOR_TABLE = 'workshop_app_material_search'
+
+# Material columns covered by the index, most important first
+INDEXED_FIELDS = ('material_id', 'name', 'supplier_name', 'brand_name', 'location_in_workshop')
+
+# Relative column weights for bm25(), in INDEXED_FIELDS order
+FTS5_WEIGHTS = (10.0, 5.0, 1.0, 1.0, 1.0)
+
+# Best-ranked matches joined to the material table per typeahead query.
+# The index ranks every match, but only this many rows leave it, so broad
+# prefixes ("pl") do not load most of the catalogue.
+SEARCH_CANDIDATE_LIMIT = 500
+
+# Search terms beyond this many are ignored
+MAX_QUERY_TERMS = 8
+
+TERM_RE = re.compile(r'\w+')
+
+FTS5_DOCUMENT_SQL = f"""
+    SELECT id, {', '.join(INDEXED_FIELDS)} FROM workshop_app_material
+"""
+
+TSVECTOR_DOCUMENT_SQL = """
+    SELECT id,
+           setweight(to_tsvector('simple', coalesce(material_id, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+           setweight(to_tsvector('simple', concat_ws(' ', supplier_name, brand_name, location_in_workshop)), 'C')
+    FROM workshop_app_material
+"""
+
+_available = {}
+
+
+def search_backend():
+    """
+    Return which search index the current database uses.
+
+    The answer is cached per database vendor, including "no index", so
+    Material saves do not read the table list each time. Migrations reset
+    it (see reset_search_backend).
+
+    Returns:
+        str or None: 'fts5', 'postgres', or None when no index exists
+    """
+    if connection.vendor not in _available:
+        table, backend = {
+            'sqlite': (FTS5_TABLE, 'fts5'),
+            'postgresql': (TSVECTOR_TABLE, 'postgres'),
+        }.get(connection.vendor, (None, None))
+        if table is not None:
+            with connection.cursor() as cursor:
+                if table not in connection.introspection.table_names(cursor):
+                    # Not migrated yet (or FTS5 is missing)
+                    backend = None
+        _available[connection.vendor] = backend
+    return _available[connection.vendor]
+
+
+def reset_search_backend():
+    """Forget the cached backend, e.g. after migrations created the index"""
+    _available.clear()
+
+
+def search_terms(query):
+    """
+    Split a user query into lowercase word terms.
+
+    Args:
+        query (str): Raw search text
+
+    Returns:
+        list: Up to MAX_QUERY_TERMS terms
+    """
+    return TERM_RE.findall((query or '').lower())[:MAX_QUERY_TERMS]
+
+
+def _match_expression(terms, backend):
+    """Build a prefix query every term must match"""
+    if backend == 'fts5':
+        return ' '.join(f'"{term}"*' for term in terms)
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def index_material(material_pk):
+    """Add or refresh one material in the search index"""
+    backend = search_backend()
+    with connection.cursor() as cursor:
+        if backend == 'fts5':
+            cursor.execute(f"DELETE FROM {FTS5_TABLE} WHERE rowid = %s", [material_pk])
+            cursor.execute(
+                f"INSERT INTO {FTS5_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) "
+                f"{FTS5_DOCUMENT_SQL} WHERE id = %s",
+                [material_pk],
+            )
+        elif backend == 'postgres':
+            cursor.execute(
+                f"INSERT INTO {TSVECTOR_TABLE} (material_id, document) "
+                f"{TSVECTOR_DOCUMENT_SQL} WHERE id = %s "
+                f"ON CONFLICT (material_id) DO UPDATE SET document = EXCLUDED.document",
+                [material_pk],
+            )
+
+
+def unindex_material(material_pk):
+    """Remove one material from the search index"""
+    backend = search_backend()
+    with connection.cursor() as cursor:
+        if backend == 'fts5':
+            cursor.execute(f"DELETE FROM {FTS5_TABLE} WHERE rowid = %s", [material_pk])
+        elif backend == 'postgres':
+            cursor.execute(f"DELETE FROM {TSVECTOR_TABLE} WHERE material_id = %s", [material_pk])
+
+
+def rebuild_index():
+    """
+    Rebuild the whole search index from the material table.
+
+    Returns:
+        int: Number of materials indexed, or None when no index is available
+    """
+    backend = search_backend()
+    if backend is None:
+        return None
+    with connection.cursor() as cursor:
+        if backend == 'fts5':
+            cursor.execute(f"DELETE FROM {FTS5_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS5_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) {FTS5_DOCUMENT_SQL}"
+            )
+        else:
+            cursor.execute(f"DELETE FROM {TSVECTOR_TABLE}")
+            cursor.execute(f"INSERT INTO {TSVECTOR_TABLE} (material_id, document) {TSVECTOR_DOCUMENT_SQL}")
+        return cursor.rowcount
+
+
+def filter_materials(queryset, query):
+    """
+    Restrict a Material queryset to rows matching a search query.
+
+    Every term must match the start of a word in one of INDEXED_FIELDS.
+    Falls back to a substring search when no index is available.
+
+    Args:
+        queryset (QuerySet): Material queryset
+        query (str): Raw search text
+
+    Returns:
+        QuerySet: Filtered queryset
+    """
+    backend = search_backend()
+    terms = search_terms(query)
+
+    if backend is None or not terms:
+        if not query:
+            return queryset
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(material_id__icontains=query) |
+            Q(supplier_name__icontains=query) |
+            Q(brand_name__icontains=query) |
+            Q(location_in_workshop__icontains=query)
+        )
+
+    match = _match_expression(terms, backend)
+    if backend == 'fts5':
+        matching_ids = RawSQL(f"SELECT rowid FROM {FTS5_TABLE} WHERE {FTS5_TABLE} MATCH %s", [match])
+    else:
+        matching_ids = RawSQL(
+            f"SELECT material_id FROM {TSVECTOR_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+            [match],
+        )
+    return queryset.filter(pk__in=matching_ids)
+
+
+def search_materials(query, limit=10):
+    """
+    Return the best matching materials for a typeahead query.
+
+    Results are ranked by bm25 (SQLite) or ts_rank (PostgreSQL) with
+    material ID and name weighted above supplier, brand and location.
+    The index orders all matches by rank and returns the best
+    SEARCH_CANDIDATE_LIMIT, which are then joined to the material table.
+
+    Args:
+        query (str): Raw search text
+        limit (int): Maximum number of results
+
+    Returns:
+        list: Dicts with id, material_id, name, current_stock,
+        unit_of_measurement and location_in_workshop
+    """
+    columns = ('id', 'material_id', 'name', 'current_stock', 'unit_of_measurement', 'location_in_workshop')
+    backend = search_backend()
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if backend is None:
+        from workshop_app.models import Material
+        return list(filter_materials(Material.objects.all(), query).order_by('name').values(*columns)[:limit])
+
+    match = _match_expression(terms, backend)
+    select = ', '.join(f'm.{column}' for column in columns)
+    if backend == 'fts5':
+        weights = ', '.join(str(weight) for weight in FTS5_WEIGHTS)
+        sql = f"""
+            SELECT {select}
+            FROM (
+                SELECT rowid, rank FROM {FTS5_TABLE}
+                WHERE {FTS5_TABLE} MATCH %s AND rank MATCH 'bm25({weights})'
+                ORDER BY rank
+                LIMIT %s
+            ) candidates
+            JOIN workshop_app_material m ON m.id = candidates.rowid
+            ORDER BY candidates.rank, m.name
+            LIMIT %s
+        """
+    else:
+        sql = f"""
+            SELECT {select}
+            FROM (
+                SELECT material_id, ts_rank(document, query) AS rank
+                FROM {TSVECTOR_TABLE}, to_tsquery('simple', %s) query
+                WHERE document @@ query
+                ORDER BY rank DESC
+                LIMIT %s
+            ) candidates
+            JOIN workshop_app_material m ON m.id = candidates.material_id
+            ORDER BY candidates.rank DESC, m.name
+            LIMIT %s
+        """
+    params = [match, SEARCH_CANDIDATE_LIMIT, limit]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,78 @@
+# workshop_app/utils/operator_context.py
+
+"""
+Per-request view of the logged-in user's operator profile.
+
+Views used to call request.user.operator (one query) followed by
+operator.is_certified_for(machine) (one EXISTS query per machine). The
+context loads the certified machine ids once and answers every
+certification check from that set. It is cached on the request, so views
+that call each other (scanned_machine -> start_machine_usage) share it.
+"""
+from workshop_app.models import Operator
+
+
+class OperatorContext:
+    """Operator profile and machine certifications of one user"""
+
+    def __init__(self, user):
+        self.user = user
+        self._operator = None
+        self._operator_loaded = False
+        self._certified_machine_ids = None
+
+    @property
+    def operator(self):
+        """The user's Operator profile, or None"""
+        if not self._operator_loaded:
+            if self.user.is_authenticated:
+                self._operator = Operator.objects.filter(user=self.user).first()
+            self._operator_loaded = True
+        return self._operator
+
+    @property
+    def has_operator(self):
+        return self.operator is not None
+
+    @property
+    def certified_machine_ids(self):
+        """Set of ids of the machines the user is certified for"""
+        if self._certified_machine_ids is None:
+            if not self.user.is_authenticated or (self._operator_loaded and self._operator is None):
+                self._certified_machine_ids = frozenset()
+            else:
+                # Read the M2M table directly; no need to load the operator first
+                self._certified_machine_ids = frozenset(
+                    Operator.certified_machines.through.objects.filter(
+                        operator__user=self.user
+                    ).values_list('machine_id', flat=True)
+                )
+        return self._certified_machine_ids
+
+    def is_certified_for(self, machine):
+        """
+        Check whether the user may operate a machine
+
+        Args:
+            machine (Machine or int): Machine or machine primary key
+
+        Returns:
+            bool: True if the user's operator profile is certified for it
+        """
+        machine_pk = getattr(machine, 'pk', machine)
+        return machine_pk in self.certified_machine_ids
+
+
+def get_operator_context(request):
+    """
+    Return the OperatorContext for a request, creating it on first use
+
+    Args:
+        request (HttpRequest): Current request
+
+    Returns:
+        OperatorContext: Context shared by every caller in this request
+    """
+    if not hasattr(request, '_operator_context'):
+        request._operator_context = OperatorContext(request.user)
+    return request._operator_context
@@ -0,0 +1,121 @@
+# workshop_app/utils/personal_jobs.py
+
+"""
+Provisioning of staff settings and personal jobs.
+
+Every user gets a StaffSettings row and a personal job (PER-<USERNAME>)
+for unassigned work and materials. New users are provisioned by a User
+post_save signal; `manage.py provision_personal_jobs` provisions users
+created before that and can be rerun at any time. The dashboard only
+reads the result.
+"""
+import hashlib
+import logging
+import re
+import string
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from workshop_app.models import Job, JobStatus, StaffSettings
+
+logger = logging.getLogger(__name__)
+
+# Characters after PER- that fit Job.job_id (15) and PERSONAL_JOB_ID_PATTERN
+PERSONAL_JOB_ID_LENGTH = 11
+PERSONAL_JOB_ID_CHARS = re.compile(r'[A-Z0-9_.@+-]+')
+
+# Shortened IDs: PER-<up to 5 username characters>-<5 hash characters>
+PERSONAL_JOB_ID_PREFIX = 5
+PERSONAL_JOB_ID_HASH = 5
+
+# Status created for personal jobs when the database has no job status at all
+# (same values as migration 0010)
+PERSONAL_STATUS_DEFAULTS = {'description': 'Personal project', 'color_code': '#9C27B0', 'order': 1}
+
+
+def personal_job_id(user):
+    """
+    Job ID of a user's personal job
+
+    PER-<USERNAME> when it fits Job.job_id and the barcode grammar;
+    otherwise the username is shortened and a hash of it keeps the ID
+    unique, e.g. PER-ALEXA-3F9KQ.
+    """
+    username = user.username.upper()
+    if len(username) <= PERSONAL_JOB_ID_LENGTH and PERSONAL_JOB_ID_CHARS.fullmatch(username):
+        return f"PER-{username}"
+    prefix = ''.join(char for char in username if PERSONAL_JOB_ID_CHARS.fullmatch(char))[:PERSONAL_JOB_ID_PREFIX]
+    digest = int.from_bytes(hashlib.sha256(user.username.encode()).digest()[:8], 'big')
+    suffix = ''
+    for _ in range(PERSONAL_JOB_ID_HASH):
+        digest, index = divmod(digest, 36)
+        suffix += string.digits[index] if index < 10 else string.ascii_uppercase[index - 10]
+    return f"PER-{prefix}-{suffix}" if prefix else f"PER-{suffix}"
+
+
+def provision_staff(user):
+    """
+    Create a user's staff settings and personal job if they are missing
+
+    A job that already has the personal job ID is reused when it belongs
+    to the user. A 'Personal' status is created if no job status exists,
+    so users created on an empty database are provisioned too.
+
+    Args:
+        user (User): User to provision
+
+    Returns:
+        StaffSettings: The user's settings
+    """
+    with transaction.atomic():
+        staff_settings, created = StaffSettings.objects.get_or_create(user=user)
+        if staff_settings.personal_job_id is not None:
+            return staff_settings
+
+        status = JobStatus.objects.filter(name='Personal').first() or JobStatus.objects.first()
+        if status is None:
+            status, _ = JobStatus.objects.get_or_create(name='Personal', defaults=PERSONAL_STATUS_DEFAULTS)
+
+        # Create a System Personal Account
+        job, created = Job.objects.get_or_create(
+            job_id=personal_job_id(user),
+            defaults={
+                'project_name': f"Personal Account - {user.get_full_name() or user.username}",
+                'project_type': 'PER',
+                'description': "System account for unassigned work and materials",
+                'priority': 'low',
+                'status': status,
+                'status_text': status.name,
+                'created_by': user,
+                'owner': user,
+                'created_date': timezone.now(),
+                'percent_complete': 0,
+            }
+        )
+        if not created and user.pk not in (job.owner_id, job.created_by_id):
+            logger.warning(f"Job {job.job_id} belongs to another user; {user.username} has no personal job")
+            return staff_settings
+
+        staff_settings.personal_job = job
+        staff_settings.save(update_fields=['personal_job'])
+    return staff_settings
+
+
+def provision_missing():
+    """
+    Provision every user without staff settings or a personal job
+
+    Returns:
+        int: Number of users who now have a personal job
+    """
+    users = User.objects.filter(
+        Q(staffsettings__isnull=True) | Q(staffsettings__personal_job__isnull=True)
+    ).order_by('pk')
+    count = 0
+    for user in users:
+        if provision_staff(user).personal_job_id is not None:
+            count += 1
+    return count
@@ -0,0 +1,400 @@
+"""
+In-memory index for resolving scanned codes to jobs, materials and machines
+"""
+import logging
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of rows per model loaded when the index warms up
+DEFAULT_WARMUP_LIMIT = 50000
+
+ScanMatch = namedtuple('ScanMatch', ['scan_type', 'pk', 'item_id', 'name'])
+
+# Order in which code sources are tried for each detected code type.
+# This mirrors the lookup order the scan views have always used.
+RESOLUTION_ORDER = {
+    'job': ('job_id',),
+    'material': ('material_id', 'material_alias'),
+    'machine': ('machine_id', 'machine_alias'),
+    'vendor': ('material_alias', 'machine_alias'),
+    'unknown': ('material_alias', 'machine_alias'),
+}
+
+
+def _job_codes(job):
+    """Return (source, code) pairs under which a job can be scanned"""
+    if job.job_id:
+        yield 'job_id', job.job_id
+
+
+def _material_codes(material):
+    """Return (source, code) pairs under which a material can be scanned"""
+    if material.material_id:
+        yield 'material_id', material.material_id
+    if material.serial_number:
+        yield 'material_alias', material.serial_number
+    if material.supplier_sku:
+        yield 'material_alias', material.supplier_sku
+
+
+def _machine_codes(machine):
+    """Return (source, code) pairs under which a machine can be scanned"""
+    if machine.machine_id:
+        yield 'machine_id', machine.machine_id
+    if machine.serial_number:
+        yield 'machine_alias', machine.serial_number
+
+
+def _job_match(job):
+    return ScanMatch('job', job.pk, job.job_id, job.project_name)
+
+
+def _material_match(material):
+    return ScanMatch('material', material.pk, material.material_id, material.name)
+
+
+def _machine_match(machine):
+    return ScanMatch('machine', machine.pk, machine.machine_id, machine.name)
+
+
+class ScanCodeIndex:
+    """
+    Process-wide map from every known code to the object it identifies.
+
+    The index is warmed up from a background thread at startup when
+    SCAN_RESOLVER_WARM_ON_START is set, otherwise on the first scan, which
+    then waits for it. Warming reads up to SCAN_RESOLVER_WARMUP_LIMIT rows
+    of each of jobs, materials and machines. Afterwards the index is kept
+    current through post_save/post_delete signals once their transaction
+    commits. Codes that are not in the index fall back to the database so
+    objects created by other processes are still found.
+
+    Other processes rename and delete objects without this index hearing
+    about it, so a hit only says which row to check: it is confirmed with
+    one primary-key query (one per model for resolve_many), and a hit
+    whose row is gone or no longer carries the code is dropped and looked
+    up again like a miss. A scan therefore always costs at least one
+    query; what the index saves is the OR-ed lookups over several code
+    columns, which become a single primary-key fetch.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._codes = {}    # code -> {source: ScanMatch}
+        self._owned = {}    # (scan_type, pk) -> set of (source, code)
+        self._warmed = False
+
+    # Index maintenance
+
+    def _add(self, match, codes):
+        key = (match.scan_type, match.pk)
+        with self._lock:
+            self._discard(key)
+            owned = set()
+            for source, code in codes:
+                self._codes.setdefault(code, {})[source] = match
+                owned.add((source, code))
+            self._owned[key] = owned
+
+    def _discard(self, key):
+        with self._lock:
+            for source, code in self._owned.pop(key, ()):
+                entries = self._codes.get(code)
+                if entries is None:
+                    continue
+                match = entries.get(source)
+                if match is not None and (match.scan_type, match.pk) == key:
+                    del entries[source]
+                if not entries:
+                    del self._codes[code]
+
+    def add_job(self, job):
+        self._add(_job_match(job), _job_codes(job))
+
+    def add_material(self, material):
+        self._add(_material_match(material), _material_codes(material))
+
+    def add_machine(self, machine):
+        self._add(_machine_match(machine), _machine_codes(machine))
+
+    def remove(self, scan_type, pk):
+        self._discard((scan_type, pk))
+
+    def clear(self):
+        with self._lock:
+            self._codes.clear()
+            self._owned.clear()
+            self._warmed = False
+
+    def warm_up(self, limit=None):
+        """Load codes for existing jobs, materials and machines"""
+        from workshop_app.models import Job, Material, Machine
+
+        if limit is None:
+            limit = getattr(settings, 'SCAN_RESOLVER_WARMUP_LIMIT', DEFAULT_WARMUP_LIMIT)
+
+        with self._lock:
+            if self._warmed:
+                return
+            try:
+                for job in Job.objects.only('job_id', 'project_name')[:limit]:
+                    self.add_job(job)
+                for material in Material.objects.only(
+                    'material_id', 'name', 'serial_number', 'supplier_sku'
+                )[:limit]:
+                    self.add_material(material)
+                for machine in Machine.objects.only('machine_id', 'name', 'serial_number')[:limit]:
+                    self.add_machine(machine)
+            except Exception as e:
+                # Leave the index cold; lookups keep falling back to the database
+                logger.error(f"Error warming up scan code index: {e}")
+                return
+            self._warmed = True
+
+    # Lookups
+
+    def resolve(self, code, code_type='unknown'):
+        """
+        Resolve a parsed code to the object it identifies
+
+        An index hit costs one primary-key query to verify it; a miss costs
+        one query per code source tried.
+
+        Args:
+            code (str): Parsed code (see barcode_utils.classify_code)
+            code_type (str): Type detected by barcode_utils.classify_code
+
+        Returns:
+            ScanMatch or None: The matched object, or None if nothing matches
+        """
+        if not code:
+            return None
+
+        if not self._warmed:
+            self.warm_up()
+
+        sources = RESOLUTION_ORDER.get(code_type, RESOLUTION_ORDER['unknown'])
+        hit = self._lookup(code, sources)
+        if hit is not None:
+            match = self._verify({code: hit}).get(code)
+            if match is not None:
+                return match
+
+        return self._resolve_from_database(code, sources)
+
+    def resolve_many(self, typed_codes):
+        """
+        Resolve several parsed codes at once
+
+        Codes found in the index cost nothing; the remaining codes are looked
+        up with one set-based query per code source.
+
+        Args:
+            typed_codes (list): (code, code_type) pairs
+
+        Returns:
+            dict: {code: ScanMatch or None}
+        """
+        if not self._warmed:
+            self.warm_up()
+
+        results = {}
+        hits = {}
+        pending = {}
+        for code, code_type in typed_codes:
+            if not code or code in results:
+                continue
+            sources = RESOLUTION_ORDER.get(code_type, RESOLUTION_ORDER['unknown'])
+            results[code] = None
+            hit = self._lookup(code, sources)
+            if hit is not None:
+                hits[code] = hit
+            pending[code] = sources
+
+        for code, match in self._verify(hits).items():
+            results[code] = match
+            del pending[code]
+
+        if pending:
+            found = self._resolve_many_from_database(pending)
+            for code, sources in pending.items():
+                for source in sources:
+                    if (source, code) in found:
+                        results[code] = found[(source, code)]
+                        break
+        return results
+
+    def _lookup(self, code, sources):
+        """First (source, ScanMatch) in the index for a code, in resolution order"""
+        entries = self._codes.get(code)
+        if entries:
+            for source in sources:
+                match = entries.get(source)
+                if match is not None:
+                    return source, match
+        return None
+
+    def _verify(self, hits):
+        """
+        Check index hits against the database
+
+        Args:
+            hits (dict): {code: (source, ScanMatch)} taken from the index
+
+        Returns:
+            dict: {code: ScanMatch} for the hits whose row still carries the
+            code; the others are removed from the index
+        """
+        from workshop_app.models import Job, Material, Machine
+
+        models = {
+            'job': (Job.objects.only('job_id', 'project_name'), self.add_job, _job_codes, _job_match),
+            'material': (
+                Material.objects.only('material_id', 'name', 'serial_number', 'supplier_sku'),
+                self.add_material, _material_codes, _material_match,
+            ),
+            'machine': (
+                Machine.objects.only('machine_id', 'name', 'serial_number'),
+                self.add_machine, _machine_codes, _machine_match,
+            ),
+        }
+
+        by_type = {}
+        for code, (source, match) in hits.items():
+            by_type.setdefault(match.scan_type, {}).setdefault(match.pk, []).append((source, code))
+
+        verified = {}
+        for scan_type, wanted in by_type.items():
+            queryset, add, codes_of, match_of = models[scan_type]
+            current = queryset.in_bulk(list(wanted))
+            for pk, source_codes in wanted.items():
+                obj = current.get(pk)
+                if obj is None:
+                    # Deleted elsewhere
+                    self.remove(scan_type, pk)
+                    continue
+                # Refresh the entry: the codes or name may have changed elsewhere
+                add(obj)
+                codes = set(codes_of(obj))
+                for source, code in source_codes:
+                    if (source, code) in codes:
+                        verified[code] = match_of(obj)
+        return verified
+
+    def _resolve_many_from_database(self, pending):
+        """Look up unresolved codes with one __in query per code source"""
+        from workshop_app.models import Job, Material, Machine
+
+        wanted = {}
+        for code, sources in pending.items():
+            for source in sources:
+                wanted.setdefault(source, set()).add(code)
+
+        found = {}
+
+        def remember(source, code, match):
+            # Keep the first row per code, like .first() does for single lookups
+            found.setdefault((source, code), match)
+
+        if wanted.get('job_id'):
+            for job in Job.objects.filter(job_id__in=wanted['job_id']).order_by('pk'):
+                self.add_job(job)
+                remember('job_id', job.job_id, _job_match(job))
+
+        material_ids = wanted.get('material_id', set())
+        material_aliases = wanted.get('material_alias', set())
+        if material_ids or material_aliases:
+            materials = Material.objects.filter(
+                Q(material_id__in=material_ids) |
+                Q(serial_number__in=material_aliases) |
+                Q(supplier_sku__in=material_aliases)
+            ).order_by('pk')
+            for material in materials:
+                self.add_material(material)
+                match = _material_match(material)
+                if material.material_id in material_ids:
+                    remember('material_id', material.material_id, match)
+                for alias in (material.serial_number, material.supplier_sku):
+                    if alias in material_aliases:
+                        remember('material_alias', alias, match)
+
+        machine_ids = wanted.get('machine_id', set())
+        machine_aliases = wanted.get('machine_alias', set())
+        if machine_ids or machine_aliases:
+            machines = Machine.objects.filter(
+                Q(machine_id__in=machine_ids) | Q(serial_number__in=machine_aliases)
+            ).order_by('pk')
+            for machine in machines:
+                self.add_machine(machine)
+                match = _machine_match(machine)
+                if machine.machine_id in machine_ids:
+                    remember('machine_id', machine.machine_id, match)
+                if machine.serial_number in machine_aliases:
+                    remember('machine_alias', machine.serial_number, match)
+
+        return found
+
+    def _resolve_from_database(self, code, sources):
+        """Look the code up in the database and remember any match"""
+        from workshop_app.models import Job, Material, Machine
+
+        for source in sources:
+            if source == 'job_id':
+                obj = Job.objects.filter(job_id=code).first()
+                if obj:
+                    self.add_job(obj)
+                    return _job_match(obj)
+            elif source == 'material_id':
+                obj = Material.objects.filter(material_id=code).first()
+                if obj:
+                    self.add_material(obj)
+                    return _material_match(obj)
+            elif source == 'material_alias':
+                obj = Material.objects.filter(Q(serial_number=code) | Q(supplier_sku=code)).first()
+                if obj:
+                    self.add_material(obj)
+                    return _material_match(obj)
+            elif source == 'machine_id':
+                obj = Machine.objects.filter(machine_id=code).first()
+                if obj:
+                    self.add_machine(obj)
+                    return _machine_match(obj)
+            elif source == 'machine_alias':
+                obj = Machine.objects.filter(serial_number=code).first()
+                if obj:
+                    self.add_machine(obj)
+                    return _machine_match(obj)
+        return None
+
+
+# Shared instance used by the scanning views and signal handlers
+scan_index = ScanCodeIndex()
+
+
+def _warm_up_in_background():
+    close_old_connections()
+    try:
+        scan_index.warm_up()
+    finally:
+        close_old_connections()
+
+
+def start_warm_up():
+    """
+    Warm up the shared index in a daemon thread
+
+    Scans made while the thread runs wait for it to finish, like a lazy
+    warm-up on first use would.
+
+    Returns:
+        threading.Thread: The warm-up thread
+    """
+    thread = threading.Thread(target=_warm_up_in_background, name='scan-index-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,164 @@
+# workshop_app/utils/staff_context.py
+
+"""
+Per-request view of the logged-in user's staff settings.
+
+Views used to call StaffSettings.objects.get(user=...) (one query), then
+.active_job and .personal_job (one lazy query each) and
+JobTimeTracking.get_active_entry(user) (one more). The context loads the
+settings, both jobs and the open time entry in a single joined query, at
+most once per request.
+
+StaffContextMiddleware puts the context on request.staff_context; views
+called without the middleware get the same object from
+get_staff_context(request).
+
+Nothing is kept between requests: the active job decides which job stock
+and machine time are charged to, so it is always read from the database.
+"""
+from django.db.models import OuterRef, Subquery
+from django.utils.functional import SimpleLazyObject
+
+from workshop_app.models import StaffSettings
+from workshop_app.models.job_time_tracking import JobTimeTracking
+
+# Fields of the open time entry loaded along with the settings
+ACTIVE_ENTRY_FIELDS = ('id', 'job_id', 'start_time', 'notes', 'created_at')
+
+
+def load_staff_settings(user):
+    """
+    Load a user's settings, jobs and open time entry in one query
+
+    Args:
+        user (User): Authenticated user
+
+    Returns:
+        tuple: (StaffSettings or None, open JobTimeTracking or None)
+    """
+    open_entries = JobTimeTracking.objects.filter(user=OuterRef('user'), end_time__isnull=True).order_by('-start_time')
+    staff_settings = (
+        StaffSettings.objects.filter(user=user)
+        .select_related('active_job__status', 'active_job__client', 'personal_job')
+        .annotate(**{
+            f'active_entry_{field}': Subquery(open_entries.values(field)[:1])
+            for field in ACTIVE_ENTRY_FIELDS
+        })
+        .first()
+    )
+
+    if staff_settings is None:
+        # No settings row yet: only the time entry is left to look up
+        return None, JobTimeTracking.get_active_entry(user)
+
+    entry = None
+    if staff_settings.active_entry_id is not None:
+        entry = JobTimeTracking(
+            user_id=user.pk,
+            end_time=None,
+            **{field: getattr(staff_settings, f'active_entry_{field}') for field in ACTIVE_ENTRY_FIELDS}
+        )
+        entry._state.adding = False
+        entry._state.db = staff_settings._state.db
+        # The open entry is nearly always on one of the loaded jobs
+        for job in (staff_settings.active_job, staff_settings.personal_job):
+            if job is not None and job.pk == entry.job_id:
+                entry.job = job
+                break
+    for field in ACTIVE_ENTRY_FIELDS:
+        delattr(staff_settings, f'active_entry_{field}')
+    return staff_settings, entry
+
+
+class StaffContext:
+    """Staff settings, active and personal job and open time entry of one user"""
+
+    def __init__(self, user):
+        self.user = user
+        self._loaded = False
+        self._settings = None
+        self._active_time_entry = None
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.user.is_authenticated:
+            return
+
+        self._settings, self._active_time_entry = load_staff_settings(self.user)
+        if self._settings is not None:
+            self._settings.user = self.user
+        if self._active_time_entry is not None:
+            self._active_time_entry.user = self.user
+
+    @property
+    def settings(self):
+        """The user's StaffSettings, or None"""
+        self._load()
+        return self._settings
+
+    def require_settings(self):
+        """
+        The user's StaffSettings
+
+        Raises:
+            StaffSettings.DoesNotExist: If the user has no settings yet
+        """
+        if self.settings is None:
+            raise StaffSettings.DoesNotExist('No staff settings for this user')
+        return self.settings
+
+    @property
+    def active_job(self):
+        """The job the user is working on, or None"""
+        return self.settings.active_job if self.settings else None
+
+    @property
+    def personal_job(self):
+        """The user's personal job, or None"""
+        return self.settings.personal_job if self.settings else None
+
+    @property
+    def active_time_entry(self):
+        """The user's open JobTimeTracking entry, or None"""
+        self._load()
+        return self._active_time_entry
+
+    @property
+    def is_tracking_active_job(self):
+        """True if the open time entry is on the active job"""
+        entry = self.active_time_entry
+        return entry is not None and self.active_job is not None and entry.job_id == self.active_job.pk
+
+    def refresh(self):
+        """Forget what was loaded, e.g. after changing the settings in this request"""
+        self._loaded = False
+        self._settings = None
+        self._active_time_entry = None
+
+
+def get_staff_context(request):
+    """
+    Return the StaffContext for a request, creating it on first use
+
+    Args:
+        request (HttpRequest): Current request
+
+    Returns:
+        StaffContext: Context shared by every caller in this request
+    """
+    if not hasattr(request, '_staff_context'):
+        request._staff_context = StaffContext(request.user)
+    return request._staff_context
+
+
+class StaffContextMiddleware:
+    """Expose the user's StaffContext as request.staff_context, loaded on first access"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.staff_context = SimpleLazyObject(lambda: get_staff_context(request))
+        return self.get_response(request)
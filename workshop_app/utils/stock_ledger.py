@@ -0,0 +1,324 @@
+# workshop_app/utils/stock_ledger.py
+
+"""
+Single write path for material stock levels.
+
+Stock is never read into Python, changed and saved back. Withdrawals and
+returns are one UPDATE with an F() expression (withdrawals only succeed
+while enough stock is left), so concurrent requests cannot overwrite each
+other's changes. Each function returns the new stock and copies the
+updated values onto the material instance it was given.
+
+Job usage is recorded with record_job_materials, which writes any number
+of JobMaterial rows in one INSERT.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from workshop_app.models import JobMaterial, Material
+from workshop_app.utils.dashboard_cache import invalidate_low_stock
+from workshop_app.utils.job_costs import add_material_costs
+from workshop_app.utils.price_utils import calculate_weighted_average_price
+
+
+class InsufficientStock(Exception):
+    """Raised when a withdrawal asks for more than is in stock"""
+
+    def __init__(self, material, requested, available):
+        self.material = material
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f'Not enough stock available. Current stock: {available} {material.unit_of_measurement}'
+        )
+
+
+class StockShortfall(Exception):
+    """Raised when some lines of a multi-line withdrawal cannot be filled"""
+
+    def __init__(self, shortfalls):
+        # [{'material_id', 'requested', 'available'}]; available is None for unknown materials
+        self.shortfalls = shortfalls
+        super().__init__(
+            'Not enough stock for: ' + ', '.join(line['material_id'] for line in shortfalls)
+        )
+
+
+class StockContention(Exception):
+    """Raised when concurrent withdrawals kept changing the stock of a multi-line withdrawal"""
+
+    def __init__(self):
+        super().__init__('The stock changed while withdrawing; please try again')
+
+
+# Attempts of withdraw_many before giving up with StockContention
+WITHDRAW_MANY_ATTEMPTS = 3
+
+# One line of material used on (or returned from) a job
+JobMaterialLine = namedtuple('JobMaterialLine', ['job', 'material', 'quantity'])
+
+
+# Materials with a minimum stock level set (0 means "no minimum")
+HAS_MINIMUM_LEVEL = Q(minimum_stock_level__isnull=False) & ~Q(minimum_stock_level=0)
+
+
+class _StockChanged(Exception):
+    """Internal: a conditional multi-row update did not match every row"""
+
+
+def _shortfalls(quantities, stock):
+    """Return the lines of `quantities` that `stock` ({material_id: stock}) cannot fill"""
+    return [
+        {'material_id': material_id, 'requested': quantity, 'available': stock.get(material_id)}
+        for material_id, quantity in quantities.items()
+        if material_id not in stock or stock[material_id] < quantity
+    ]
+
+
+def _refresh_stock(material):
+    """Copy the stored stock fields onto the instance and return the stock"""
+    material.current_stock, material.minimum_stock_alert = (
+        Material.objects.filter(pk=material.pk)
+        .values_list('current_stock', 'minimum_stock_alert')
+        .get()
+    )
+    invalidate_low_stock()
+    return material.current_stock
+
+
+def withdraw_stock(material, quantity):
+    """
+    Take stock out of a material.
+
+    The update only matches while current_stock >= quantity, so stock never
+    goes negative however many withdrawals race for the same material. The
+    low-stock alert is raised in the same statement.
+
+    Args:
+        material (Material): Material to withdraw from
+        quantity (Decimal): Amount to withdraw, greater than zero
+
+    Returns:
+        Decimal: Stock after the withdrawal
+
+    Raises:
+        InsufficientStock: If less than `quantity` is in stock
+    """
+    with transaction.atomic():
+        # minimum_stock_alert is listed first so every backend computes it
+        # from the stock level before this withdrawal
+        updated = Material.objects.filter(pk=material.pk, current_stock__gte=quantity).update(
+            minimum_stock_alert=Case(
+                When(
+                    HAS_MINIMUM_LEVEL & Q(minimum_stock_level__gte=F('current_stock') - quantity),
+                    then=Value(True),
+                ),
+                default=F('minimum_stock_alert'),
+            ),
+            current_stock=F('current_stock') - quantity,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            available = Material.objects.filter(pk=material.pk).values_list('current_stock', flat=True).first()
+            raise InsufficientStock(material, quantity, available if available is not None else Decimal('0'))
+        return _refresh_stock(material)
+
+
+def withdraw_many(quantities):
+    """
+    Take stock out of several materials at once, all or nothing.
+
+    The materials are fetched and locked (select_for_update) in one query
+    and checked against the requested quantities. All decrements are then
+    applied in a single UPDATE. That UPDATE repeats the stock condition, so
+    a withdrawal that commits between the check and the update cannot make
+    stock go negative; the whole withdrawal is then retried, at most
+    WITHDRAW_MANY_ATTEMPTS times.
+
+    Args:
+        quantities (dict): {material_id code: Decimal quantity}, quantities > 0
+
+    Returns:
+        dict: {material_id code: Material} with current_stock updated
+
+    Raises:
+        StockShortfall: If any material is unknown or short; nothing is changed
+        StockContention: If other withdrawals changed the stock on every attempt
+    """
+    for attempt in range(WITHDRAW_MANY_ATTEMPTS):
+        try:
+            return _withdraw_many_once(quantities)
+        except _StockChanged:
+            stock = dict(
+                Material.objects.filter(material_id__in=quantities).values_list('material_id', 'current_stock')
+            )
+            shortfalls = _shortfalls(quantities, stock)
+            if shortfalls:
+                raise StockShortfall(shortfalls)
+            # The stock was put back in the meantime; try again
+    raise StockContention()
+
+
+def _withdraw_many_once(quantities):
+    """One attempt of withdraw_many; raises _StockChanged if it lost a race"""
+    with transaction.atomic():
+        materials = {
+            material.material_id: material
+            for material in Material.objects.select_for_update().filter(
+                material_id__in=quantities
+            ).order_by('pk')
+        }
+
+        shortfalls = _shortfalls(quantities, {
+            material_id: material.current_stock for material_id, material in materials.items()
+        })
+        if shortfalls:
+            raise StockShortfall(shortfalls)
+
+        quantity = Case(
+            *[
+                When(pk=materials[material_id].pk, then=Value(quantity))
+                for material_id, quantity in quantities.items()
+            ],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        updated = Material.objects.filter(
+            pk__in=[material.pk for material in materials.values()],
+            current_stock__gte=quantity,
+        ).update(
+            minimum_stock_alert=Case(
+                When(
+                    HAS_MINIMUM_LEVEL & Q(minimum_stock_level__gte=F('current_stock') - quantity),
+                    then=Value(True),
+                ),
+                default=F('minimum_stock_alert'),
+            ),
+            current_stock=F('current_stock') - quantity,
+            updated_at=timezone.now(),
+        )
+        if updated != len(materials):
+            # Another withdrawal committed after the check; undo this one
+            raise _StockChanged()
+
+        stock = dict(
+            Material.objects.filter(pk__in=[material.pk for material in materials.values()])
+            .values_list('material_id', 'current_stock')
+        )
+        for material_id, material in materials.items():
+            material.current_stock = stock[material_id]
+        invalidate_low_stock()
+        return materials
+
+
+def return_stock(material, quantity):
+    """
+    Put stock back into a material.
+
+    Clears the low-stock alert once the stock rises above the minimum level.
+
+    Args:
+        material (Material): Material being returned
+        quantity (Decimal): Amount returned, greater than zero
+
+    Returns:
+        Decimal: Stock after the return
+    """
+    with transaction.atomic():
+        Material.objects.filter(pk=material.pk).update(
+            minimum_stock_alert=Case(
+                When(
+                    HAS_MINIMUM_LEVEL & Q(minimum_stock_level__lt=F('current_stock') + quantity),
+                    then=Value(False),
+                ),
+                default=F('minimum_stock_alert'),
+            ),
+            current_stock=F('current_stock') + quantity,
+            updated_at=timezone.now(),
+        )
+        return _refresh_stock(material)
+
+
+def restock(material, quantity, purchase_price, location=None, minimum_stock_level=None):
+    """
+    Add purchased stock and update the weighted average price.
+
+    The stock is incremented first, which locks the row until the
+    transaction ends; the average price is then computed from the locked
+    values and written with save(update_fields=...), so only the changed
+    columns are sent and the model signals still fire.
+
+    Args:
+        material (Material): Material being restocked
+        quantity (Decimal): Amount purchased, greater than zero
+        purchase_price (Decimal): Price per unit paid for this purchase
+        location (str): New location in the workshop, if it changed
+        minimum_stock_level (Decimal): New minimum stock level, if it changed
+
+    Returns:
+        Decimal: Stock after the restock
+    """
+    with transaction.atomic():
+        Material.objects.filter(pk=material.pk).update(current_stock=F('current_stock') + quantity)
+        material.refresh_from_db(fields=['current_stock', 'price_per_unit', 'minimum_stock_level', 'minimum_stock_alert'])
+
+        update_fields = ['price_per_unit', 'minimum_stock_alert', 'updated_at']
+        material.price_per_unit = calculate_weighted_average_price(
+            material.current_stock - quantity,
+            material.price_per_unit or Decimal('0.00'),
+            quantity,
+            purchase_price
+        )
+
+        if location:
+            material.location_in_workshop = location
+            update_fields.append('location_in_workshop')
+
+        # 0 is a valid level ("no minimum"), so test for None rather than truthiness
+        if minimum_stock_level is not None:
+            material.minimum_stock_level = minimum_stock_level
+            update_fields.append('minimum_stock_level')
+            material.minimum_stock_alert = material.current_stock <= minimum_stock_level
+        elif material.minimum_stock_level is not None and material.current_stock > material.minimum_stock_level:
+            material.minimum_stock_alert = False
+
+        material.save(update_fields=update_fields)
+        return material.current_stock
+
+
+def record_job_materials(lines, added_by, result='active', notes=''):
+    """
+    Record material usage against jobs.
+
+    All lines are written with one bulk INSERT using database-allocated
+    ids, and their cost is added to each job's material_cost. Call it inside the transaction that records the matching
+    MaterialTransaction rows so both commit together.
+
+    Args:
+        lines (list): JobMaterialLine (job, material, quantity) tuples;
+            use a negative quantity for returns
+        added_by (str): Name of the person recording the usage
+        result (str): JobMaterial result, e.g. 'active' or 'returned'
+        notes (str): Notes stored on every row
+
+    Returns:
+        list: The created JobMaterial objects
+    """
+    job_materials = JobMaterial.objects.bulk_create([
+        JobMaterial(
+            job=line.job,
+            material=line.material,
+            quantity=line.quantity,
+            unit_price=line.material.price_per_unit,
+            added_by=added_by,
+            result=result,
+            usage_status=result,
+            notes=notes,
+        )
+        for line in lines
+    ])
+    add_material_costs(job_materials)
+    return job_materials
@@ -0,0 +1,235 @@
+# workshop_app/utils/timesheets.py
+
+"""
+Timesheet rollups of JobTimeTracking.
+
+duration and elapsed_time are Python properties, so totalling hours per
+user, job and day used to mean loading every time entry. Instead, each
+entry is added to TimesheetDay rows (one per user, job and local day)
+once, when it closes. Entries that cross midnight are split between the
+days they overlap.
+
+A timesheet over a date range reads those rows with one indexed query and
+adds the few entries that are still open (at most one per user), split up
+to the current time. Rows are never recomputed on read;
+`manage.py rebuild_timesheets` recomputes them from the time entry table
+after imports or edits in the admin.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from workshop_app.models.job_time_tracking import JobTimeTracking, TimesheetDay
+from workshop_app.utils.machine_utilization import day_floor, next_day
+
+# Rows per INSERT when rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+
+def day_segments(start, end):
+    """
+    Split [start, end) at local midnights
+
+    Args:
+        start (datetime): Start of the time span
+        end (datetime): End of the time span
+
+    Returns:
+        list: (date, seconds) for each local day the span overlaps
+    """
+    segments = []
+    day_start = day_floor(start)
+    while day_start < end:
+        day_end = next_day(day_start)
+        seconds = (min(end, day_end) - max(start, day_start)).total_seconds()
+        segments.append((timezone.localdate(day_start), seconds))
+        day_start = day_end
+    return segments
+
+
+def _day_totals(entries, now=None):
+    """
+    Sum entries by (user, job, day)
+
+    Closed entries end at end_time; open entries are only included when
+    `now` is given and end at that time. Each day of an entry is rounded to
+    whole seconds on its own, so rollups built entry by entry and a rebuild
+    add up the same numbers.
+    """
+    totals = defaultdict(lambda: {'seconds': 0, 'entry_count': 0})
+    for entry in entries:
+        end = entry.end_time or now
+        if end is None or end <= entry.start_time:
+            continue
+        for index, (day, seconds) in enumerate(day_segments(entry.start_time, end)):
+            bucket = totals[(entry.user_id, entry.job_id, day)]
+            bucket['seconds'] += round(seconds)
+            if index == 0:
+                bucket['entry_count'] += 1
+    return totals
+
+
+def record_time_entries(entries):
+    """
+    Add closed time entries to the timesheet rollups
+
+    Missing rows are inserted in one statement, then each row is
+    incremented with an F() update, so entries closing at the same time
+    cannot lose each other's seconds.
+
+    Args:
+        entries (list): JobTimeTracking objects with end_time set
+    """
+    totals = _day_totals(entry for entry in entries if entry.end_time is not None)
+    if not totals:
+        return
+
+    with transaction.atomic():
+        TimesheetDay.objects.bulk_create(
+            [TimesheetDay(user_id=user_pk, job_id=job_pk, day=day) for user_pk, job_pk, day in totals],
+            ignore_conflicts=True,
+        )
+        for (user_pk, job_pk, day), values in totals.items():
+            TimesheetDay.objects.filter(user_id=user_pk, job_id=job_pk, day=day).update(
+                seconds=F('seconds') + values['seconds'],
+                entry_count=F('entry_count') + values['entry_count'],
+            )
+
+
+def record_time_entry(time_entry):
+    """Add one closed time entry to the timesheet rollups"""
+    record_time_entries([time_entry])
+
+
+def rebuild_timesheets():
+    """
+    Recompute every timesheet row from the time entry table
+
+    Returns:
+        int: Number of time entries rolled up
+    """
+    entries = JobTimeTracking.objects.filter(end_time__gt=F('start_time')).only(
+        'user_id', 'job_id', 'start_time', 'end_time'
+    ).order_by()
+    count = entries.count()
+    totals = _day_totals(entries.iterator())
+
+    with transaction.atomic():
+        TimesheetDay.objects.all().delete()
+        TimesheetDay.objects.bulk_create(
+            [
+                TimesheetDay(
+                    user_id=user_pk,
+                    job_id=job_pk,
+                    day=day,
+                    seconds=values['seconds'],
+                    entry_count=values['entry_count'],
+                )
+                for (user_pk, job_pk, day), values in totals.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return count
+
+
+def _full_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def timesheet(start_date, end_date, user=None, now=None):
+    """
+    Time worked per user, job and day over an inclusive date range
+
+    Args:
+        start_date (date): First day
+        end_date (date): Last day
+        user (User): Only this user's time (default: everyone)
+        now (datetime): End time used for open entries (default: timezone.now())
+
+    Returns:
+        list: Dicts with user_id, username, full_name, job_id, project_name,
+        day, seconds, hours and entry_count, ordered by user, day and job
+    """
+    now = now or timezone.now()
+    range_start = timezone.make_aware(datetime.combine(start_date, time.min))
+    range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+    closed = TimesheetDay.objects.filter(day__gte=start_date, day__lte=end_date)
+    running = JobTimeTracking.objects.filter(end_time__isnull=True, start_time__lt=min(range_end, now))
+    if user is not None:
+        closed = closed.filter(user=user)
+        running = running.filter(user=user)
+
+    rows = {}
+    for row in closed.values(
+        'user_id', 'user__username', 'user__first_name', 'user__last_name',
+        'job_id', 'job__job_id', 'job__project_name', 'day', 'seconds', 'entry_count',
+    ):
+        rows[(row['user_id'], row['job_id'], row['day'])] = {
+            'user_id': row['user_id'],
+            'username': row['user__username'],
+            'full_name': _full_name(row['user__first_name'], row['user__last_name'], row['user__username']),
+            'job_id': row['job__job_id'],
+            'project_name': row['job__project_name'],
+            'day': row['day'],
+            'seconds': row['seconds'],
+            'entry_count': row['entry_count'],
+        }
+
+    # Open entries are not rolled up yet: count them up to now
+    running = list(running.select_related('user', 'job'))
+    entries = {(entry.user_id, entry.job_id): entry for entry in running}
+    for (user_pk, job_pk, day), values in _day_totals(running, now).items():
+        if not start_date <= day <= end_date:
+            continue
+        entry = entries[(user_pk, job_pk)]
+        row = rows.setdefault((user_pk, job_pk, day), {
+            'user_id': user_pk,
+            'username': entry.user.username,
+            'full_name': _full_name(entry.user.first_name, entry.user.last_name, entry.user.username),
+            'job_id': entry.job.job_id,
+            'project_name': entry.job.project_name,
+            'day': day,
+            'seconds': 0,
+            'entry_count': 0,
+        })
+        row['seconds'] += values['seconds']
+        row['entry_count'] += values['entry_count']
+
+    result = sorted(rows.values(), key=lambda row: (row['username'], row['day'], row['job_id']))
+    for row in result:
+        row['hours'] = round(row['seconds'] / 3600, 2)
+    return result
+
+
+def timesheet_totals(rows):
+    """
+    Total hours of timesheet rows per user and per job
+
+    Args:
+        rows (list): Output of timesheet()
+
+    Returns:
+        dict: 'hours', plus 'users' and 'jobs' lists of {name, hours},
+        most hours first
+    """
+    users = defaultdict(int)
+    jobs = defaultdict(int)
+    for row in rows:
+        users[row['username']] += row['seconds']
+        jobs[row['job_id']] += row['seconds']
+
+    def ranked(seconds_by_key, key_name):
+        return [
+            {key_name: key, 'hours': round(seconds / 3600, 2)}
+            for key, seconds in sorted(seconds_by_key.items(), key=lambda item: -item[1])
+        ]
+
+    return {
+        'hours': round(sum(row['seconds'] for row in rows) / 3600, 2),
+        'users': ranked(users, 'username'),
+        'jobs': ranked(jobs, 'job_id'),
+    }
@@ -2,91 +2,29 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_POST
-from django.utils import timezone
-from django.db.models import Q
 
-from workshop_app.models import Job, Machine, Material, StaffSettings, JobStatus
-from workshop_app.models.job_time_tracking import JobTimeTracking
+from workshop_app.models import Job, StaffSettings
+from workshop_app.utils.dashboard_cache import dashboard_panels
+from workshop_app.utils.staff_context import get_staff_context
 
 @login_required
 def dashboard(request):
     """Display the main dashboard"""
     
-    # Get the active job for the current user
-    try:
-        staff_settings = StaffSettings.objects.get(user=request.user)
-        active_job = staff_settings.active_job
-        personal_job = staff_settings.personal_job
-        
-        # Get active time tracking if any
-        active_time_tracking = None
-        if active_job:
-            active_time_tracking = JobTimeTracking.get_active_entry(request.user)
-        
-        # If no personal job exists, create one now
-        if not personal_job:
-            # Get a default status
-            status = JobStatus.objects.filter(name='Personal').first()
-            if not status:
-                status = JobStatus.objects.first()
-                
-            # Create a System Personal Account
-            personal_job = Job.objects.create(
-                job_id=f"PER-{request.user.username.upper()}",
-                project_name=f"Personal Account - {request.user.get_full_name() or request.user.username}",
-                project_type='PER',  # Use personal type
-                description="System account for unassigned work and materials",
-                priority='low',
-                status=status,
-                status_text=status.name if status else "New",
-                created_by=request.user,
-                owner=request.user,
-                created_date=timezone.now(),
-                percent_complete=0
-            )
-            
-            # Update staff settings
-            staff_settings.personal_job = personal_job
-            staff_settings.save()
-            
-    except StaffSettings.DoesNotExist:
-        active_job = None
-        personal_job = None
-        active_time_tracking = None
-        
-        # Create staff settings
-        StaffSettings.objects.create(user=request.user)
-        # Reload the page to get the new settings with personal job
-        return redirect('dashboard')
-        
-    # Get recent jobs for the user - exclude jobs with empty job_id
-    recent_jobs = Job.objects.filter(
-        Q(created_by=request.user) | Q(owner=request.user)
-    ).exclude(job_id='').order_by('-created_date')[:5]
-    
-    # Get available machines the user is certified for
-    available_machines = []
-    try:
-        # If user has an operator profile, show machines they're certified for
-        operator = request.user.operator
-        available_machines = Machine.objects.filter(
-            status='available',
-            certified_operators=operator
-        )[:5]
-    except:
-        # If no operator profile, just show available machines
-        available_machines = Machine.objects.filter(status='available')[:5]
+    # Settings and personal job are provisioned when the user is created
+    staff = get_staff_context(request)
+    active_job = staff.active_job
+    personal_job = staff.personal_job
     
-    # Get low stock materials
-    low_stock_materials = Material.objects.filter(minimum_stock_alert=True)[:5]
+    # Get active time tracking if any
+    active_time_tracking = staff.active_time_entry if active_job else None
     
+    # Recent jobs, available machines and low stock panels are cached fragments
     context = {
         'active_job': active_job,
         'personal_job': personal_job,
-        'recent_jobs': recent_jobs,
-        'available_machines': available_machines,
-        'low_stock_materials': low_stock_materials,
         'active_time_tracking': active_time_tracking,
+        **dashboard_panels(request.user),
     }
     
     return render(request, 'dashboard/index.html', context)
@@ -122,7 +60,7 @@ def activate_job_by_id(request):
 def activate_personal_job(request):
     """Handle activation of the user's personal job"""
     try:
-        staff_settings = StaffSettings.objects.get(user=request.user)
+        staff_settings = get_staff_context(request).require_settings()
         personal_job = staff_settings.personal_job
         
         if personal_job:
@@ -5,11 +5,11 @@ import re
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from workshop_app.models import Job, JobStatus, Client, ContactPerson, StaffSettings
 from workshop_app.forms import JobForm
+from workshop_app.utils.id_allocator import next_job_id
 
 @login_required
 def add_job(request):
@@ -34,38 +34,9 @@ def add_job(request):
             # Get the project type from the form
             project_type = request.POST.get('project_type', 'JOB')
             
-            # Get the current year's last two digits
-            current_year = timezone.now().year % 100
-            
-            # Find the highest job number for this project type and year
+            # Allocate the next job ID for this project type and year
             # Format: J-XXX-YYYYRR where XXX is the project type, YYYY is a sequence number, and RR is the year
-            # We need to find the max YYYY for the current type and year
-            prefix = f"J-{project_type}-"
-            suffix = f"{current_year}"
-            
-            # Find the highest job ID matching our pattern
-            last_job_id = Job.objects.filter(
-                job_id__startswith=prefix,
-                job_id__endswith=suffix
-            ).order_by('-job_id').first()
-            
-            if last_job_id:
-                # Extract the sequence number from the last job ID
-                try:
-                    # Format: J-XXX-YYYYRR, we want to extract YYYY
-                    sequence_str = last_job_id.job_id.split('-')[2][:-2]
-                    sequence_num = int(sequence_str)
-                    new_sequence = sequence_num + 1
-                except (IndexError, ValueError):
-                    # If parsing fails, start from 1
-                    new_sequence = 1
-            else:
-                # No existing jobs of this type, start from 1
-                new_sequence = 1
-            
-            # Format the new job ID
-            # Sequence number padded to 4 digits
-            job.job_id = f"{prefix}{new_sequence:04d}{suffix}"
+            job.job_id = next_job_id(project_type)
             
             # Set creator to current user
             job.created_by = request.user
@@ -94,7 +65,7 @@ def add_job(request):
             if job.project_type == 'PER':
                 staff_settings, created = StaffSettings.objects.get_or_create(user=request.user)
                 staff_settings.personal_job = job
-                staff_settings.save()
+                staff_settings.save(update_fields=['personal_job'])
             
             messages.success(request, f'Job "{job.project_name}" has been added successfully')
             return redirect('job_detail', job_id=job.job_id)
@@ -155,13 +126,13 @@ def edit_job(request, job_id):
             if job.project_type == 'PER' and old_project_type != 'PER':
                 staff_settings, created = StaffSettings.objects.get_or_create(user=request.user)
                 staff_settings.personal_job = job
-                staff_settings.save()
+                staff_settings.save(update_fields=['personal_job'])
             elif job.project_type != 'PER' and old_project_type == 'PER':
                 # If it's no longer a personal job, remove it as the user's personal job
                 staff_settings = StaffSettings.objects.filter(user=request.user, personal_job=job).first()
                 if staff_settings:
                     staff_settings.personal_job = None
-                    staff_settings.save()
+                    staff_settings.save(update_fields=['personal_job'])
             
             messages.success(request, f'Job "{job.project_name}" has been updated')
             return redirect('job_detail', job_id=job.job_id)
@@ -224,13 +195,13 @@ def edit_job_by_pk(request, pk):
             if job.project_type == 'PER' and old_project_type != 'PER':
                 staff_settings, created = StaffSettings.objects.get_or_create(user=request.user)
                 staff_settings.personal_job = job
-                staff_settings.save()
+                staff_settings.save(update_fields=['personal_job'])
             elif job.project_type != 'PER' and old_project_type == 'PER':
                 # If it's no longer a personal job, remove it as the user's personal job
                 staff_settings = StaffSettings.objects.filter(user=request.user, personal_job=job).first()
                 if staff_settings:
                     staff_settings.personal_job = None
-                    staff_settings.save()
+                    staff_settings.save(update_fields=['personal_job'])
             
             messages.success(request, f'Job "{job.project_name}" has been updated')
             
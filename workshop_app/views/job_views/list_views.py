@@ -5,7 +5,8 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 
-from workshop_app.models import Job, JobStatus, StaffSettings
+from workshop_app.models import Job, JobStatus
+from workshop_app.utils.staff_context import get_staff_context
 
 @login_required
 def job_list(request):
@@ -38,11 +39,8 @@ def job_list(request):
     job_statuses = JobStatus.objects.all().order_by('order')
     
     # Check if user has active job
-    try:
-        staff_settings = StaffSettings.objects.get(user=request.user)
-        active_job_id = staff_settings.active_job.id if staff_settings.active_job else None
-    except StaffSettings.DoesNotExist:
-        active_job_id = None
+    active_job = get_staff_context(request).active_job
+    active_job_id = active_job.id if active_job else None
     
     context = {
         'jobs': jobs,
@@ -0,0 +1,60 @@
+"""
+Views for printing QR label sheets
+"""
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from workshop_app.utils.label_utils import (
+    LABEL_SHEET_FORMATS, LABEL_SOURCES, get_labels, iter_label_sheet
+)
+
+# Labels one sheet request may render when settings.MAX_LABELS is not set
+DEFAULT_MAX_LABELS = 2000
+
+# Query parameters accepted as filters for each label kind
+LABEL_FILTER_PARAMS = {
+    'material': {'category': 'category', 'type': 'material_type', 'location': 'location'},
+    'machine': {'machine_type': 'machine_type', 'location': 'location'},
+    'job': {'status': 'status'},
+}
+
+
+@login_required
+@require_GET
+def label_sheet(request, kind):
+    """Stream a printable sheet of QR labels for all matching objects"""
+    if kind not in LABEL_SOURCES:
+        return HttpResponseBadRequest(f'Unknown label kind: {kind}')
+    
+    sheet_format = request.GET.get('format', 'pdf')
+    if sheet_format not in LABEL_SHEET_FORMATS:
+        return HttpResponseBadRequest(f'Unsupported format: {sheet_format}')
+    
+    filters = {
+        argument: request.GET[param]
+        for param, argument in LABEL_FILTER_PARAMS[kind].items()
+        if request.GET.get(param)
+    }
+    
+    label_count, labels = get_labels(kind, **filters)
+    
+    # Every label is rendered by this worker; larger runs belong to `manage.py print_labels`
+    max_labels = getattr(settings, 'MAX_LABELS', DEFAULT_MAX_LABELS)
+    if label_count > max_labels:
+        return HttpResponseBadRequest(
+            f'{label_count} labels match; narrow the filters to at most {max_labels} '
+            f'or use `manage.py print_labels`'
+        )
+    
+    # Rendered in this process: a pool per request would fork the server
+    response = StreamingHttpResponse(
+        iter_label_sheet(labels, label_count, sheet_format),
+        content_type=LABEL_SHEET_FORMATS[sheet_format]
+    )
+    filename = f"{kind}-labels-{timezone.now():%Y%m%d-%H%M}.{sheet_format}"
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['X-Label-Count'] = str(label_count)
+    return response
@@ -7,6 +7,9 @@ from workshop_app.views.machine_views.list_views import machine_list
 from workshop_app.views.machine_views.detail_views import machine_detail, machine_usage_history, get_machine_qr_code
 from workshop_app.views.machine_views.edit_views import add_machine, edit_machine
 from workshop_app.views.machine_views.usage_views import start_machine_usage, stop_machine_usage
+from workshop_app.views.machine_views.board_views import machine_board, machine_board_events
+from workshop_app.views.machine_views.reservation_views import machine_reservations, cancel_reservation, machine_type_next_free_slot
+from workshop_app.views.machine_views.report_views import machine_utilization
 
 # Re-export all views
 __all__ = [
@@ -18,4 +21,10 @@ __all__ = [
     'edit_machine',
     'start_machine_usage',
     'stop_machine_usage',
+    'machine_board',
+    'machine_board_events',
+    'machine_reservations',
+    'cancel_reservation',
+    'machine_type_next_free_slot',
+    'machine_utilization',
 ]
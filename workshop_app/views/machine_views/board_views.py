@@ -0,0 +1,114 @@
+"""
+Views for the live machine status board.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, StreamingHttpResponse
+
+from workshop_app.models import Machine
+from workshop_app.utils.machine_events import machine_events, machine_status_event
+
+# Seconds between keep-alive comments on an idle stream, so proxies and
+# browsers don't time the connection out
+BOARD_HEARTBEAT_SECONDS = 15
+
+# Milliseconds the browser waits before reconnecting a dropped stream
+BOARD_RETRY_MS = 3000
+
+# Milliseconds between snapshot requests when the board polls
+DEFAULT_POLL_MS = 5000
+
+
+def board_machines():
+    """Machines shown on the board, in display order"""
+    return Machine.objects.select_related('current_job', 'machine_type').order_by('location_in_workshop', 'name')
+
+
+def board_snapshot():
+    """Current state of every machine on the board"""
+    return [machine_status_event(machine) for machine in board_machines()]
+
+
+def board_poll_ms():
+    return getattr(settings, 'MACHINE_BOARD_POLL_MS', DEFAULT_POLL_MS)
+
+
+def board_streams(request):
+    """
+    True if a request can be kept open as a live stream
+
+    Streaming needs an ASGI server, and the event broker only reaches
+    streams in the process that changed the machine, so it is opt-in
+    through MACHINE_BOARD_STREAM for single-process ASGI deployments.
+    """
+    return getattr(settings, 'MACHINE_BOARD_STREAM', False) and isinstance(request, ASGIRequest)
+
+
+def sse_message(event_type, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+@login_required
+def machine_board(request):
+    """Display the live machine status board"""
+    context = {
+        'machines': board_machines(),
+    }
+    return render(request, 'machines/board.html', context)
+
+
+@login_required
+async def machine_board_events(request):
+    """
+    Stream machine status changes as Server-Sent Events
+
+    Sends a full snapshot first (also after every reconnect), then one
+    'status' event per machine state change. Where the board cannot stream
+    (WSGI, several processes) the response is just the snapshot and an
+    'end' event; the retry line makes EventSource poll again after
+    MACHINE_BOARD_POLL_MS.
+    """
+    if not board_streams(request):
+        snapshot = await sync_to_async(board_snapshot)()
+        response = HttpResponse(
+            f'retry: {board_poll_ms()}\n\n'
+            + sse_message('snapshot', snapshot)
+            + sse_message('end', {'retry_ms': board_poll_ms()}),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    async def stream():
+        # Subscribe before taking the snapshot so no change falls in between
+        queue = machine_events.subscribe()
+        try:
+            yield f'retry: {BOARD_RETRY_MS}\n\n'
+            snapshot = await sync_to_async(board_snapshot)()
+            yield sse_message('snapshot', snapshot)
+            while True:
+                try:
+                    event_id, event = await asyncio.wait_for(queue.get(), BOARD_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield sse_message('status', event, event_id)
+        finally:
+            machine_events.unsubscribe(queue)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -5,8 +5,10 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 
-from workshop_app.models import Machine, MachineUsage, StaffSettings
-from workshop_app.utils.barcode_utils import generate_qr_code
+from workshop_app.models import Machine, MachineUsage
+from workshop_app.utils.operator_context import get_operator_context
+from workshop_app.utils.staff_context import get_staff_context
+from workshop_app.views.qr_views import qr_code_image_url
 
 @login_required
 def machine_detail(request, machine_id):
@@ -16,22 +18,13 @@ def machine_detail(request, machine_id):
     # Get recent usage history
     usage_history = MachineUsage.objects.filter(
         machine=machine
-    ).order_by('-start_time')[:10]
+    ).select_related('job').order_by('-start_time')[:10]
     
     # Check if user is certified for this machine
-    is_certified = False
-    try:
-        operator = request.user.operator
-        is_certified = operator.is_certified_for(machine)
-    except:
-        pass
+    is_certified = get_operator_context(request).is_certified_for(machine)
     
     # Get active job for association
-    try:
-        settings = StaffSettings.objects.get(user=request.user)
-        active_job = settings.active_job
-    except StaffSettings.DoesNotExist:
-        active_job = None
+    active_job = get_staff_context(request).active_job
     
     context = {
         'machine': machine,
@@ -50,7 +43,7 @@ def machine_usage_history(request, machine_id):
     # Get all usage for this machine
     usage_history = MachineUsage.objects.filter(
         machine=machine
-    ).order_by('-start_time')
+    ).select_related('job').order_by('-start_time')
     
     context = {
         'machine': machine,
@@ -64,11 +57,12 @@ def get_machine_qr_code(request, machine_id):
     """Generate and return QR code for a machine"""
     machine = get_object_or_404(Machine, machine_id=machine_id)
     
-    # Generate QR code
-    qr_code_url = generate_qr_code(machine.machine_id)
+    # Point to the cached QR image instead of inlining it
+    qr_code_url = qr_code_image_url(machine.machine_id)
     
     return JsonResponse({
         'success': True,
         'machine_name': machine.name,
-        'qr_code_url': qr_code_url
+        'qr_code_url': qr_code_url,
+        'qr_code_svg_url': qr_code_image_url(machine.machine_id, 'svg')
     })
@@ -10,6 +10,7 @@ from django.utils import timezone
 from workshop_app.models import Machine, MachineType
 from workshop_app.forms import MachineForm
 from workshop_app.utils.barcode_utils import generate_qr_code
+from workshop_app.utils.id_allocator import next_machine_id
 
 @login_required
 def add_machine(request):
@@ -24,17 +25,8 @@ def add_machine(request):
             # Save but don't commit to set additional fields
             machine = form.save(commit=False)
             
-            # Generate a unique machine ID
-            machine_type = machine.machine_type
-            type_code = machine_type.code
-            
-            # Count existing machines of this type + 1
-            count = Machine.objects.filter(
-                machine_type__code=type_code
-            ).count() + 1
-            
-            # Generate ID as MC-TYPE-XXXXX
-            machine.machine_id = f"MC-{type_code}-{count:05d}"
+            # Generate a unique machine ID as MC-TYPE-XXXXX
+            machine.machine_id = next_machine_id(machine.machine_type)
             
             # Generate QR code
             machine.qr_code = generate_qr_code(machine.machine_id)
@@ -7,6 +7,7 @@ from django.db.models import Q
 
 from workshop_app.models import Machine, MachineType
 from workshop_app.forms import MachineFilterForm
+from workshop_app.utils.operator_context import get_operator_context
 
 @login_required
 def machine_list(request):
@@ -18,8 +19,8 @@ def machine_list(request):
     operator_filter = request.GET.get('operator', '') 
     sort_param = request.GET.get('sort', 'name')
     
-    # Start with all machines
-    machines = Machine.objects.all()
+    # Start with all machines; every row shows its type
+    machines = Machine.objects.select_related('machine_type')
     
     # Apply search filter
     if search_query:
@@ -40,13 +41,10 @@ def machine_list(request):
         machines = machines.filter(status=status_filter)
     
     # Apply operator filter - only show machines the operator is certified for
-    if operator_filter and request.user.is_authenticated:
-        try:
-            operator = request.user.operator
-            machines = machines.filter(certified_operators=operator)
-        except:
-            # If user doesn't have an operator profile, ignore this filter
-            pass
+    # (ignored if the user doesn't have an operator profile)
+    operator_context = get_operator_context(request)
+    if operator_filter and operator_context.has_operator:
+        machines = machines.filter(certified_operators=operator_context.operator)
     
     # Apply sorting
     if sort_param == 'name':
@@ -66,17 +64,10 @@ def machine_list(request):
     # Initialize filter form
     filter_form = MachineFilterForm(request.GET)
     
-    # Check if user is certified for each machine
-    certification_status = {}
-    if request.user.is_authenticated:
-        try:
-            operator = request.user.operator
-            for machine in machines:
-                certification_status[machine.id] = operator.is_certified_for(machine)
-        except:
-            # If user doesn't have an operator profile, all machines are uncertified
-            for machine in machines:
-                certification_status[machine.id] = False
+    # Check if user is certified for each machine (one query for all of them)
+    certification_status = {
+        machine.id: operator_context.is_certified_for(machine) for machine in machines
+    }
     
     context = {
         'machines': machines,
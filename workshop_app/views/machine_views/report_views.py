@@ -0,0 +1,51 @@
+"""
+Views for machine utilization reporting.
+"""
+from datetime import datetime, time, timedelta
+
+from django.http import HttpResponseBadRequest
+from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from workshop_app.models import MachineType
+from workshop_app.utils.machine_utilization import utilization_report
+
+# Days covered by the report when no range is given
+DEFAULT_REPORT_DAYS = 7
+
+
+@login_required
+def machine_utilization(request):
+    """Report utilization, run hours, setup share and cost per machine and type"""
+    today = timezone.localdate()
+    try:
+        # parse_date returns None for malformed input but raises ValueError
+        # for well-formed impossible dates such as 2026-02-30
+        end_date = parse_date(request.GET.get('end', '')) or today
+        start_date = parse_date(request.GET.get('start', '')) or end_date - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    except ValueError as e:
+        return HttpResponseBadRequest(f'Invalid date: {e}', content_type='text/plain')
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    
+    machine_types = MachineType.objects.order_by('name')
+    type_id = request.GET.get('type', '')
+    machine_type = machine_types.filter(pk=type_id).first() if type_id.isdigit() else None
+    
+    # Both dates are inclusive
+    report = utilization_report(
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+        machine_type=machine_type,
+    )
+    
+    context = {
+        'report': report,
+        'start_date': start_date,
+        'end_date': end_date,
+        'machine_types': machine_types,
+        'selected_type': machine_type,
+    }
+    return render(request, 'machines/utilization.html', context)
@@ -0,0 +1,160 @@
+"""
+API endpoints for machine reservations.
+"""
+from datetime import timedelta
+
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from workshop_app.models import Job, Machine, MachineReservation, MachineType
+from workshop_app.utils.machine_scheduler import ReservationConflict, book_reservation, next_free_slot
+from workshop_app.utils.operator_context import get_operator_context
+
+# Longest slot that can be requested, in minutes
+MAX_RESERVATION_MINUTES = 7 * 24 * 60
+
+
+def parse_request_datetime(value):
+    """Parse an ISO 8601 datetime from a request; naive values use the current time zone"""
+    parsed = parse_datetime(value or '')
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_duration_minutes(value):
+    """Parse a duration in minutes, or return None if invalid"""
+    try:
+        minutes = int(value)
+    except (TypeError, ValueError):
+        return None
+    if minutes <= 0 or minutes > MAX_RESERVATION_MINUTES:
+        return None
+    return minutes
+
+
+def reservation_data(reservation):
+    """JSON representation of a reservation"""
+    return {
+        'id': reservation.id,
+        'machine_id': reservation.machine.machine_id,
+        'job_id': reservation.job.job_id if reservation.job else None,
+        'reserved_by': reservation.reserved_by.get_full_name() or reservation.reserved_by.username,
+        'start_time': reservation.start_time.isoformat(),
+        'end_time': reservation.end_time.isoformat(),
+        'notes': reservation.notes,
+    }
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def machine_reservations(request, machine_id):
+    """API endpoint to list upcoming reservations of a machine (GET) or book a slot (POST)"""
+    machine = get_object_or_404(Machine, machine_id=machine_id)
+    
+    if request.method == 'GET':
+        reservations = MachineReservation.objects.filter(
+            machine=machine, end_time__gt=timezone.now()
+        ).select_related('machine', 'job', 'reserved_by').order_by('start_time')
+        return JsonResponse({
+            'success': True,
+            'reservations': [reservation_data(reservation) for reservation in reservations]
+        })
+    
+    if not get_operator_context(request).is_certified_for(machine):
+        return JsonResponse({
+            'success': False,
+            'error': 'You are not certified to use this machine'
+        })
+    
+    # Slot is given as start + end, or start + duration in minutes
+    start = parse_request_datetime(request.POST.get('start'))
+    if request.POST.get('end'):
+        end = parse_request_datetime(request.POST.get('end'))
+    else:
+        minutes = parse_duration_minutes(request.POST.get('duration'))
+        end = start + timedelta(minutes=minutes) if start and minutes else None
+    if start is None or end is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Provide a start time and either an end time or a duration in minutes'
+        })
+    
+    job = None
+    if request.POST.get('job_id'):
+        job = Job.objects.filter(job_id=request.POST['job_id']).first()
+        if job is None:
+            return JsonResponse({'success': False, 'error': 'Job not found'})
+    
+    try:
+        reservation = book_reservation(machine, request.user, start, end, job=job, notes=request.POST.get('notes', ''))
+    except ReservationConflict as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'conflict': reservation_data(e.reservation)
+        })
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{machine.name} reserved',
+        'reservation': reservation_data(reservation)
+    })
+
+
+@login_required
+@require_POST
+def cancel_reservation(request, reservation_id):
+    """API endpoint to cancel one of the user's reservations"""
+    reservation = get_object_or_404(MachineReservation, pk=reservation_id)
+    
+    if reservation.reserved_by != request.user and not request.user.is_staff:
+        return JsonResponse({
+            'success': False,
+            'error': 'You can only cancel your own reservations'
+        })
+    
+    reservation.delete()
+    return JsonResponse({'success': True, 'message': 'Reservation cancelled'})
+
+
+@login_required
+@require_GET
+def machine_type_next_free_slot(request, type_id):
+    """API endpoint to find the earliest free slot on any machine of a type"""
+    machine_type = get_object_or_404(MachineType, pk=type_id)
+    
+    minutes = parse_duration_minutes(request.GET.get('duration', 60))
+    if minutes is None:
+        return JsonResponse({'success': False, 'error': 'Invalid duration'})
+    
+    after = timezone.now()
+    if request.GET.get('after'):
+        after = parse_request_datetime(request.GET['after'])
+        if after is None:
+            return JsonResponse({'success': False, 'error': 'Invalid start time'})
+        after = max(after, timezone.now())
+    
+    slot = next_free_slot(machine_type, timedelta(minutes=minutes), after=after)
+    if slot is None:
+        return JsonResponse({
+            'success': False,
+            'error': f'No {machine_type.name} machines are available'
+        })
+    
+    machine, start = slot
+    return JsonResponse({
+        'success': True,
+        'machine_id': machine.machine_id,
+        'machine_name': machine.name,
+        'start_time': start.isoformat(),
+        'end_time': (start + timedelta(minutes=minutes)).isoformat(),
+    })
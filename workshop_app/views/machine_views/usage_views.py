@@ -7,9 +7,22 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.utils import timezone
+from django.db import transaction
 from decimal import Decimal
 
 from workshop_app.models import Machine, MachineUsage, StaffSettings
+from workshop_app.utils.machine_events import publish_machine_status
+from workshop_app.utils.machine_scheduler import current_reservation
+from workshop_app.utils.machine_sessions import close_usage, save_closed_usage
+from workshop_app.utils.machine_utilization import record_usage
+from workshop_app.utils.job_costs import add_machine_costs
+from workshop_app.utils.operator_context import get_operator_context
+from workshop_app.utils.staff_context import get_staff_context
+
+
+class MachineUnavailable(Exception):
+    """The machine was taken between the first check and locking it"""
+
 
 @login_required
 @require_POST
@@ -28,19 +41,8 @@ def start_machine_usage(request, machine_id):
         return redirect('machine_detail', machine_id=machine_id)
     
     # Check if user is certified for this machine
-    try:
-        operator = request.user.operator
-        is_certified = operator.is_certified_for(machine)
-        
-        if not is_certified:
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'success': False,
-                    'error': 'You are not certified to use this machine'
-                })
-            messages.error(request, 'You are not certified to use this machine')
-            return redirect('machine_detail', machine_id=machine_id)
-    except:
+    operator_context = get_operator_context(request)
+    if not operator_context.has_operator:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': False,
@@ -49,9 +51,33 @@ def start_machine_usage(request, machine_id):
         messages.error(request, 'Operator profile not found')
         return redirect('machine_detail', machine_id=machine_id)
     
+    if not operator_context.is_certified_for(machine):
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': False,
+                'error': 'You are not certified to use this machine'
+            })
+        messages.error(request, 'You are not certified to use this machine')
+        return redirect('machine_detail', machine_id=machine_id)
+    
+    # Check the machine is not reserved by someone else right now
+    reservation = current_reservation(machine)
+    if reservation is not None and reservation.reserved_by_id != request.user.id:
+        error = (
+            f'Machine is reserved by {reservation.reserved_by.get_full_name() or reservation.reserved_by.username} '
+            f'until {timezone.localtime(reservation.end_time):%H:%M}'
+        )
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': False,
+                'error': error
+            })
+        messages.error(request, error)
+        return redirect('machine_detail', machine_id=machine_id)
+    
     # Get active job
     try:
-        staff_settings = StaffSettings.objects.get(user=request.user)
+        staff_settings = get_staff_context(request).require_settings()
         active_job = staff_settings.active_job
         
         if not active_job:
@@ -77,31 +103,42 @@ def start_machine_usage(request, machine_id):
     notes = request.POST.get('notes', '')
     
     try:
-        # Create usage record
-        usage = MachineUsage(
-            machine=machine,
-            start_time=timezone.now(),
-            setup_time=setup_time,
-            job_reference=active_job.job_id,
-            operator_name=request.user.get_full_name() or request.user.username,
-            notes=notes
-        )
-        
-        # Calculate costs if rates are set
-        if machine.setup_rate:
-            usage.setup_cost = Decimal(setup_time / 60) * machine.setup_rate
-        
-        usage.save()
-        
-        # Update machine status
-        machine.status = 'in_use'
-        machine.current_job = active_job
-        
-        # Calculate reserved until time based on setup time and estimated usage
-        reserved_minutes = setup_time + estimated_usage
-        machine.reserved_until = timezone.now() + timezone.timedelta(minutes=reserved_minutes)
-        
-        machine.save()
+        with transaction.atomic():
+            # Lock the machine and check again: someone may have started it meanwhile
+            machine = Machine.objects.select_for_update().get(pk=machine.pk)
+            if machine.status != 'available':
+                raise MachineUnavailable(
+                    f'Machine is not available (current status: {machine.get_status_display()})'
+                )
+            
+            # Create usage record
+            usage = MachineUsage(
+                machine=machine,
+                start_time=timezone.now(),
+                setup_time=setup_time,
+                job_reference=active_job.job_id,
+                operator_name=request.user.get_full_name() or request.user.username,
+                job=active_job,
+                operator_user=request.user,
+                notes=notes
+            )
+            
+            # Calculate costs if rates are set
+            if machine.setup_rate:
+                usage.setup_cost = Decimal(setup_time / 60) * machine.setup_rate
+            
+            usage.save()
+            
+            # Update machine status
+            machine.status = 'in_use'
+            machine.current_job = active_job
+            
+            # Calculate reserved until time based on setup time and estimated usage
+            reserved_minutes = setup_time + estimated_usage
+            machine.reserved_until = timezone.now() + timezone.timedelta(minutes=reserved_minutes)
+            
+            machine.save()
+        publish_machine_status(machine)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -113,6 +150,15 @@ def start_machine_usage(request, machine_id):
         messages.success(request, f'You are now using {machine.name}')
         return redirect('machine_detail', machine_id=machine_id)
             
+    except MachineUnavailable as e:
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            })
+        messages.error(request, str(e))
+        return redirect('machine_detail', machine_id=machine_id)
+            
     except Exception as e:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -144,40 +190,35 @@ def stop_machine_usage(request, machine_id):
     notes = request.POST.get('notes', '')
     
     try:
-        # Find active usage record
-        usage = MachineUsage.objects.filter(
-            machine=machine,
-            end_time__isnull=True
-        ).latest('start_time')
-        
-        # Update usage record
-        usage.end_time = timezone.now()
-        usage.cleanup_time = cleanup_time
-        
-        # Calculate operation time in minutes
-        operation_minutes = (usage.end_time - usage.start_time).total_seconds() / 60
-        
-        # Update notes if provided
-        if notes:
-            usage.notes += f"\n\nStop notes: {notes}"
-        
-        # Calculate costs if rates are set
-        if machine.hourly_rate:
-            usage.operation_cost = Decimal(operation_minutes / 60) * machine.hourly_rate
+        with transaction.atomic():
+            # Lock the machine so the stale session sweeper cannot close the usage at the same time
+            machine = Machine.objects.select_for_update().get(pk=machine.pk)
             
-        if machine.cleanup_rate:
-            usage.cleanup_cost = Decimal(cleanup_time / 60) * machine.cleanup_rate
+            # Find active usage record
+            usage = MachineUsage.objects.filter(
+                machine=machine,
+                end_time__isnull=True
+            ).latest('start_time')
             
-        # Calculate total cost
-        usage.total_cost = (usage.setup_cost or 0) + (usage.operation_cost or 0) + (usage.cleanup_cost or 0)
-        
-        usage.save()
-        
-        # Update machine status
-        machine.status = 'available'
-        machine.current_job = None
-        machine.reserved_until = None
-        machine.save()
+            # Update usage record with end time and costs
+            operation_minutes = close_usage(usage, machine, timezone.now(), cleanup_time)
+            
+            # Update notes if provided
+            if notes:
+                usage.notes += f"\n\nStop notes: {notes}"
+            
+            if not save_closed_usage(usage):
+                # Closed by the sweeper since it was read
+                raise MachineUsage.DoesNotExist()
+            record_usage(usage)
+            add_machine_costs([usage])
+            
+            # Update machine status
+            machine.status = 'available'
+            machine.current_job = None
+            machine.reserved_until = None
+            machine.save()
+        publish_machine_status(machine)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
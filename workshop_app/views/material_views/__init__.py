@@ -8,8 +8,8 @@ Import and re-export all views from submodules for backward compatibility.
 from workshop_app.views.material_views.list_views import material_list
 from workshop_app.views.material_views.detail_views import material_detail, material_history, get_material_qr_code
 from workshop_app.views.material_views.edit_views import add_material, edit_material, delete_material_attachment
-from workshop_app.views.material_views.transaction_views import withdraw_material, return_material, restock_material, restock_material_form
-from workshop_app.views.material_views.api_views import get_active_job, clear_active_job, start_timer, stop_timer, edit_time_tracking_notes
+from workshop_app.views.material_views.transaction_views import withdraw_material, withdraw_pick_list, return_material, restock_material, restock_material_form
+from workshop_app.views.material_views.api_views import get_active_job, clear_active_job, start_timer, stop_timer, edit_time_tracking_notes, material_search
 
 # Re-export all views
 __all__ = [
@@ -18,6 +18,7 @@ __all__ = [
     'add_material',
     'edit_material',
     'withdraw_material',
+    'withdraw_pick_list',
     'return_material',
     'restock_material',
     'restock_material_form',
@@ -29,4 +30,5 @@ __all__ = [
     'start_timer',
     'stop_timer',
     'edit_time_tracking_notes',
+    'material_search',
 ]
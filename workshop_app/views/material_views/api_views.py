@@ -8,18 +8,23 @@ from django.utils import timezone
 
 from workshop_app.models import StaffSettings
 from workshop_app.models.job_time_tracking import JobTimeTracking
+from workshop_app.utils.material_search import search_materials
+from workshop_app.utils.staff_context import get_staff_context
+
+# Largest number of typeahead results a client may ask for
+MAX_SEARCH_RESULTS = 50
 
 
 @login_required
 def get_active_job(request):
     """API endpoint to get the user's active job"""
     try:
-        settings = StaffSettings.objects.get(user=request.user)
-        active_job = settings.active_job
+        staff = get_staff_context(request)
+        active_job = staff.require_settings().active_job
         
         # Get active time tracking info if available
-        active_time_tracking = JobTimeTracking.get_active_entry(request.user)
-        is_tracking = active_time_tracking is not None and active_time_tracking.job == active_job
+        active_time_tracking = staff.active_time_entry
+        is_tracking = staff.is_tracking_active_job
         
         if active_job:
             return JsonResponse({
@@ -46,20 +51,22 @@ def get_active_job(request):
 def clear_active_job(request):
     """API endpoint to clear the user's active job and set personal job as active"""
     try:
-        settings = StaffSettings.objects.get(user=request.user)
+        staff = get_staff_context(request)
+        settings = staff.require_settings()
         
         # Stop any active time tracking for the current job
-        active_time_tracking = JobTimeTracking.get_active_entry(request.user)
+        active_time_tracking = staff.active_time_entry
         if active_time_tracking:
-            active_time_tracking.end_time = timezone.now()
-            active_time_tracking.notes += "\nAuto-stopped when clearing active job."
-            active_time_tracking.save()
+            JobTimeTracking.close_entry(
+                active_time_tracking,
+                notes=active_time_tracking.notes + "\nAuto-stopped when clearing active job."
+            )
         
         # If personal job exists, set it as active
         if settings.personal_job:
             settings.active_job = settings.personal_job
             settings.active_since = timezone.now()
-            settings.save()
+            settings.save(update_fields=settings.ACTIVE_JOB_FIELDS)
             return JsonResponse({
                 'success': True,
                 'message': 'Active job set to your personal job',
@@ -90,8 +97,8 @@ def clear_active_job(request):
 def start_timer(request):
     """API endpoint to start time tracking for the active job"""
     try:
-        settings = StaffSettings.objects.get(user=request.user)
-        active_job = settings.active_job
+        staff = get_staff_context(request)
+        active_job = staff.require_settings().active_job
         
         if not active_job:
             return JsonResponse({
@@ -100,8 +107,8 @@ def start_timer(request):
             })
         
         # Check if already tracking
-        active_tracking = JobTimeTracking.get_active_entry(request.user)
-        if active_tracking and active_tracking.job == active_job:
+        active_tracking = staff.active_time_entry
+        if staff.is_tracking_active_job:
             return JsonResponse({
                 'success': True,
                 'message': 'Already tracking time for this job',
@@ -122,7 +129,7 @@ def start_timer(request):
         # Update the job's start date if not set
         if not active_job.start_date:
             active_job.start_date = timezone.now().date()
-            active_job.save()
+            active_job.save(update_fields=['start_date'])
         
         return JsonResponse({
             'success': True,
@@ -236,3 +243,28 @@ def edit_time_tracking_notes(request, tracking_id):
             'success': False,
             'error': str(e)
         })
+
+
+@login_required
+def material_search(request):
+    """API endpoint for material typeahead search"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_SEARCH_RESULTS)
+    except ValueError:
+        limit = 10
+    
+    results = search_materials(query, limit=limit)
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'material_id': result['material_id'],
+                'name': result['name'],
+                'current_stock': str(result['current_stock']),
+                'unit_of_measurement': result['unit_of_measurement'],
+                'location': result['location_in_workshop'],
+            }
+            for result in results
+        ],
+    })
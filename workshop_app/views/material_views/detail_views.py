@@ -5,8 +5,9 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 
-from workshop_app.models import Material, MaterialTransaction, JobMaterial, StaffSettings
-from workshop_app.utils.barcode_utils import generate_qr_code
+from workshop_app.models import Material, MaterialTransaction, JobMaterial
+from workshop_app.utils.staff_context import get_staff_context
+from workshop_app.views.qr_views import qr_code_image_url
 
 
 @login_required
@@ -17,14 +18,10 @@ def material_detail(request, material_id):
     # Get transaction history
     transactions = MaterialTransaction.objects.filter(
         material=material
-    ).order_by('-transaction_date')[:10]
+    ).select_related('job').order_by('-transaction_date')[:10]
     
     # Get active job for association
-    try:
-        settings = StaffSettings.objects.get(user=request.user)
-        active_job = settings.active_job
-    except StaffSettings.DoesNotExist:
-        active_job = None
+    active_job = get_staff_context(request).active_job
     
     context = {
         'material': material,
@@ -43,7 +40,7 @@ def material_history(request, material_id):
     # Get all transactions for this material
     transactions = MaterialTransaction.objects.filter(
         material=material
-    ).order_by('-transaction_date')
+    ).select_related('job').order_by('-transaction_date')
     
     # Get job uses for this material
     job_uses = JobMaterial.objects.filter(
@@ -64,11 +61,12 @@ def get_material_qr_code(request, material_id):
     """Generate and return QR code for a material"""
     material = get_object_or_404(Material, material_id=material_id)
     
-    # Generate QR code
-    qr_code_url = generate_qr_code(material.material_id)
+    # Point to the cached QR image instead of inlining it
+    qr_code_url = qr_code_image_url(material.material_id)
     
     return JsonResponse({
         'success': True,
         'material_name': material.name,
-        'qr_code_url': qr_code_url
+        'qr_code_url': qr_code_url,
+        'qr_code_svg_url': qr_code_image_url(material.material_id, 'svg')
     })
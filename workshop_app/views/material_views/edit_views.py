@@ -12,6 +12,7 @@ from workshop_app.models import (
     MaterialAttachment, AttachmentType
 )
 from workshop_app.forms import MaterialForm
+from workshop_app.utils.id_allocator import next_material_id
 
 
 @login_required
@@ -28,19 +29,8 @@ def add_material(request):
             # Save but don't commit to set additional fields
             material = form.save(commit=False)
             
-            # Generate a unique material ID
-            material_type = material.material_type
-            category_code = material_type.category.code
-            type_code = material_type.code
-            
-            # Count existing materials of this type + 1
-            count = Material.objects.filter(
-                material_type__category__code=category_code,
-                material_type__code=type_code
-            ).count() + 1
-            
-            # Generate ID as CATEG-TYPE-XXXXX
-            material.material_id = f"{category_code}-{type_code}-{count:05d}"
+            # Generate a unique material ID as CATEG-TYPE-XXXXX
+            material.material_id = next_material_id(material.material_type)
             
             # Set creator
             material.created_by = request.user
@@ -61,6 +51,7 @@ def add_material(request):
                     transaction_date=timezone.now(),
                     job_reference='Initial Stock',
                     operator_name=request.user.get_full_name() or request.user.username,
+                    operator_user=request.user,
                     notes='Initial stock on creation'
                 )
             
@@ -122,6 +113,7 @@ def edit_material(request, material_id):
                     transaction_date=timezone.now(),
                     job_reference='Manual Adjustment',
                     operator_name=request.user.get_full_name() or request.user.username,
+                    operator_user=request.user,
                     notes=f'Manual stock adjustment from {old_stock} to {new_stock}'
                 )
             
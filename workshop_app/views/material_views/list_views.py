@@ -3,11 +3,28 @@ Views for material listing and filtering.
 """
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.db import connection
-from django.conf import settings
+from django.db.models import OuterRef, Subquery
 
-from workshop_app.models import Material, MaterialCategory, MaterialType
+from workshop_app.models import Material, MaterialAttachment, MaterialCategory, MaterialType
+from workshop_app.utils.keyset_pagination import paginate_keyset
+from workshop_app.utils.material_search import filter_materials
+
+# AttachmentType id of product photos shown as list thumbnails
+PRODUCT_ATTACHMENT_TYPE_ID = 3
+
+# Rows shown per page of the material list
+MATERIAL_LIST_PAGE_SIZE = 50
+
+# Ordering fields for each sort option; 'pk' keeps every ordering unique
+# so the keyset cursors are stable
+MATERIAL_SORT_FIELDS = {
+    'name': ('name', 'pk'),
+    'id': ('material_id', 'pk'),
+    'stock': ('current_stock', 'pk'),
+    'category': ('material_type__category__name', 'material_type__name', 'pk'),
+    'location': ('location_in_workshop', 'pk'),
+    'color': ('color', 'pk'),
+}
 
 
 @login_required
@@ -21,18 +38,20 @@ def material_list(request):
     color_filter = request.GET.get('color', '')  # New color filter parameter
     sort_param = request.GET.get('sort', 'name')
     
-    # Start with all materials
-    materials = Material.objects.all()
+    # Start with all materials. Type and category are joined in because
+    # every row shows them; the latest product image comes from a correlated
+    # subquery on the paged query instead of loading every attachment.
+    latest_product_image = MaterialAttachment.objects.filter(
+        material=OuterRef('pk'),
+        attachment_type_id=PRODUCT_ATTACHMENT_TYPE_ID,
+    ).exclude(file='').order_by('-upload_date', '-pk').values('file')[:1]
+    materials = Material.objects.select_related('material_type__category').annotate(
+        product_image=Subquery(latest_product_image)
+    )
     
-    # Apply search filter
+    # Apply search filter (full-text index when available)
     if search_query:
-        materials = materials.filter(
-            Q(name__icontains=search_query) |
-            Q(material_id__icontains=search_query) |
-            Q(supplier_name__icontains=search_query) |
-            Q(brand_name__icontains=search_query) |
-            Q(location_in_workshop__icontains=search_query)
-        )
+        materials = filter_materials(materials, search_query)
     
     # Apply category filter
     if category_id:
@@ -54,19 +73,22 @@ def material_list(request):
     if color_filter:
         materials = materials.filter(color__iexact=color_filter)
     
-    # Apply sorting
-    if sort_param == 'name':
-        materials = materials.order_by('name')
-    elif sort_param == 'id':
-        materials = materials.order_by('material_id')
-    elif sort_param == 'stock':
-        materials = materials.order_by('current_stock')
-    elif sort_param == 'category':
-        materials = materials.order_by('material_type__category__name', 'material_type__name')
-    elif sort_param == 'location':
-        materials = materials.order_by('location_in_workshop')
-    elif sort_param == 'color':  # New sort option
-        materials = materials.order_by('color')
+    # Apply sorting and fetch only the requested page
+    if sort_param not in MATERIAL_SORT_FIELDS:
+        sort_param = 'name'
+    page_obj = paginate_keyset(
+        materials,
+        sort_param,
+        MATERIAL_SORT_FIELDS[sort_param],
+        MATERIAL_LIST_PAGE_SIZE,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    
+    # Query string for page links, without the cursor parameters
+    page_query = request.GET.copy()
+    for param in ('after', 'before', 'page'):
+        page_query.pop(param, None)
     
     # Get categories and types for filter dropdowns
     categories = MaterialCategory.objects.all().order_by('name')
@@ -77,29 +99,13 @@ def material_list(request):
     # Filter out empty colors
     colors = [color for color in colors if color]
     
-    # Get material images directly using raw SQL - filter for attachment_type_id = 3 (Product)
-    material_images = {}
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT ma.material_id, ma.file 
-            FROM workshop_app_materialattachment ma 
-            WHERE ma.attachment_type_id = 3 
-            ORDER BY ma.upload_date DESC
-        """)
-        rows = cursor.fetchall()
-        
-        for material_id, file_path in rows:
-            if file_path:
-                # Create a full URL for the image using MEDIA_URL
-                media_url = settings.MEDIA_URL.rstrip('/')
-                full_url = f"{media_url}/{file_path}"
-                material_images[material_id] = full_url
-    
     context = {
-        'materials': materials,
+        'materials': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages,
+        'page_query': page_query.urlencode(),
         'categories': categories,
         'material_types': material_types,
-        'material_images': material_images,
         'colors': colors,  # Add colors to context
     }
     
@@ -3,6 +3,7 @@
 """
 Views for material transactions (withdrawals, returns, and restocks).
 """
+import json
 from decimal import Decimal, InvalidOperation
 from django.shortcuts import redirect, get_object_or_404, render
 from django.contrib.auth.decorators import login_required
@@ -12,15 +13,22 @@ from django.http import JsonResponse
 from django.utils import timezone
 from django.db import transaction
 
-from workshop_app.models import Material, MaterialTransaction, JobMaterial, StaffSettings
+from workshop_app.models import Material, MaterialTransaction, StaffSettings
 from workshop_app.forms import MaterialRestockForm
-from workshop_app.utils.price_utils import calculate_weighted_average_price
+from workshop_app.utils.stock_ledger import (
+    InsufficientStock, JobMaterialLine, StockShortfall,
+    record_job_materials, withdraw_stock, withdraw_many, return_stock, restock,
+)
+from workshop_app.utils.staff_context import get_staff_context
+
+# Largest number of lines accepted in one pick list
+MAX_PICK_LIST_LINES = 200
 
 
 @login_required
 @require_POST
 def withdraw_material(request, material_id):
-    """Process material withdrawal using raw SQL where needed"""
+    """Process material withdrawal"""
     material = get_object_or_404(Material, material_id=material_id)
     
     # Get form data
@@ -46,19 +54,9 @@ def withdraw_material(request, material_id):
         messages.error(request, 'Quantity must be greater than zero')
         return redirect('material_detail', material_id=material_id)
     
-    if quantity > material.current_stock:
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({
-                'success': False,
-                'error': f'Not enough stock available. Current stock: {material.current_stock} {material.unit_of_measurement}'
-            })
-        messages.error(request, f'Not enough stock available. Current stock: {material.current_stock} {material.unit_of_measurement}')
-        return redirect('material_detail', material_id=material_id)
-    
     # Get active job
     try:
-        staff_settings = StaffSettings.objects.get(user=request.user)
-        active_job = staff_settings.active_job
+        active_job = get_staff_context(request).require_settings().active_job
     except StaffSettings.DoesNotExist:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -80,14 +78,8 @@ def withdraw_material(request, material_id):
     try:
         # Start transaction to ensure consistency
         with transaction.atomic():
-            # Update material stock - Already using Decimal type from conversion above
-            material.current_stock -= quantity
-            
-            # Check if we need to set minimum stock alert
-            if material.minimum_stock_level and material.current_stock <= material.minimum_stock_level:
-                material.minimum_stock_alert = True
-            
-            material.save()
+            # Take the stock out; fails if another withdrawal got there first
+            withdraw_stock(material, quantity)
             
             # Create transaction record - using only the fields that exist in your database
             transaction_record = MaterialTransaction.objects.create(
@@ -97,36 +89,18 @@ def withdraw_material(request, material_id):
                 transaction_date=timezone.now(),
                 job_reference=active_job.job_id,
                 operator_name=request.user.get_full_name() or request.user.username,
+                job=active_job,
+                operator_user=request.user,
                 notes=notes
             )
             
-            # Use raw SQL to create the JobMaterial record
-            # This bypasses Django's model validation
-            from django.db import connection
-            with connection.cursor() as cursor:
-                # Get next ID value (PostgreSQL would use SERIAL, SQLite is different)
-                cursor.execute("SELECT MAX(id) FROM workshop_app_jobmaterial")
-                max_id = cursor.fetchone()[0]
-                new_id = (max_id or 0) + 1
-                
-                # Format date_used for SQL
-                date_used = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Format unit_price for SQL (None handling)
-                unit_price_str = f"'{material.price_per_unit}'" if material.price_per_unit is not None else "NULL"
-                
-                # Execute the INSERT with known columns
-                sql = f"""
-                INSERT INTO workshop_app_jobmaterial (
-                    id, job_id, material_id, quantity, date_used, added_by, 
-                    result, notes, unit_price, usage_status
-                ) VALUES (
-                    {new_id}, {active_job.id}, {material.id}, '{quantity}', '{date_used}', 
-                    '{request.user.get_full_name() or request.user.username}', 'active', 
-                    '{notes.replace("'", "''")}', {unit_price_str}, 'active'
-                )
-                """
-                cursor.execute(sql)
+            # Record the usage against the active job
+            record_job_materials(
+                [JobMaterialLine(active_job, material, quantity)],
+                added_by=request.user.get_full_name() or request.user.username,
+                result='active',
+                notes=notes,
+            )
             
         # Handle AJAX requests
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -134,11 +108,21 @@ def withdraw_material(request, material_id):
                 'success': True,
                 'message': f'Successfully withdrew {quantity} {material.unit_of_measurement} of {material.name}',
                 'job_reference': active_job.job_id,
-                'operator_name': request.user.get_full_name() or request.user.username
+                'operator_name': request.user.get_full_name() or request.user.username,
+                'new_stock': str(material.current_stock)
             })
             
         messages.success(request, f'Successfully withdrew {quantity} {material.unit_of_measurement} of {material.name}')
         return redirect('material_detail', material_id=material_id)
+    
+    except InsufficientStock as e:
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            })
+        messages.error(request, str(e))
+        return redirect('material_detail', material_id=material_id)
             
     except Exception as e:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -151,10 +135,115 @@ def withdraw_material(request, material_id):
         return redirect('material_detail', material_id=material_id)
 
 
+@login_required
+@require_POST
+def withdraw_pick_list(request):
+    """Withdraw several materials for the active job in one all-or-nothing request"""
+    # Accept either a JSON body {"lines": [{"material_id", "quantity"}], "notes"}
+    # or parallel material_id/quantity form fields
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+            lines = [(line['material_id'], line['quantity']) for line in payload.get('lines', [])]
+            notes = payload.get('notes', '')
+        except (ValueError, AttributeError, KeyError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Invalid JSON body'})
+    else:
+        lines = list(zip(request.POST.getlist('material_id'), request.POST.getlist('quantity')))
+        notes = request.POST.get('notes', '')
+    
+    if not lines:
+        return JsonResponse({'success': False, 'error': 'No pick list lines provided'})
+    
+    if len(lines) > MAX_PICK_LIST_LINES:
+        return JsonResponse({
+            'success': False,
+            'error': f'Too many lines in one pick list (maximum {MAX_PICK_LIST_LINES})'
+        })
+    
+    # Validate quantities and merge repeated materials
+    quantities = {}
+    for material_id, quantity in lines:
+        try:
+            quantity = Decimal(str(quantity))
+        except InvalidOperation:
+            return JsonResponse({'success': False, 'error': f'Invalid quantity for {material_id}'})
+        if not quantity.is_finite() or quantity <= 0:
+            return JsonResponse({'success': False, 'error': f'Quantity for {material_id} must be greater than zero'})
+        quantities[str(material_id)] = quantities.get(str(material_id), Decimal('0')) + quantity
+    
+    active_job = get_staff_context(request).active_job
+    if not active_job:
+        return JsonResponse({
+            'success': False,
+            'error': 'No active job set. Please activate a job before withdrawing material.'
+        })
+    
+    operator_name = request.user.get_full_name() or request.user.username
+    try:
+        with transaction.atomic():
+            materials = withdraw_many(quantities)
+            
+            now = timezone.now()
+            MaterialTransaction.objects.bulk_create([
+                MaterialTransaction(
+                    material=materials[material_id],
+                    quantity=quantity,
+                    transaction_type='withdrawal',
+                    transaction_date=now,
+                    job_reference=active_job.job_id,
+                    operator_name=operator_name,
+                    job=active_job,
+                    operator_user=request.user,
+                    notes=notes
+                )
+                for material_id, quantity in quantities.items()
+            ])
+            record_job_materials(
+                [JobMaterialLine(active_job, materials[material_id], quantity) for material_id, quantity in quantities.items()],
+                added_by=operator_name,
+                result='active',
+                notes=notes,
+            )
+    except StockShortfall as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'shortfalls': [
+                {
+                    'material_id': line['material_id'],
+                    'requested': str(line['requested']),
+                    'available': str(line['available']) if line['available'] is not None else None,
+                }
+                for line in e.shortfalls
+            ]
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error processing pick list: {str(e)}'
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'Successfully withdrew {len(quantities)} materials',
+        'job_reference': active_job.job_id,
+        'operator_name': operator_name,
+        'lines': [
+            {
+                'material_id': material_id,
+                'quantity': str(quantity),
+                'new_stock': str(materials[material_id].current_stock),
+            }
+            for material_id, quantity in quantities.items()
+        ]
+    })
+
+
 @login_required
 @require_POST
 def return_material(request, material_id):
-    """Process material return using raw SQL where needed"""
+    """Process material return"""
     material = get_object_or_404(Material, material_id=material_id)
     
     # Get form data
@@ -181,23 +270,13 @@ def return_material(request, material_id):
         return redirect('material_detail', material_id=material_id)
     
     # Get active job (optional for returns)
-    try:
-        staff_settings = StaffSettings.objects.get(user=request.user)
-        active_job = staff_settings.active_job
-    except StaffSettings.DoesNotExist:
-        active_job = None
+    active_job = get_staff_context(request).active_job
     
     try:
         # Start transaction to ensure consistency
         with transaction.atomic():
-            # Update material stock - Already using Decimal type from conversion above
-            material.current_stock += quantity
-            
-            # Check if we need to clear minimum stock alert
-            if material.minimum_stock_level and material.current_stock > material.minimum_stock_level:
-                material.minimum_stock_alert = False
-            
-            material.save()
+            # Put the stock back
+            return_stock(material, quantity)
             
             # Create transaction record - using only the fields that exist in your database
             transaction_record = MaterialTransaction.objects.create(
@@ -207,36 +286,19 @@ def return_material(request, material_id):
                 transaction_date=timezone.now(),
                 job_reference=active_job.job_id if active_job else 'N/A',
                 operator_name=request.user.get_full_name() or request.user.username,
+                job=active_job,
+                operator_user=request.user,
                 notes=notes
             )
             
-            # If there's an active job, create a negative job material entry using raw SQL
+            # If there's an active job, record the return as negative usage
             if active_job:
-                from django.db import connection
-                with connection.cursor() as cursor:
-                    # Get next ID value
-                    cursor.execute("SELECT MAX(id) FROM workshop_app_jobmaterial")
-                    max_id = cursor.fetchone()[0]
-                    new_id = (max_id or 0) + 1
-                    
-                    # Format date_used for SQL
-                    date_used = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # Format unit_price for SQL (None handling)
-                    unit_price_str = f"'{material.price_per_unit}'" if material.price_per_unit is not None else "NULL"
-                    
-                    # Execute the INSERT
-                    sql = f"""
-                    INSERT INTO workshop_app_jobmaterial (
-                        id, job_id, material_id, quantity, date_used, added_by, 
-                        result, notes, unit_price, usage_status
-                    ) VALUES (
-                        {new_id}, {active_job.id}, {material.id}, '{-quantity}', '{date_used}', 
-                        '{request.user.get_full_name() or request.user.username}', 'returned', 
-                        '{notes.replace("'", "''")}', {unit_price_str}, 'returned'
-                    )
-                    """
-                    cursor.execute(sql)
+                record_job_materials(
+                    [JobMaterialLine(active_job, material, -quantity)],
+                    added_by=request.user.get_full_name() or request.user.username,
+                    result='returned',
+                    notes=notes,
+                )
             
         # Handle AJAX requests
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -244,7 +306,8 @@ def return_material(request, material_id):
                 'success': True,
                 'message': f'Successfully returned {quantity} {material.unit_of_measurement} of {material.name}',
                 'job_reference': active_job.job_id if active_job else 'N/A',
-                'operator_name': request.user.get_full_name() or request.user.username
+                'operator_name': request.user.get_full_name() or request.user.username,
+                'new_stock': str(material.current_stock)
             })
             
         messages.success(request, f'Successfully returned {quantity} {material.unit_of_measurement} of {material.name}')
@@ -304,7 +367,10 @@ def restock_material(request, material_id):
         update_location = request.POST.get('update_location') == 'on'
         new_location = request.POST.get('new_location', '')
         update_min_stock = request.POST.get('update_min_stock') == 'on'
-        new_min_stock = request.POST.get('new_min_stock', '')
+        try:
+            new_min_stock = Decimal(request.POST.get('new_min_stock', ''))
+        except InvalidOperation:
+            new_min_stock = None
         
         # Validate required fields
         if quantity <= 0:
@@ -335,45 +401,15 @@ def restock_material(request, material_id):
     try:
         # Start database transaction
         with transaction.atomic():
-            # Calculate new weighted average price
-            old_price = material.price_per_unit or Decimal('0.00')
-            new_avg_price = calculate_weighted_average_price(
-                material.current_stock,
-                old_price,
+            # Add the stock and update the weighted average price
+            restock(
+                material,
                 quantity,
-                purchase_price
+                purchase_price,
+                location=new_location if update_location else None,
+                minimum_stock_level=new_min_stock if update_min_stock else None,
             )
             
-            # Update material stock
-            material.current_stock += quantity
-            
-            # Update price per unit with weighted average
-            material.price_per_unit = new_avg_price
-            
-            # Update location if requested
-            if update_location and new_location:
-                material.location_in_workshop = new_location
-                
-            # Update minimum stock level if requested
-            if update_min_stock and new_min_stock:
-                try:
-                    min_stock = Decimal(new_min_stock)
-                    material.minimum_stock_level = min_stock
-                    
-                    # Update minimum stock alert status
-                    if material.current_stock <= min_stock:
-                        material.minimum_stock_alert = True
-                    else:
-                        material.minimum_stock_alert = False
-                except:
-                    pass
-            else:
-                # Check minimum stock alert with existing threshold
-                if material.minimum_stock_level and material.current_stock > material.minimum_stock_level:
-                    material.minimum_stock_alert = False
-            
-            material.save()
-            
             # Create transaction record - using only the fields that exist in your database schema
             transaction_record = MaterialTransaction.objects.create(
                 material=material,
@@ -382,6 +418,7 @@ def restock_material(request, material_id):
                 transaction_date=timezone.now(),
                 job_reference='Inventory Restock',
                 operator_name=request.user.get_full_name() or request.user.username,
+                operator_user=request.user,
                 notes=f"Purchased at ${purchase_price} per unit from {supplier_name} on {purchase_date}. {notes}"
             )
             
@@ -425,41 +462,15 @@ def process_restock(request, material, form):
         
         # Start database transaction
         with transaction.atomic():
-            # Calculate new weighted average price
-            old_price = material.price_per_unit or Decimal('0.00')
-            new_avg_price = calculate_weighted_average_price(
-                material.current_stock,
-                old_price,
+            # Add the stock and update the weighted average price
+            restock(
+                material,
                 quantity,
-                purchase_price
+                purchase_price,
+                location=new_location if update_location else None,
+                minimum_stock_level=new_min_stock if update_min_stock else None,
             )
             
-            # Update material stock
-            material.current_stock += quantity
-            
-            # Update price per unit with weighted average
-            material.price_per_unit = new_avg_price
-            
-            # Update location if requested
-            if update_location and new_location:
-                material.location_in_workshop = new_location
-                
-            # Update minimum stock level if requested
-            if update_min_stock and new_min_stock:
-                material.minimum_stock_level = new_min_stock
-                
-                # Update minimum stock alert status
-                if material.current_stock <= new_min_stock:
-                    material.minimum_stock_alert = True
-                else:
-                    material.minimum_stock_alert = False
-            else:
-                # Check minimum stock alert with existing threshold
-                if material.minimum_stock_level and material.current_stock > material.minimum_stock_level:
-                    material.minimum_stock_alert = False
-            
-            material.save()
-            
             # Create transaction record - including only the fields that exist in your schema
             transaction_record = MaterialTransaction.objects.create(
                 material=material,
@@ -468,6 +479,7 @@ def process_restock(request, material, form):
                 transaction_date=timezone.now(),
                 job_reference='Inventory Restock',
                 operator_name=request.user.get_full_name() or request.user.username,
+                operator_user=request.user,
                 notes=f"Purchased at ${purchase_price} per unit from {supplier_name} on {purchase_date}. {notes}"
             )
             
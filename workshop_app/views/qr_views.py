@@ -0,0 +1,47 @@
+"""
+Views for serving QR code images
+"""
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+
+from workshop_app.utils.barcode_utils import QR_CONTENT_TYPES, qr_cache_key, render_qr_code
+
+DEFAULT_QR_SIZE = 10
+MAX_QR_SIZE = 40
+
+# A given (data, size, format) always renders to the same image
+QR_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def qr_code_image_url(data, image_format='png'):
+    """URL of the cached QR image for the given data"""
+    return reverse('qr_code_image', kwargs={'code': data, 'image_format': image_format})
+
+
+@login_required
+@require_GET
+def qr_code_image(request, code, image_format):
+    """Serve a QR code image as PNG or SVG with caching headers"""
+    try:
+        size = int(request.GET.get('size', DEFAULT_QR_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid size')
+    
+    if not 1 <= size <= MAX_QR_SIZE:
+        return HttpResponseBadRequest(f'Size must be between 1 and {MAX_QR_SIZE}')
+    
+    etag = f'"{qr_cache_key(code, size, image_format)}"'
+    
+    # Answer revalidation requests without rendering anything
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(render_qr_code(code, size, image_format),
+                                content_type=QR_CONTENT_TYPES[image_format])
+    
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=QR_CACHE_MAX_AGE, immutable=True)
+    return response
@@ -1,17 +1,25 @@
 """
 Views for handling scanning functionality
 """
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q
 
 from workshop_app.models import Job, Material, Machine, StaffSettings, ScanHistory
-from workshop_app.utils.barcode_utils import determine_code_type, parse_code
+from workshop_app.utils.barcode_utils import classify_code
+from workshop_app.utils.operator_context import get_operator_context
+from workshop_app.utils.scan_resolver import scan_index
+from workshop_app.utils.staff_context import get_staff_context
 from workshop_app.forms import ManualEntryForm
+from workshop_app.views.machine_views.usage_views import start_machine_usage, stop_machine_usage
+
+# Upper bound on the number of codes accepted by process_batch_scan
+MAX_BATCH_SCAN_CODES = 1000
 
 @login_required
 def scan_view(request):
@@ -34,210 +42,125 @@ def process_scan(request):
     if not code:
         return JsonResponse({'success': False, 'error': 'No code provided'})
     
-    # Parse the code to extract ID
-    parsed_code = parse_code(code)
-    
-    # Attempt to determine the code type based on format
-    scan_type = determine_code_type(parsed_code)
-    
-    # Process based on scan type
-    if scan_type == 'job':
-        return process_job_scan(request, parsed_code)
-    elif scan_type == 'material':
-        return process_material_scan(request, parsed_code)
-    elif scan_type == 'machine':
-        return process_machine_scan(request, parsed_code)
-    else:
-        # If the code type is unknown, try to find it in the database
-        # by checking serial numbers and supplier SKUs
-        return process_unknown_scan(request, parsed_code)
-
-def process_unknown_scan(request, code):
-    """
-    Process a code that doesn't match our internal format patterns.
-    Try to find it in the database as a serial number or supplier code.
-    """
-    # Try to find it as a material serial number or supplier SKU
-    try:
-        material = Material.objects.filter(
-            Q(serial_number=code) | Q(supplier_sku=code)
-        ).first()
-        
-        if material:
-            # Record scan in history
-            ScanHistory.objects.create(
-                user=request.user,
-                scan_type='material',
-                code=code,
-                item_id=material.material_id,
-                item_name=material.name
-            )
-            
-            # Return material details and redirect URL
-            return JsonResponse({
-                'success': True,
-                'type': 'material',
-                'id': material.material_id,
-                'name': material.name,
-                'redirect_url': f'/scan/material/{material.material_id}/'
-            })
-    except Exception as e:
-        pass  # Continue to machine check if material lookup fails
+    # Parse the code to extract its ID and type in one pass
+    scanned = classify_code(code)
+    parsed_code = scanned.code
+    scan_type = scanned.code_type
     
-    # Try to find it as a machine serial number
     try:
-        machine = Machine.objects.filter(serial_number=code).first()
-        
-        if machine:
-            # Record scan in history
-            ScanHistory.objects.create(
-                user=request.user,
-                scan_type='machine',
-                code=code,
-                item_id=machine.machine_id,
-                item_name=machine.name
-            )
-            
-            # Return machine details and redirect URL
-            return JsonResponse({
-                'success': True,
-                'type': 'machine',
-                'id': machine.machine_id,
-                'name': machine.name,
-                'redirect_url': f'/scan/machine/{machine.machine_id}/'
-            })
+        # Resolve the code through the in-memory index
+        match = scan_index.resolve(parsed_code, scan_type)
     except Exception as e:
-        pass  # Continue to error response if machine lookup fails
-    
-    # If we get here, we couldn't find the code in our database
-    return JsonResponse({
-        'success': False,
-        'error': 'Unrecognized code. This doesn\'t match any known job, material, or machine.',
-        'scanned_code': code  # Add the scanned code to the response
-    })
-
-def process_job_scan(request, job_id):
-    """Process a job code scan"""
-    try:
-        # Look up job by ID
-        job = Job.objects.get(job_id=job_id)
-        
-        # Record scan in history
-        ScanHistory.objects.create(
-            user=request.user,
-            scan_type='job',
-            code=job_id,
-            item_id=job.job_id,
-            item_name=job.project_name
-        )
-        
-        # Return job details and redirect URL
-        return JsonResponse({
-            'success': True,
-            'type': 'job',
-            'id': job.job_id,
-            'name': job.project_name,
-            'redirect_url': f'/scan/job/{job.job_id}/'
-        })
-        
-    except Job.DoesNotExist:
         return JsonResponse({
             'success': False,
-            'error': f'No job found with ID {job_id}',
-            'scanned_code': job_id  # Add the scanned code
+            'error': f'Error processing {scan_type} scan: {str(e)}',
+            'scanned_code': parsed_code
         })
-    except Exception as e:
+    
+    if not match:
+        return JsonResponse(scan_result(parsed_code, scan_type, None))
+    
+    # Record scan in history
+    ScanHistory.objects.create(**scan_history_fields(request.user, parsed_code, match))
+    
+    return JsonResponse(scan_result(parsed_code, scan_type, match))
+
+@login_required
+@require_POST
+def process_batch_scan(request):
+    """Process a list of scanned codes in one request (e.g. during a stock take)"""
+    # Accept either a JSON body {"codes": [...]} or repeated form fields
+    if request.content_type == 'application/json':
+        try:
+            codes = json.loads(request.body or b'{}').get('codes', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+        # A string would otherwise be scanned one character at a time
+        if not isinstance(codes, list):
+            return JsonResponse({'success': False, 'error': '"codes" must be a list'}, status=400)
+    else:
+        codes = request.POST.getlist('codes')
+    
+    codes = [str(code) for code in codes if code]
+    
+    if not codes:
+        return JsonResponse({'success': False, 'error': 'No codes provided'})
+    
+    if len(codes) > MAX_BATCH_SCAN_CODES:
         return JsonResponse({
             'success': False,
-            'error': f'Error processing job scan: {str(e)}',
-            'scanned_code': job_id  # Add the scanned code
-        })
-
-def process_material_scan(request, material_id):
-    """Process a material code scan"""
+            'error': f'Too many codes in one batch (maximum {MAX_BATCH_SCAN_CODES})'
+        }, status=400)
+    
+    # Parse and classify every code before touching the database
+    parsed = []
+    for code in codes:
+        scanned = classify_code(code)
+        parsed.append((scanned.code, scanned.code_type))
+    
     try:
-        # First try to look up material by our internal ID
-        material = Material.objects.filter(material_id=material_id).first()
-        
-        # If not found, try serial number or supplier SKU
-        if not material:
-            material = Material.objects.filter(
-                Q(serial_number=material_id) | Q(supplier_sku=material_id)
-            ).first()
-        
-        if not material:
-            return JsonResponse({
-                'success': False,
-                'error': f'No material found with ID or serial number {material_id}',
-                'scanned_code': material_id  # Add the scanned code
-            })
-        
-        # Record scan in history
-        ScanHistory.objects.create(
-            user=request.user,
-            scan_type='material',
-            code=material_id,
-            item_id=material.material_id,
-            item_name=material.name
-        )
-        
-        # Return material details and redirect URL
-        return JsonResponse({
-            'success': True,
-            'type': 'material',
-            'id': material.material_id,
-            'name': material.name,
-            'redirect_url': f'/scan/material/{material.material_id}/'
-        })
-        
+        matches = scan_index.resolve_many(parsed)
     except Exception as e:
         return JsonResponse({
             'success': False,
-            'error': f'Error processing material scan: {str(e)}',
-            'scanned_code': material_id  # Add the scanned code
+            'error': f'Error processing batch scan: {str(e)}'
         })
+    
+    results = []
+    history = []
+    for parsed_code, scan_type in parsed:
+        match = matches.get(parsed_code)
+        results.append(scan_result(parsed_code, scan_type, match))
+        if match:
+            history.append(ScanHistory(**scan_history_fields(request.user, parsed_code, match)))
+    
+    # Record all successful scans in a single insert
+    ScanHistory.objects.bulk_create(history)
+    
+    return JsonResponse({
+        'success': True,
+        'resolved': len(history),
+        'unresolved': len(results) - len(history),
+        'results': results
+    })
 
-def process_machine_scan(request, machine_id):
-    """Process a machine code scan"""
-    try:
-        # First try to look up machine by our internal ID
-        machine = Machine.objects.filter(machine_id=machine_id).first()
-        
-        # If not found, try serial number
-        if not machine:
-            machine = Machine.objects.filter(serial_number=machine_id).first()
-        
-        if not machine:
-            return JsonResponse({
-                'success': False,
-                'error': f'No machine found with ID or serial number {machine_id}',
-                'scanned_code': machine_id  # Add the scanned code
-            })
-        
-        # Record scan in history
-        ScanHistory.objects.create(
-            user=request.user,
-            scan_type='machine',
-            code=machine_id,
-            item_id=machine.machine_id,
-            item_name=machine.name
-        )
-        
-        # Return machine details and redirect URL
-        return JsonResponse({
-            'success': True,
-            'type': 'machine',
-            'id': machine.machine_id,
-            'name': machine.name,
-            'redirect_url': f'/scan/machine/{machine.machine_id}/'
-        })
-        
-    except Exception as e:
-        return JsonResponse({
+def scan_result(code, scan_type, match):
+    """Build the JSON payload describing the outcome of a single scan"""
+    if not match:
+        return {
             'success': False,
-            'error': f'Error processing machine scan: {str(e)}',
-            'scanned_code': machine_id  # Add the scanned code
-        })
+            'error': scan_not_found_message(scan_type, code),
+            'scanned_code': code  # Add the scanned code to the response
+        }
+    
+    # Return item details and redirect URL
+    return {
+        'success': True,
+        'type': match.scan_type,
+        'id': match.item_id,
+        'name': match.name,
+        'redirect_url': f'/scan/{match.scan_type}/{match.item_id}/'
+    }
+
+def scan_history_fields(user, code, match):
+    """Field values for the ScanHistory row recording a successful scan"""
+    return {
+        'user': user,
+        'scan_type': match.scan_type,
+        'code': code,
+        'item_id': match.item_id,
+        'item_name': match.name,
+    }
+
+def scan_not_found_message(scan_type, code):
+    """Return the error message shown when a code matches nothing"""
+    if scan_type == 'job':
+        return f'No job found with ID {code}'
+    elif scan_type == 'material':
+        return f'No material found with ID or serial number {code}'
+    elif scan_type == 'machine':
+        return f'No machine found with ID or serial number {code}'
+    return 'Unrecognized code. This doesn\'t match any known job, material, or machine.'
 
 @login_required
 def scan_history(request):
@@ -259,71 +182,20 @@ def manual_entry(request):
             return redirect('scan')
         
         # Auto-detect the code type
-        code_type = determine_code_type(item_id)
+        scanned = classify_code(item_id)
+        code_type = scanned.code_type
         
-        # Process based on code type
-        if code_type == 'job':
-            try:
-                job = Job.objects.get(job_id=item_id)
-                return redirect('scanned_job', job_id=job.job_id)
-            except Job.DoesNotExist:
-                messages.error(request, f'No job found with ID {item_id}')
-                return render(request, 'scanning/result.html', {'scanned_code': item_id})
-        elif code_type == 'material':
-            try:
-                # Try internal ID first
-                material = Material.objects.filter(material_id=item_id).first()
-                
-                # If not found, try serial number or supplier SKU
-                if not material:
-                    material = Material.objects.filter(
-                        Q(serial_number=item_id) | Q(supplier_sku=item_id)
-                    ).first()
-                
-                if material:
-                    return redirect('scanned_material', material_id=material.material_id)
-                else:
-                    return render(request, 'scanning/result.html', {'scanned_code': item_id})
-            except Exception:
-                return render(request, 'scanning/result.html', {'scanned_code': item_id})
-        elif code_type == 'machine':
-            try:
-                # Try internal ID first
-                machine = Machine.objects.filter(machine_id=item_id).first()
-                
-                # If not found, try serial number
-                if not machine:
-                    machine = Machine.objects.filter(serial_number=item_id).first()
-                
-                if machine:
-                    return redirect('scanned_machine', machine_id=machine.machine_id)
-                else:
-                    return render(request, 'scanning/result.html', {'scanned_code': item_id})
-            except Exception:
-                return render(request, 'scanning/result.html', {'scanned_code': item_id})
-        else:
-            # Unknown code type - try to find it in the database
-            try:
-                # Try as material serial number or supplier SKU
-                material = Material.objects.filter(
-                    Q(serial_number=item_id) | Q(supplier_sku=item_id)
-                ).first()
-                
-                if material:
-                    return redirect('scanned_material', material_id=material.material_id)
-                
-                # Try as machine serial number
-                machine = Machine.objects.filter(serial_number=item_id).first()
-                
-                if machine:
-                    return redirect('scanned_machine', machine_id=machine.machine_id)
-                
-                # If we got here, couldn't find it
-                return render(request, 'scanning/result.html', {'scanned_code': item_id})
-            except Exception:
-                return render(request, 'scanning/result.html', {'scanned_code': item_id})
+        try:
+            match = scan_index.resolve(scanned.code, code_type)
+        except Exception:
+            match = None
+        
+        if match:
+            return redirect(f'scanned_{match.scan_type}', match.item_id)
         
-        return redirect('scan')
+        if code_type == 'job':
+            messages.error(request, f'No job found with ID {item_id}')
+        return render(request, 'scanning/result.html', {'scanned_code': item_id})
     
     # For GET requests, show the manual entry form
     return render(request, 'scanning/manual.html')
@@ -354,11 +226,7 @@ def scanned_material(request, material_id):
     material = get_object_or_404(Material, material_id=material_id)
     
     # Get user's active job for association
-    try:
-        settings = StaffSettings.objects.get(user=request.user)
-        active_job = settings.active_job
-    except StaffSettings.DoesNotExist:
-        active_job = None
+    active_job = get_staff_context(request).active_job
     
     context = {
         'material': material,
@@ -381,19 +249,10 @@ def scanned_machine(request, machine_id):
             return stop_machine_usage(request, machine_id)
     
     # Check if user is certified for this machine
-    is_certified = False
-    try:
-        operator = request.user.operator
-        is_certified = operator.is_certified_for(machine)
-    except:
-        pass
+    is_certified = get_operator_context(request).is_certified_for(machine)
     
     # Get user's active job for association
-    try:
-        settings = StaffSettings.objects.get(user=request.user)
-        active_job = settings.active_job
-    except StaffSettings.DoesNotExist:
-        active_job = None
+    active_job = get_staff_context(request).active_job
     
     context = {
         'machine': machine,
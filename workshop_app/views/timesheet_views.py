@@ -0,0 +1,129 @@
+"""
+API endpoints for timesheets (time worked per user, job and day).
+"""
+import csv
+from datetime import timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_GET
+
+from workshop_app.utils.timesheets import timesheet, timesheet_totals
+
+# Longest range that can be requested, in days
+MAX_TIMESHEET_DAYS = 366
+
+# Columns of the CSV export
+CSV_COLUMNS = ['Date', 'Username', 'Name', 'Job ID', 'Project', 'Hours', 'Entries']
+
+# Leading characters that make spreadsheets read a cell as a formula
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class TimesheetRequestError(Exception):
+    """Invalid timesheet query parameters"""
+
+
+def csv_text(value):
+    """Quote user-entered text so spreadsheets show it instead of evaluating it"""
+    if value and value.startswith(CSV_FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def parse_timesheet_request(request):
+    """
+    Read the user, from and to parameters of a timesheet request
+
+    `user` is a user id or username, or `all` for everyone; only staff
+    can see other users' time. The range defaults to the current week.
+
+    Returns:
+        tuple: (User or None for everyone, start date, end date)
+
+    Raises:
+        TimesheetRequestError: If a parameter is invalid or not allowed
+    """
+    user_param = request.GET.get('user', '').strip()
+    if not user_param or user_param in (str(request.user.pk), request.user.username):
+        user = request.user
+    elif not request.user.is_staff:
+        # Checked before any lookup, so the answer does not reveal which users exist
+        raise TimesheetRequestError("You can only view your own timesheet")
+    elif user_param == 'all':
+        user = None
+    else:
+        lookup = {'pk': user_param} if user_param.isdigit() else {'username': user_param}
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise TimesheetRequestError(f'Unknown user: {user_param}')
+
+    today = timezone.localdate()
+    start_date = parse_date(request.GET.get('from', '')) if request.GET.get('from') else today - timedelta(days=today.weekday())
+    end_date = parse_date(request.GET.get('to', '')) if request.GET.get('to') else today
+    if start_date is None or end_date is None:
+        raise TimesheetRequestError('Dates must be given as YYYY-MM-DD')
+    if start_date > end_date:
+        raise TimesheetRequestError('from must not be after to')
+    if (end_date - start_date).days + 1 > MAX_TIMESHEET_DAYS:
+        raise TimesheetRequestError(f'Range is limited to {MAX_TIMESHEET_DAYS} days')
+    return user, start_date, end_date
+
+
+@login_required
+@require_GET
+def timesheets_api(request):
+    """API endpoint returning hours per user, job and day for a date range"""
+    try:
+        user, start_date, end_date = parse_timesheet_request(request)
+    except (TimesheetRequestError, ValueError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+    rows = timesheet(start_date, end_date, user=user)
+    return JsonResponse({
+        'success': True,
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'rows': [
+            {
+                'date': row['day'].isoformat(),
+                'username': row['username'],
+                'name': row['full_name'],
+                'job_id': row['job_id'],
+                'project_name': row['project_name'],
+                'hours': row['hours'],
+                'entries': row['entry_count'],
+            }
+            for row in rows
+        ],
+        'totals': timesheet_totals(rows),
+    })
+
+
+@login_required
+@require_GET
+def timesheets_csv(request):
+    """Download a timesheet as CSV (same parameters as the API)"""
+    try:
+        user, start_date, end_date = parse_timesheet_request(request)
+    except (TimesheetRequestError, ValueError) as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain')
+
+    response = HttpResponse(content_type='text/csv')
+    name = user.username if user else 'all'
+    response['Content-Disposition'] = f'attachment; filename="timesheet_{name}_{start_date}_{end_date}.csv"'
+
+    writer = csv.writer(response)
+    writer.writerow(CSV_COLUMNS)
+    for row in timesheet(start_date, end_date, user=user):
+        writer.writerow([
+            row['day'].isoformat(), csv_text(row['username']), csv_text(row['full_name']),
+            csv_text(row['job_id']), csv_text(row['project_name']), f"{row['hours']:.2f}", row['entry_count'],
+        ])
+    return response
@@ -49,7 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # Custom middleware can be added here later
+    'workshop_app.utils.staff_context.StaffContextMiddleware',
 ]
 
 ROOT_URLCONF = 'workshop_management.urls'
@@ -83,6 +83,16 @@ DATABASES = {
     }
 }
 
+# Cache for the dashboard panels. Local memory is per process;
+# with several worker processes use a shared backend (file, Redis, Memcached)
+# so signal invalidation reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'workshop',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +135,41 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Rendered QR code images (content-addressed, safe to delete at any time)
+QR_CACHE_DIR = os.path.join(MEDIA_ROOT, 'qr_cache')
+
+# Images kept in QR_CACHE_DIR; the least recently used are deleted beyond this
+QR_CACHE_MAX_FILES = 5000
+
+# Warm the scan code index in a background thread when the app starts (True),
+# or on the first scan, which then waits for it (False). Warming reads up to
+# SCAN_RESOLVER_WARMUP_LIMIT rows each of jobs, materials and machines; turn
+# it on for the web server processes only, as every manage.py command would
+# load the index too.
+SCAN_RESOLVER_WARM_ON_START = False
+SCAN_RESOLVER_WARMUP_LIMIT = 50000
+
+# Most labels one label sheet request may render (larger runs: `manage.py print_labels`)
+MAX_LABELS = 2000
+
+# Minutes past reserved_until before an open machine session is closed automatically
+MACHINE_SESSION_GRACE_MINUTES = 30
+
+# Seconds between stale machine session sweeps in a background thread
+# (None = only sweep from `manage.py close_stale_machine_sessions`)
+MACHINE_SESSION_SWEEP_INTERVAL = None
+
+# Keep machine board connections open and push status changes (True), or let
+# the board poll a snapshot every MACHINE_BOARD_POLL_MS milliseconds (False).
+# Streaming needs an ASGI server (`uvicorn workshop_management.asgi:application`)
+# running as a single process: status changes are only pushed to streams in
+# the process that made them. runserver and WSGI servers always poll.
+MACHINE_BOARD_STREAM = False
+MACHINE_BOARD_POLL_MS = 5000
+
+# Seconds the recent jobs, available machines and low stock dashboard panels stay cached
+DASHBOARD_CACHE_TIMEOUT = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 